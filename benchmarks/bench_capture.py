@@ -0,0 +1,192 @@
+"""抓包处理路径性能测试
+
+使用合成流量驱动 PacketCapture 的数据包处理流程，输出每秒处理包数、
+每包耗时（微秒）以及获取推流信息的耗时，用于比较 core/capture.py 中
+解析和匹配逻辑的改动。
+
+用法:
+    python -m benchmarks.bench_capture --duration 5 --video-mbps 8 --repeat 3
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks.traffic import generate, write_pcap
+from core.backends import PcapReplayBackend
+from core.capture import PacketCapture
+from core.packet import DLT_EN10MB
+
+
+class NullLogger:
+    """丢弃所有输出的日志对象，避免测量界面输出的开销"""
+
+    def info(self, message):
+        pass
+
+    def packet(self, message):
+        pass
+
+    def error(self, message):
+        pass
+
+
+def new_capture():
+    """创建一个处于捕获状态的 PacketCapture，记录获取推流信息的时间"""
+    capture = PacketCapture(NullLogger())
+    capture.is_capturing = True
+    capture.found_at = None
+    # 不把测试流量中的端口写入用户配置
+    capture.capture_filter.learn_port = lambda port: False
+
+    def on_found(server_address, stream_code):
+        if capture.found_at is not None:
+            return
+        capture.found_at = time.perf_counter()
+        capture.found = (server_address, stream_code)
+
+    capture.add_callback(on_found)
+    return capture
+
+
+def case_scapy(frames):
+    """逐层解析路径：scapy 解析帧后按 IP/TCP/Raw 层处理"""
+    from scapy.layers.l2 import Ether
+
+    capture = new_capture()
+    start = time.perf_counter()
+    for _, frame in frames:
+        capture._scapy_callback(Ether(frame), "bench")
+    return capture, start, time.perf_counter()
+
+
+def case_fastpath(frames):
+    """实时捕获路径：原始帧直接交给 _frame_callback 快速解析"""
+    capture = new_capture()
+    start = time.perf_counter()
+    for _, frame in frames:
+        capture._frame_callback(frame, "bench")
+    return capture, start, time.perf_counter()
+
+
+def case_pipeline(frames):
+    """抓包线程与处理线程分离：计时为抓包线程放入缓冲的每包耗时，处理线程在后台解析"""
+    capture = new_capture()
+    capture._start_pipeline()
+    put = capture.ring.put
+    start = time.perf_counter()
+    for _, frame in frames:
+        put((frame, "bench", DLT_EN10MB))
+    end = time.perf_counter()
+    while len(capture.ring) and not capture.stop_event.is_set():
+        time.sleep(0.0005)
+    capture.stop()
+    dropped = capture.ring.dropped
+    if dropped:
+        print(f"pipeline: 缓冲已满丢弃 {dropped} 个数据包，抽样跳过 {capture.flow_table.sampled} 个")
+    return capture, start, end
+
+
+def case_backend(frames):
+    """完整抓包流程：回放后端的抓包线程读取数据包文件放入缓冲，处理线程解析，计时到全部处理完"""
+    fd, path = tempfile.mkstemp(suffix=".pcap")
+    os.close(fd)
+    try:
+        write_pcap(path, frames)
+        capture = new_capture()
+        capture.is_capturing = False
+        capture.backend = PcapReplayBackend([path])
+        # 处理完全部数据包，与其他用例的计时范围一致
+        capture.set_stop_condition(matches=0)
+        start = time.perf_counter()
+        capture.start(path)
+        while capture.interface_status.get(path) or len(capture.ring):
+            time.sleep(0.0005)
+        end = time.perf_counter()
+        capture.stop()
+    finally:
+        os.remove(path)
+    return capture, start, end
+
+
+def case_callback(frames):
+    """仅 _packet_callback：使用预先解析好的 scapy 数据包"""
+    from scapy.layers.l2 import Ether
+
+    packets = [Ether(frame) for _, frame in frames]
+    capture = new_capture()
+    start = time.perf_counter()
+    for packet in packets:
+        capture._packet_callback(packet, "bench")
+    return capture, start, time.perf_counter()
+
+
+CASES = {
+    "scapy": case_scapy,
+    "callback": case_callback,
+    "fastpath": case_fastpath,
+    "pipeline": case_pipeline,
+    "backend": case_backend,
+}
+
+
+def run_case(name, frames, credentials, repeat):
+    """重复运行一个测试用例并汇总结果"""
+    per_packet = []
+    to_credential = []
+    correct = True
+    for _ in range(repeat):
+        capture, start, end = CASES[name](frames)
+        per_packet.append((end - start) / len(frames) * 1_000_000)
+        if capture.found_at:
+            to_credential.append((capture.found_at - start) * 1000)
+            expected = credentials[-1][1:]
+            correct = correct and capture.found == expected
+        else:
+            correct = False
+
+    us = statistics.median(per_packet)
+    return {
+        "case": name,
+        "pps": 1_000_000 / us if us else 0,
+        "us_per_packet": us,
+        "to_credential_ms": statistics.median(to_credential) if to_credential else None,
+        "correct": correct,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="抓包处理路径性能测试")
+    parser.add_argument("--duration", type=float, default=5.0, help="流量时长（秒）")
+    parser.add_argument("--video-mbps", type=float, default=8.0, help="视频推流码率")
+    parser.add_argument("--https-mbps", type=float, default=2.0, help="HTTPS 干扰流量码率")
+    parser.add_argument("--udp-mbps", type=float, default=1.0, help="UDP 干扰流量码率")
+    parser.add_argument("--credential-at", type=float, default=1.0, help="开始推流的时间（秒）")
+    parser.add_argument("--chunk-size", type=int, default=128, help="命令消息的 RTMP 块大小")
+    parser.add_argument("--split-connect", action="store_true", help="将 connect 拆分到两个 TCP 段")
+    parser.add_argument("--rtmp-port", type=int, default=1935, help="目标 RTMP 会话的服务器端口")
+    parser.add_argument("--repeat", type=int, default=3, help="重复次数，取中位数")
+    parser.add_argument("--case", action="append", choices=sorted(CASES), help="只运行指定用例")
+    args = parser.parse_args()
+
+    frames, credentials = generate(
+        duration=args.duration, video_mbps=args.video_mbps, https_mbps=args.https_mbps,
+        udp_mbps=args.udp_mbps, credential_at=args.credential_at,
+        chunk_size=args.chunk_size, split_connect=args.split_connect, rtmp_port=args.rtmp_port,
+    )
+    print(f"合成流量: {len(frames)} 个数据包，{sum(len(f) for _, f in frames) / 1e6:.1f} MB")
+    print(f"{'用例':<12}{'包/秒':>12}{'微秒/包':>10}{'推流信息(ms)':>14}  结果")
+    for name in args.case or CASES:
+        result = run_case(name, frames, credentials, args.repeat)
+        to_credential = (
+            f"{result['to_credential_ms']:.1f}" if result["to_credential_ms"] is not None else "-"
+        )
+        print(
+            f"{result['case']:<12}{result['pps']:>12.0f}{result['us_per_packet']:>10.2f}"
+            f"{to_credential:>14}  {'正确' if result['correct'] else '未获取/错误'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
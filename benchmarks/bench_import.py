@@ -0,0 +1,98 @@
+"""启动导入耗时报告
+
+在独立的子进程中执行图形界面和命令行的启动路径，报告耗时、常驻内存、
+已导入的 scapy 模块数，以及 python -X importtime 统计的累计耗时最多的模块。
+非 Windows 平台上图形界面路径可能因缺少 Windows 专用模块而失败，失败时输出错误信息。
+
+用法:
+    python -m benchmarks.bench_import
+    python -m benchmarks.bench_import --case cli-ready --top 15
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# 各启动路径在子进程中执行的代码
+CASES = {
+    # 图形界面：导入主窗口模块（含控制面板和抓包模块）
+    "gui": "import gui.main_window",
+    # 命令行：只导入入口模块
+    "cli": "import cli",
+    # 命令行抓包就绪：导入抓包模块、创建 PacketCapture 并枚举接口
+    "cli-ready": (
+        "from cli import ConsoleLogger\n"
+        "from core.backends import create_backend\n"
+        "from core.capture import PacketCapture\n"
+        "backend = create_backend()\n"
+        "PacketCapture(ConsoleLogger(), backend=backend)\n"
+        "backend.list_interfaces()\n"
+    ),
+}
+
+# 子进程在执行启动代码后输出的统计
+REPORT = (
+    "elapsed = (time.perf_counter() - __start) * 1000\n"
+    "import json, sys, psutil\n"
+    "print(json.dumps({\n"
+    "    'elapsed': elapsed,\n"
+    "    'rss': psutil.Process().memory_info().rss / 1048576,\n"
+    "    'scapy': sum(1 for name in sys.modules if name.split('.')[0] == 'scapy'),\n"
+    "}))\n"
+)
+
+
+def run_case(code):
+    """
+    在子进程中执行启动代码
+    @return: (统计字典, importtime 输出)，启动代码出错时统计字典为 None，importtime 输出为错误信息
+    """
+    script = "import time\n__start = time.perf_counter()\n" + code + "\n" + REPORT
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", script],
+        capture_output=True, text=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    if result.returncode != 0:
+        lines = [line for line in result.stderr.splitlines() if not line.startswith("import time:")]
+        return None, lines[-1] if lines else f"退出码 {result.returncode}"
+    return json.loads(result.stdout.splitlines()[-1]), result.stderr
+
+
+def slowest_imports(importtime, count):
+    """从 importtime 输出中取累计耗时最多的模块，返回 [(累计耗时 ms, 模块名)]"""
+    entries = []
+    for line in importtime.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        entries.append((int(fields[1]) / 1000, fields[2].rstrip()))
+    # 只保留顶层导入（缩进最少），避免同一条导入链重复出现
+    indent = min((len(name) - len(name.lstrip()) for _, name in entries), default=0)
+    top = [(cumulative, name.strip()) for cumulative, name in entries
+           if len(name) - len(name.lstrip()) <= indent + 2]
+    return sorted(top, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动导入耗时报告")
+    parser.add_argument("--case", choices=sorted(CASES), action="append", help="启动路径，可重复，默认全部")
+    parser.add_argument("--top", type=int, default=8, help="列出累计耗时最多的模块数")
+    args = parser.parse_args()
+
+    for name in args.case or CASES:
+        stats, importtime = run_case(CASES[name])
+        print(f"[{name}]")
+        if stats is None:
+            print(f"  失败: {importtime}")
+            continue
+        print(f"  耗时 {stats['elapsed']:.0f} ms，常驻内存 {stats['rss']:.1f} MB，scapy 模块 {stats['scapy']} 个")
+        for cumulative, module in slowest_imports(importtime, args.top):
+            print(f"  {cumulative:8.1f} ms  {module}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""多接口捕获 CPU 占用对比
+
+模拟多块网卡（VPN、Hyper-V、WSL、Docker 等虚拟网卡大多没有流量），
+比较每个接口一个线程与单线程事件循环两种模式在相同流量下的进程 CPU 占用。
+模拟网卡使用 AF_UNIX 数据报 socketpair，每个数据报为一帧，需要在 Linux/macOS 上运行。
+
+prune 模式在 loop 模式的基础上启用接口裁剪：有流量的网卡中只有第一块有出站流量（推流网卡），
+其余只有入站流量（如桥接或镜像的虚拟网卡），观察时间缩短为 1 秒。
+--bridged 模拟桥接网卡：每一帧同时出现在所有有流量的网卡上，输出跨接口重复段的统计。
+
+用法:
+    python -m benchmarks.bench_multi_interface --interfaces 12 --active 2 --pps 5000
+"""
+import argparse
+import select
+import socket
+import threading
+import time
+
+from benchmarks.bench_capture import new_capture
+from benchmarks.traffic import generate
+from core.backends import CaptureBackend
+from core.dedup import SegmentDeduplicator
+from core.packet import DLT_EN10MB
+from core.pipeline import InterfaceCounters
+from core.pruning import InterfacePruner
+
+
+class SimulatedAdapter:
+    """模拟网卡的抓包句柄，接口见 core.backends.CaptureBackend"""
+
+    def __init__(self):
+        self.reader, self.writer = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.reader.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+
+    def fileno(self):
+        return self.reader.fileno()
+
+    @staticmethod
+    def select(sockets, remain=None):
+        return select.select(sockets, [], [], remain)[0]
+
+    def recv_frames(self):
+        return [(self.reader.recv(65535), DLT_EN10MB)]
+
+    def set_filter(self, bpf):
+        pass
+
+    def close(self):
+        self.reader.close()
+        self.writer.close()
+
+
+class SimulatedBackend(CaptureBackend):
+    """打开模拟网卡的抓包后端"""
+
+    name = "simulated"
+
+    def __init__(self, adapters):
+        self.adapters = adapters
+
+    def list_interfaces(self):
+        return [{"name": name} for name in self.adapters]
+
+    def open(self, interface, capture_filter=None):
+        return self.adapters[interface]
+
+
+def feed(adapters, frames, pps, duration, bridged=False):
+    """按指定速率将帧轮流写入有流量的模拟网卡，bridged 为 True 时每一帧写入所有网卡"""
+    interval = 1 / pps
+    start = time.perf_counter()
+    index = 0
+    while time.perf_counter() - start < duration:
+        for adapter in adapters:
+            try:
+                adapter.writer.send(frames[index % len(frames)])
+            except BlockingIOError:
+                pass
+            if not bridged:
+                index += 1
+        if bridged:
+            index += 1
+        delay = start + index * interval - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    return index
+
+
+def run_mode(mode, names, active, frames, pps, duration, bridged=False):
+    """运行一种捕获模式，返回 (CPU 时间, 实际耗时, 每个接口的计数, 接口裁剪, 重复段统计)"""
+    adapters = {name: SimulatedAdapter() for name in names}
+    capture = new_capture()
+    capture.backend = SimulatedBackend(adapters)
+    capture._start_pipeline()
+    for name in names:
+        capture.interface_status[name] = True
+        capture.interface_counters[name] = InterfaceCounters()
+    capture.deduplicator = SegmentDeduplicator()
+
+    if mode == "prune":
+        # 只有第一块网卡有出站流量，发送包数按时间增长
+        start = time.monotonic()
+        capture.pruner = InterfacePruner(
+            names, capture.logger,
+            egress=lambda: {name: int((time.monotonic() - start) * 1000) if name == names[0] else 0
+                            for name in names},
+            loopback=lambda name: False, warmup=1.0, interval=0.5,
+        )
+
+    session = (capture.stop_event, capture.wakeup)
+    if mode == "threads":
+        threads = [
+            threading.Thread(target=capture._start_capture, args=(name,) + session, daemon=True)
+            for name in names
+        ]
+    else:
+        threads = [
+            threading.Thread(target=capture._capture_loop, args=(names,) + session, daemon=True)
+        ]
+    for thread in threads:
+        thread.start()
+
+    cpu = time.process_time()
+    wall = time.perf_counter()
+    feed([adapters[name] for name in names[:active]], frames, pps, duration, bridged)
+    # 等待处理线程处理完缓冲中的帧
+    while len(capture.ring):
+        time.sleep(0.01)
+    cpu = time.process_time() - cpu
+    wall = time.perf_counter() - wall
+
+    capture._halt()
+    for thread in threads:
+        thread.join()
+    pruner = capture.pruner
+    duplicates = capture.get_duplicate_stats()
+    capture.stop()
+    return cpu, wall, capture.get_interface_stats(), pruner, duplicates
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多接口捕获 CPU 占用对比")
+    parser.add_argument("--interfaces", type=int, default=12, help="模拟网卡数量")
+    parser.add_argument("--active", type=int, default=2, help="有流量的网卡数量")
+    parser.add_argument("--pps", type=float, default=5000, help="总包速率")
+    parser.add_argument("--bridged", action="store_true", help="每一帧同时出现在所有有流量的网卡上")
+    parser.add_argument("--duration", type=float, default=5.0, help="每种模式的测试时长（秒）")
+    args = parser.parse_args()
+
+    # 只使用干扰流量，避免获取到推流信息后提前停止
+    frames, _ = generate(duration=2.0, credential_at=10.0)
+    frames = [frame for timestamp, frame in frames if timestamp < frames[0][0] + 2.0]
+    names = [f"sim{index}" for index in range(args.interfaces)]
+    print(f"{args.interfaces} 个模拟网卡，{args.active} 个有流量，总速率 {args.pps:.0f} pps")
+    print(f"{'模式':<10}{'CPU 时间(s)':>12}{'CPU 占用':>10}{'收到的包':>10}  每个接口")
+    for mode in ("threads", "loop", "prune"):
+        cpu, wall, stats, pruner, duplicates = run_mode(
+            mode, names, args.active, frames, args.pps, args.duration, args.bridged
+        )
+        received = sum(counters["packets"] for counters in stats.values())
+        per_interface = " ".join(
+            str(stats[name]["packets"]) for name in names[:args.active]
+        )
+        print(f"{mode:<10}{cpu:>12.2f}{cpu / wall * 100:>9.1f}%{received:>10}  {per_interface}")
+        if pruner is not None:
+            print(f"{'':<10}接口裁剪 {pruner.summary()}")
+        if duplicates["suppressed"]:
+            pairs = " ".join(
+                f"{first}->{second}:{count}"
+                for (first, second), count in sorted(duplicates["pairs"].items())
+            )
+            print(f"{'':<10}过滤重复段 {duplicates['suppressed']} 个  {pairs}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""抓包启停浸泡测试
+
+反复启动并停止 PacketCapture，检查每次 stop() 的耗时是否低于 100 ms，
+以及结束后线程数和进程打开的句柄数是否恢复到开始前的水平。
+需要抓包权限（Windows 安装 Npcap，Linux 使用 root 或 CAP_NET_RAW）。
+
+用法:
+    python -m benchmarks.soak_start_stop --cycles 1000 --mode loop
+    python -m benchmarks.soak_start_stop --cycles 200 --mode single --interface eth0
+    python -m benchmarks.soak_start_stop --cycles 1000 --backend af_packet
+"""
+import argparse
+import gc
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+import psutil
+
+from benchmarks.bench_capture import NullLogger
+from core.backends import BACKEND_AF_PACKET, BACKEND_SCAPY, create_backend
+from core.capture import PacketCapture
+
+# stop() 的耗时上限（毫秒）
+STOP_LATENCY_LIMIT_MS = 100
+
+
+def open_handles():
+    """进程打开的文件描述符（Linux/macOS）或句柄（Windows）数量"""
+    process = psutil.Process(os.getpid())
+    if hasattr(process, "num_handles"):
+        return process.num_handles()
+    return process.num_fds()
+
+
+def run(interfaces, mode, cycles, max_hold, backend=None):
+    """执行启停循环，返回每次 stop() 的耗时（毫秒）"""
+    capture = PacketCapture(NullLogger(), backend=create_backend(backend))
+    if mode != "single":
+        # 只对本次测试生效，不修改用户配置
+        capture.capture_mode = mode
+    rng = random.Random(0)
+    latencies = []
+    for cycle in range(cycles):
+        if mode == "single":
+            capture.start(interfaces[0])
+        else:
+            capture.start_multi(interfaces)
+        if not capture.is_capturing:
+            raise RuntimeError(f"第 {cycle + 1} 次启动失败")
+        # 随机保持一段时间，覆盖线程尚未进入等待和已经在等待两种情况
+        time.sleep(rng.uniform(0, max_hold))
+        start = time.perf_counter()
+        capture.stop()
+        latencies.append((time.perf_counter() - start) * 1000)
+        if (cycle + 1) % 100 == 0:
+            print(f"  {cycle + 1}/{cycles} 线程 {threading.active_count()} 句柄 {open_handles()}")
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="抓包启停浸泡测试")
+    parser.add_argument("--cycles", type=int, default=1000, help="启停次数")
+    parser.add_argument(
+        "--mode", choices=("single", "loop", "threads"), default="loop",
+        help="single 为单接口 start()，loop/threads 为多接口 start_multi() 的两种模式",
+    )
+    parser.add_argument("--interface", action="append", help="接口名，默认使用全部接口")
+    parser.add_argument("--max-hold", type=float, default=0.02, help="每次启动后最多保持的秒数")
+    parser.add_argument(
+        "--backend", choices=(BACKEND_SCAPY, BACKEND_AF_PACKET), help="抓包后端，默认读取配置"
+    )
+    args = parser.parse_args()
+
+    backend = create_backend(args.backend)
+    interfaces = args.interface or [iface["name"] for iface in backend.list_interfaces()]
+    # 预热一次，让 scapy 等模块完成导入和初始化
+    run(interfaces, args.mode, 1, 0, args.backend)
+    gc.collect()
+    threads_before = threading.active_count()
+    handles_before = open_handles()
+    print(f"接口: {', '.join(interfaces)}，模式: {args.mode}，"
+          f"后端: {backend.name}，开始时线程 {threads_before} 句柄 {handles_before}")
+
+    latencies = run(interfaces, args.mode, args.cycles, args.max_hold, args.backend)
+
+    gc.collect()
+    threads_after = threading.active_count()
+    handles_after = open_handles()
+    latencies.sort()
+    slow = sum(1 for latency in latencies if latency > STOP_LATENCY_LIMIT_MS)
+    print(f"stop() 耗时: 中位数 {statistics.median(latencies):.1f} ms，"
+          f"P99 {latencies[int(len(latencies) * 0.99) - 1]:.1f} ms，最大 {latencies[-1]:.1f} ms，"
+          f"超过 {STOP_LATENCY_LIMIT_MS} ms 的次数 {slow}")
+    print(f"结束时线程 {threads_after}（开始 {threads_before}），"
+          f"句柄 {handles_after}（开始 {handles_before}）")
+
+    leaked = threads_after > threads_before or handles_after > handles_before
+    if leaked or slow:
+        print("失败: " + ("存在线程或句柄泄漏" if leaked else "停止耗时超过上限"))
+        sys.exit(1)
+    print("通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,408 @@
+"""合成抓包流量生成器
+
+生成接近真实环境的流量组合：RTMP 握手、按块切分的 connect/FCPublish AMF0 命令、
+HTTPS 干扰流量以及指定码率的视频块，用于回放和抓包性能测试。
+
+用法:
+    python -m benchmarks.traffic output.pcap --duration 10 --video-mbps 8
+"""
+import argparse
+import random
+import struct
+
+ETH_TYPE_IPV4 = 0x0800
+PROTO_TCP = 6
+PROTO_UDP = 17
+TCP_FIN = 0x01
+TCP_SYN = 0x02
+TCP_PSH = 0x08
+TCP_ACK = 0x10
+MSS = 1460
+
+# RTMP 消息类型
+RTMP_SET_CHUNK_SIZE = 1
+RTMP_AUDIO = 8
+RTMP_VIDEO = 9
+RTMP_COMMAND_AMF0 = 20
+
+
+def _checksum(data):
+    """计算 16 位反码和校验"""
+    if len(data) % 2:
+        data += b"\x00"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    while total >> 16:
+        total = (total & 0xFFFF) + (total >> 16)
+    return ~total & 0xFFFF
+
+
+def _ip_bytes(ip):
+    return bytes(int(part) for part in ip.split("."))
+
+
+def build_frame(src, dst, proto, transport, ip_id=0):
+    """构建以太网 + IPv4 帧"""
+    total_length = 20 + len(transport)
+    header = struct.pack(
+        "!BBHHHBBH4s4s",
+        0x45, 0, total_length, ip_id & 0xFFFF, 0x4000, 64, proto, 0,
+        _ip_bytes(src), _ip_bytes(dst),
+    )
+    header = header[:10] + struct.pack("!H", _checksum(header)) + header[12:]
+    ethernet = b"\x00\x11\x22\x33\x44\x55" + b"\x66\x77\x88\x99\xaa\xbb" + struct.pack(
+        "!H", ETH_TYPE_IPV4
+    )
+    return ethernet + header + transport
+
+
+def build_tcp(src, dst, sport, dport, seq, ack, flags, payload=b"", options=b""):
+    """构建 TCP 段（含校验和）"""
+    offset = (20 + len(options)) // 4
+    header = struct.pack(
+        "!HHIIBBHHH", sport, dport, seq & 0xFFFFFFFF, ack & 0xFFFFFFFF,
+        offset << 4, flags, 64240, 0, 0,
+    ) + options
+    pseudo = _ip_bytes(src) + _ip_bytes(dst) + struct.pack(
+        "!BBH", 0, PROTO_TCP, len(header) + len(payload)
+    )
+    checksum = _checksum(pseudo + header + payload)
+    return header[:16] + struct.pack("!H", checksum) + header[18:] + payload
+
+
+def build_udp(sport, dport, payload):
+    """构建 UDP 数据报（不计算校验和）"""
+    return struct.pack("!HHHH", sport, dport, 8 + len(payload), 0) + payload
+
+
+def build_dns_response(name, addresses, ttl=60, transaction=0):
+    """构建 A 记录查询的 DNS 响应（推流域名经 CNAME 指向 CDN 域名，A 记录挂在 CNAME 上）"""
+    def encode(domain):
+        return b"".join(bytes([len(label)]) + label.encode() for label in domain.split(".")) + b"\x00"
+
+    cname = f"{name.split('.')[0]}.cdn-cname.example.net"
+    question = encode(name) + struct.pack("!HH", 1, 1)
+    answers = b"\xc0\x0c" + struct.pack("!HHIH", 5, 1, ttl, len(encode(cname))) + encode(cname)
+    # CNAME 目标在第一条回答的 RDATA 中，偏移为头部 12 字节 + 问题 + 回答的固定部分
+    target = 12 + len(question) + 12
+    for address in addresses:
+        answers += struct.pack("!HHHIH", 0xC000 | target, 1, 1, ttl, 4) + _ip_bytes(address)
+    header = struct.pack("!HHHHHH", transaction, 0x8180, 1, 1 + len(addresses), 0, 0)
+    return header + question + answers
+
+
+class TcpFlow:
+    """模拟一条 TCP 连接，维护双向序列号"""
+
+    def __init__(self, trace, client, server, sport, dport):
+        self.trace = trace
+        self.client = client
+        self.server = server
+        self.sport = sport
+        self.dport = dport
+        self.client_seq = trace.rng.getrandbits(32)
+        self.server_seq = trace.rng.getrandbits(32)
+
+    def handshake(self, t):
+        """三次握手"""
+        mss = struct.pack("!BBH", 2, 4, MSS)
+        self._emit(t, True, TCP_SYN, options=mss)
+        self.client_seq += 1
+        self._emit(t + 0.01, False, TCP_SYN | TCP_ACK, options=mss)
+        self.server_seq += 1
+        self._emit(t + 0.02, True, TCP_ACK)
+        return t + 0.02
+
+    def send(self, t, data, from_client=True, segment_size=MSS):
+        """发送数据，按 segment_size 切分为多个 TCP 段"""
+        for offset in range(0, len(data), segment_size):
+            chunk = data[offset:offset + segment_size]
+            self._emit(t, from_client, TCP_PSH | TCP_ACK, chunk)
+            if from_client:
+                self.client_seq += len(chunk)
+            else:
+                self.server_seq += len(chunk)
+        return t
+
+    def _emit(self, t, from_client, flags, payload=b"", options=b""):
+        if from_client:
+            src, dst, sport, dport = self.client, self.server, self.sport, self.dport
+            seq, ack = self.client_seq, self.server_seq
+        else:
+            src, dst, sport, dport = self.server, self.client, self.dport, self.sport
+            seq, ack = self.server_seq, self.client_seq
+        transport = build_tcp(src, dst, sport, dport, seq, ack, flags, payload, options)
+        self.trace.add(t, build_frame(src, dst, PROTO_TCP, transport, self.trace.next_ip_id()))
+
+
+def amf0_value(value):
+    """AMF0 编码"""
+    if value is None:
+        return b"\x05"
+    if isinstance(value, bool):
+        return b"\x01" + (b"\x01" if value else b"\x00")
+    if isinstance(value, (int, float)):
+        return b"\x00" + struct.pack("!d", value)
+    if isinstance(value, str):
+        encoded = value.encode("utf-8")
+        return b"\x02" + struct.pack("!H", len(encoded)) + encoded
+    if isinstance(value, dict):
+        body = b"".join(
+            struct.pack("!H", len(key)) + key.encode("utf-8") + amf0_value(item)
+            for key, item in value.items()
+        )
+        return b"\x03" + body + b"\x00\x00\x09"
+    raise TypeError(f"不支持的 AMF0 类型: {type(value)}")
+
+
+def rtmp_message(csid, msg_type, body, chunk_size, timestamp=0, stream_id=0, fmt=0):
+    """将消息编码为 RTMP 块序列，首块使用 fmt 0 或 fmt 1 头"""
+    if fmt == 0:
+        header = bytes([csid]) + struct.pack(
+            "!I", timestamp
+        )[1:] + struct.pack("!I", len(body))[1:] + bytes([msg_type]) + struct.pack(
+            "<I", stream_id
+        )
+    else:
+        header = bytes([0x40 | csid]) + struct.pack("!I", timestamp)[1:] + struct.pack(
+            "!I", len(body)
+        )[1:] + bytes([msg_type])
+    chunks = [header + body[:chunk_size]]
+    for offset in range(chunk_size, len(body), chunk_size):
+        chunks.append(bytes([0xC0 | csid]) + body[offset:offset + chunk_size])
+    return b"".join(chunks)
+
+
+def rtmp_command(name, transaction, *args, chunk_size=128, stream_id=0, fmt=0):
+    body = amf0_value(name) + amf0_value(float(transaction)) + b"".join(
+        amf0_value(arg) for arg in args
+    )
+    return rtmp_message(3, RTMP_COMMAND_AMF0, body, chunk_size, stream_id=stream_id, fmt=fmt)
+
+
+def make_credentials(rng, host=None):
+    """生成形如直播伴侣使用的推流地址和推流码"""
+    host = host or f"push-rtmp-l{rng.randint(1, 30)}.douyincdn.com"
+    server = f"rtmp://{host}/third"
+    stream_id = rng.randint(10**17, 10**18 - 1)
+    sign = "".join(rng.choice("0123456789abcdef") for _ in range(32))
+    key = f"stream-{stream_id}?expire={rng.randint(1700000000, 1800000000)}&sign={sign}"
+    return server, key
+
+
+class Trace:
+    """按时间排序的帧集合"""
+
+    def __init__(self, seed=0):
+        self.rng = random.Random(seed)
+        self.frames = []
+        self.ip_id = 0
+        self.credentials = []
+
+    def add(self, t, frame):
+        self.frames.append((t, frame))
+
+    def next_ip_id(self):
+        self.ip_id += 1
+        return self.ip_id
+
+    def sorted_frames(self):
+        return sorted(self.frames, key=lambda item: item[0])
+
+    def rtmp_session(self, t, server_ip, server, key, client="192.168.1.100", sport=None,
+                     video_mbps=0.0, duration=0.0, chunk_size=128, split_connect=False,
+                     port=1935):
+        """生成完整的 RTMP 推流会话：握手、命令和可选的视频流"""
+        sport = sport or self.rng.randint(49152, 65535)
+        flow = TcpFlow(self, client, server_ip, sport, port)
+        t = flow.handshake(t)
+
+        # C0 + C1 / S0 + S1 + S2 / C2
+        flow.send(t, b"\x03" + self.rng.randbytes(1536))
+        flow.send(t + 0.03, b"\x03" + self.rng.randbytes(3072), from_client=False)
+        flow.send(t + 0.04, self.rng.randbytes(1536))
+        t += 0.05
+
+        app = server.rsplit("/", 1)[1]
+        connect = rtmp_command("connect", 1, {
+            "app": app,
+            "type": "nonprivate",
+            "flashVer": "FMLE/3.0 (compatible; FMSc/1.0)",
+            "tcUrl": server,
+        }, chunk_size=chunk_size)
+        if split_connect:
+            # connect 命令跨越两个 TCP 段
+            middle = len(connect) // 2
+            flow.send(t, connect[:middle])
+            flow.send(t + 0.001, connect[middle:])
+        else:
+            flow.send(t, connect)
+        flow.send(t + 0.03, rtmp_command("_result", 1, None, {"code": "NetConnection.Connect.Success"},
+                                         chunk_size=chunk_size), from_client=False)
+        t += 0.04
+
+        # releaseStream / FCPublish / createStream 在同一个 TCP 段中发送
+        commands = (
+            rtmp_command("releaseStream", 2, None, key, chunk_size=chunk_size)
+            + rtmp_command("FCPublish", 3, None, key, chunk_size=chunk_size, fmt=1)
+            + rtmp_command("createStream", 4, None, chunk_size=chunk_size, fmt=1)
+        )
+        flow.send(t, commands)
+        flow.send(t + 0.03, rtmp_command("_result", 4, None, 1.0, chunk_size=chunk_size),
+                  from_client=False)
+        t += 0.04
+        flow.send(t, rtmp_command("publish", 5, None, key, "live", chunk_size=chunk_size,
+                                  stream_id=1))
+        t += 0.01
+        self.credentials.append((t, server, key))
+
+        if video_mbps and duration:
+            self.rtmp_media(flow, t, video_mbps, duration)
+        return flow
+
+    def rtmp_media(self, flow, t, mbps, duration, chunk_size=4096, fps=30):
+        """生成指定码率的音视频块"""
+        flow.send(t, rtmp_message(2, RTMP_SET_CHUNK_SIZE, struct.pack("!I", chunk_size), 128))
+        frame_bytes = max(int(mbps * 1_000_000 / 8 / fps), 16)
+        for index in range(int(duration * fps)):
+            frame_time = t + index / fps
+            marker = b"\x17\x01" if index % fps == 0 else b"\x27\x01"
+            video = marker + self.rng.randbytes(frame_bytes - 2)
+            flow.send(frame_time, rtmp_message(
+                4, RTMP_VIDEO, video, chunk_size, timestamp=int(index * 1000 / fps),
+                stream_id=1,
+            ))
+            if index % 2 == 0:
+                audio = b"\xaf\x01" + self.rng.randbytes(200)
+                flow.send(frame_time, rtmp_message(
+                    5, RTMP_AUDIO, audio, chunk_size, timestamp=int(index * 1000 / fps),
+                    stream_id=1,
+                ))
+
+    def https_noise(self, t, mbps, duration, flows=4, client="192.168.1.100"):
+        """生成 HTTPS 干扰流量：ClientHello 后跟随应用数据记录"""
+        for index in range(flows):
+            flow = TcpFlow(self, client, f"203.0.113.{10 + index}",
+                           self.rng.randint(49152, 65535), 443)
+            start = flow.handshake(t + index * 0.01)
+            hello = b"\x16\x03\x01\x02\x00\x01\x00\x01\xfc\x03\x03" + self.rng.randbytes(509)
+            flow.send(start, hello)
+            flow.send(start + 0.02, b"\x16\x03\x03" + self.rng.randbytes(2800), from_client=False)
+
+            record_bytes = 4096
+            records = int(mbps * 1_000_000 / 8 * duration / record_bytes / flows)
+            for record in range(records):
+                record_time = start + 0.05 + record * duration / max(records, 1)
+                data = b"\x17\x03\x03" + struct.pack("!H", record_bytes) + self.rng.randbytes(
+                    record_bytes
+                )
+                # 下行为主，上行偶尔有请求
+                flow.send(record_time, data, from_client=(record % 8 == 0))
+
+    def udp_noise(self, t, mbps, duration, client="192.168.1.100"):
+        """生成 QUIC 风格的 UDP 干扰流量"""
+        datagram = 1200
+        count = int(mbps * 1_000_000 / 8 * duration / datagram)
+        for index in range(count):
+            payload = b"\x40" + self.rng.randbytes(datagram - 1)
+            self.add(
+                t + index * duration / max(count, 1),
+                build_frame("198.51.100.7", client, PROTO_UDP, build_udp(443, 50000, payload),
+                            self.next_ip_id()),
+            )
+
+
+def generate(duration=5.0, video_mbps=8.0, https_mbps=2.0, udp_mbps=1.0, credential_at=1.0,
+             background_stream=True, chunk_size=128, split_connect=False, rtmp_port=1935, seed=0,
+             streamers=1, dns=False):
+    """
+    生成混合流量
+    @param duration: 流量时长（秒）
+    @param video_mbps: 视频推流码率
+    @param https_mbps: HTTPS 干扰流量码率
+    @param udp_mbps: UDP 干扰流量码率
+    @param credential_at: 目标 RTMP 会话开始的时间（秒）
+    @param background_stream: 是否包含一条已经在推流中的后台视频流（如其他直播软件）
+    @param chunk_size: 命令消息的 RTMP 块大小
+    @param split_connect: 是否将 connect 命令拆分到两个 TCP 段
+    @param rtmp_port: 目标 RTMP 会话的服务器端口
+    @param seed: 随机种子
+    @param streamers: 推流客户端数量，多个客户端（如同一台电脑上的多个账号或镜像端口上的多台主播电脑）
+        依次间隔 0.5 秒开始推流，各自使用不同的推流信息
+    @param dns: 是否在每个推流会话开始前加入推流域名的 DNS 响应
+    @return: (帧列表 [(时间戳, 帧字节)], 推流信息列表 [(时间戳, 推流地址, 推流码)])
+    """
+    trace = Trace(seed)
+    start = 1_700_000_000.0
+
+    if https_mbps:
+        trace.https_noise(start, https_mbps, duration)
+    if udp_mbps:
+        trace.udp_noise(start, udp_mbps, duration)
+    if background_stream and video_mbps:
+        # 已在推流中的视频流，只包含媒体数据
+        flow = TcpFlow(trace, "192.168.1.100", "198.51.100.20", trace.rng.randint(49152, 65535), 1935)
+        trace.rtmp_media(flow, start, video_mbps, duration)
+
+    for index in range(streamers):
+        server, key = make_credentials(trace.rng)
+        session_at = credential_at + index * 0.5
+        if dns:
+            host = server.split("/")[2]
+            client = f"192.168.1.{100 + index}"
+            trace.add(start + session_at - 0.05, build_frame(
+                "192.168.1.1", client, PROTO_UDP,
+                build_udp(53, trace.rng.randint(49152, 65535), build_dns_response(
+                    host, [f"198.51.100.{30 + index}"], transaction=trace.rng.getrandbits(16),
+                )),
+                trace.next_ip_id(),
+            ))
+        trace.rtmp_session(
+            start + session_at, f"198.51.100.{30 + index}", server, key,
+            client=f"192.168.1.{100 + index}",
+            video_mbps=video_mbps, duration=max(duration - session_at, 0),
+            chunk_size=chunk_size, split_connect=split_connect, port=rtmp_port,
+        )
+    return trace.sorted_frames(), trace.credentials
+
+
+def write_pcap(path, frames):
+    """将帧写入 pcap 文件"""
+    from scapy.utils import RawPcapWriter
+
+    with RawPcapWriter(path, linktype=1) as writer:
+        writer.write_header(None)
+        for timestamp, frame in frames:
+            sec = int(timestamp)
+            writer.write_packet(frame, sec=sec, usec=int((timestamp - sec) * 1_000_000))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成合成 RTMP 抓包流量")
+    parser.add_argument("output", help="输出 pcap 文件路径")
+    parser.add_argument("--duration", type=float, default=5.0, help="流量时长（秒）")
+    parser.add_argument("--video-mbps", type=float, default=8.0, help="视频推流码率")
+    parser.add_argument("--https-mbps", type=float, default=2.0, help="HTTPS 干扰流量码率")
+    parser.add_argument("--udp-mbps", type=float, default=1.0, help="UDP 干扰流量码率")
+    parser.add_argument("--credential-at", type=float, default=1.0, help="开始推流的时间（秒）")
+    parser.add_argument("--chunk-size", type=int, default=128, help="命令消息的 RTMP 块大小")
+    parser.add_argument("--split-connect", action="store_true", help="将 connect 拆分到两个 TCP 段")
+    parser.add_argument("--rtmp-port", type=int, default=1935, help="目标 RTMP 会话的服务器端口")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--streamers", type=int, default=1, help="推流客户端数量")
+    parser.add_argument("--dns", action="store_true", help="在推流会话开始前加入推流域名的 DNS 响应")
+    args = parser.parse_args()
+
+    frames, credentials = generate(
+        duration=args.duration, video_mbps=args.video_mbps, https_mbps=args.https_mbps,
+        udp_mbps=args.udp_mbps, credential_at=args.credential_at, chunk_size=args.chunk_size,
+        split_connect=args.split_connect, rtmp_port=args.rtmp_port, seed=args.seed,
+        streamers=args.streamers, dns=args.dns,
+    )
+    write_pcap(args.output, frames)
+    print(f"已写入 {len(frames)} 个数据包到 {args.output}")
+    for _, server, key in credentials:
+        print(f"推流地址: {server}\n推流码: {key}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""命令行一次性获取推流信息
+
+不启动图形界面，按参数以抓包模式或日志模式获取一组推流服务器地址和推流码，
+以 JSON 输出到标准输出后退出，日志输出到标准错误，便于在计划任务和脚本中调用。
+获取成功时退出码为 0，超时或捕获结束仍未获取到时为 1，无法开始捕获时为 2。
+
+用法:
+    python -m cli --timeout 120
+    python -m cli --interface 以太网 --restart-sdk
+    python -m cli --restart-sdk --process-scope
+    python -m cli --mode log --timeout 60
+    python -m cli --pcap capture.pcapng
+"""
+import argparse
+import asyncio
+import json
+import sys
+from datetime import datetime
+
+from core.backends import BACKEND_AF_PACKET, BACKEND_SCAPY
+from core.process_scope import MEDIA_SDK_PROCESS, restart_media_sdk
+
+MODE_PACKET = "packet"
+MODE_LOG = "log"
+
+
+class ConsoleLogger:
+    """输出到标准错误的日志对象，接口与 utils.logger.Logger 一致，不依赖 tkinter"""
+
+    def __init__(self, verbose=False):
+        self.verbose = verbose
+
+    def info(self, message):
+        self._write(message)
+
+    def packet(self, message):
+        if self.verbose:
+            self._write(message)
+
+    def error(self, message):
+        self._write(message)
+
+    def _write(self, message):
+        if not message.startswith("[20"):
+            message = f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {message}"
+        print(message, file=sys.stderr, flush=True)
+
+
+def create_capture(args, logger):
+    """
+    按参数创建并启动捕获
+    @return: 已开始捕获的 PacketCapture 或 LogCapture，无法开始时返回 None
+    """
+    if args.mode == MODE_LOG:
+        from core.log_capture import LogCapture
+
+        capture = LogCapture(logger)
+        return capture if capture.start() else None
+
+    from core.backends import create_backend
+    from core.capture import PacketCapture
+
+    backend = create_backend(args.backend)
+    interfaces = args.interface or [iface["name"] for iface in backend.list_interfaces()]
+    capture = PacketCapture(logger, backend=backend)
+    # 一次性获取，不受配置 capture_stop_after 影响；超时由调用方控制
+    capture.set_stop_condition(matches=1)
+    if args.process_scope:
+        capture.set_process_scope(args.process_scope)
+    if len(interfaces) == 1:
+        started = capture.start(interfaces[0])
+    else:
+        started = capture.start_multi(interfaces)
+    if not started:
+        return None
+    if args.restart_sdk:
+        # 捕获开始后再结束推流进程，重新连接时的握手和命令才能被捕获到
+        restart_media_sdk(logger)
+    return capture
+
+
+def replay_file(path, logger):
+    """从数据包文件中获取推流信息，返回 (推流服务器地址, 推流码)，未获取到时返回 None"""
+    from core.capture import PacketCapture
+
+    capture = PacketCapture(logger)
+    capture.set_stop_condition(matches=1)
+    capture.replay(path)
+    credentials = capture.get_credentials()
+    if not credentials:
+        return None
+    return credentials[-1]["server_address"], credentials[-1]["stream_code"]
+
+
+async def wait_for_result(capture, timeout):
+    """等待推流信息，超时返回 None"""
+    try:
+        return await capture.wait_for_credentials(timeout=timeout)
+    except asyncio.TimeoutError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="命令行一次性获取抖音直播推流信息")
+    parser.add_argument(
+        "--mode", choices=(MODE_PACKET, MODE_LOG), default=MODE_PACKET,
+        help="packet 为抓包模式，log 为读取直播伴侣日志",
+    )
+    parser.add_argument("--interface", action="append", help="抓包接口名，可重复，默认使用全部接口")
+    parser.add_argument(
+        "--backend", choices=(BACKEND_SCAPY, BACKEND_AF_PACKET),
+        help="抓包后端，默认读取配置 capture_backend",
+    )
+    parser.add_argument("--pcap", help="从数据包文件读取，而不是实时抓包")
+    parser.add_argument("--timeout", type=float, default=None, help="最长等待时间（秒），默认一直等待")
+    parser.add_argument(
+        "--restart-sdk", action="store_true",
+        help="开始抓包后结束 MediaSDK_Server 进程，使直播伴侣重新连接推流服务器",
+    )
+    parser.add_argument(
+        "--process-scope", nargs="?", const=MEDIA_SDK_PROCESS, metavar="NAME",
+        help=f"只捕获指定进程（默认 {MEDIA_SDK_PROCESS}）的连接，进程打开连接后按连接重建过滤器",
+    )
+    parser.add_argument("--verbose", action="store_true", help="同时输出数据包日志")
+    args = parser.parse_args()
+
+    logger = ConsoleLogger(args.verbose)
+    if args.pcap:
+        result = replay_file(args.pcap, logger)
+    else:
+        capture = create_capture(args, logger)
+        if capture is None:
+            logger.error("无法开始捕获")
+            sys.exit(2)
+        try:
+            result = asyncio.run(wait_for_result(capture, args.timeout))
+        except KeyboardInterrupt:
+            result = None
+        finally:
+            capture.stop()
+
+    server_address, stream_code = result or (None, None)
+    print(json.dumps(
+        {"server_address": server_address, "stream_code": stream_code}, ensure_ascii=False,
+    ))
+    sys.exit(0 if result else 1)
+
+
+if __name__ == "__main__":
+    main()
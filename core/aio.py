@@ -0,0 +1,116 @@
+import asyncio
+
+# 事件类型
+EVENT_CREDENTIALS = "credentials"  # 获取到一组推流信息
+EVENT_UPDATE = "update"  # 持续监听模式下推流信息变化
+EVENT_FINISHED = "finished"  # 捕获因达到停止条件而结束
+EVENT_STOPPED = "stopped"  # 调用 stop 停止捕获
+
+# 之后不会再有事件的事件类型
+FINAL_EVENTS = (EVENT_FINISHED, EVENT_STOPPED)
+
+
+class AsyncCaptureMixin:
+    """为 PacketCapture 和 LogCapture 提供 asyncio 接口
+
+    回调在抓包、处理或日志监控线程中调用（PacketCapture 在释放 self.lock 之后调用），这里只通过
+    loop.call_soon_threadsafe 将事件交给订阅者所在的事件循环，不在回调线程中等待。
+    事件为字典，type 为 EVENT_* 之一，其余字段见 events。
+    """
+
+    def _init_events(self):
+        """初始化事件订阅，在子类的 __init__ 中调用"""
+        self.subscribers = []
+        self.add_callback(lambda server_address, stream_code: self._publish({
+            "type": EVENT_CREDENTIALS,
+            "server_address": server_address,
+            "stream_code": stream_code,
+        }))
+        if hasattr(self, "add_finish_callback"):
+            self.add_finish_callback(lambda credentials: self._publish({
+                "type": EVENT_FINISHED,
+                "credentials": credentials,
+            }))
+        if hasattr(self, "add_update_callback"):
+            self.add_update_callback(lambda server_address, stream_code, latency: self._publish({
+                "type": EVENT_UPDATE,
+                "server_address": server_address,
+                "stream_code": stream_code,
+                "latency": latency,
+            }))
+
+    def _publish(self, event):
+        """将事件交给所有订阅者，可以在任意线程中调用"""
+        for deliver in list(self.subscribers):
+            try:
+                deliver(event)
+            except RuntimeError:
+                # 订阅者的事件循环已经关闭
+                self._unsubscribe(deliver)
+
+    def _subscribe(self):
+        """在当前事件循环中订阅事件，返回 (投递函数, 事件队列)"""
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+
+        def deliver(event):
+            loop.call_soon_threadsafe(queue.put_nowait, event)
+
+        self.subscribers.append(deliver)
+        return deliver, queue
+
+    def _unsubscribe(self, deliver):
+        try:
+            self.subscribers.remove(deliver)
+        except ValueError:
+            pass
+
+    def _latest_credentials(self):
+        """本次会话已获取的推流信息 (推流服务器地址, 推流码)，还没有时返回 None"""
+        if self.server_address and self.stream_code:
+            return self.server_address, self.stream_code
+        return None
+
+    async def wait_for_credentials(self, timeout=None):
+        """
+        等待推流信息，本次会话已经获取到或捕获未在进行时立即返回
+        @param timeout: 最长等待时间（秒），None 表示一直等待，超时抛出 asyncio.TimeoutError
+        @return: (推流服务器地址, 推流码)，捕获结束仍未获取到时返回 None
+        """
+        deliver, queue = self._subscribe()
+        try:
+            latest = self._latest_credentials()
+            if latest is not None or not self.is_capturing:
+                return latest
+
+            async def _wait():
+                while True:
+                    event = await queue.get()
+                    if event["type"] in (EVENT_CREDENTIALS, EVENT_UPDATE):
+                        return event["server_address"], event["stream_code"]
+                    if event["type"] in FINAL_EVENTS:
+                        return self._latest_credentials()
+
+            return await asyncio.wait_for(_wait(), timeout)
+        finally:
+            self._unsubscribe(deliver)
+
+    async def events(self):
+        """
+        异步迭代捕获事件，捕获结束或停止后迭代结束
+
+        Yields:
+            dict: {"type": EVENT_CREDENTIALS, "server_address", "stream_code"}、
+                {"type": EVENT_UPDATE, "server_address", "stream_code", "latency"}（持续监听模式）、
+                {"type": EVENT_FINISHED, "credentials"}（PacketCapture 达到停止条件，
+                或 LogCapture 从日志中读取到推流信息）或 {"type": EVENT_STOPPED}
+        """
+        deliver, queue = self._subscribe()
+        try:
+            while True:
+                event = await queue.get()
+                yield event
+                if event["type"] in FINAL_EVENTS:
+                    return
+        finally:
+            self._unsubscribe(deliver)
@@ -0,0 +1,405 @@
+import mmap
+import os
+from abc import ABC, abstractmethod
+import socket
+import struct
+import time
+
+from core.packet import DLT_EN10MB, DLT_RAW
+from utils.config import get_config
+
+# 抓包后端名称，配置 capture_backend 选择实时捕获使用的后端
+BACKEND_SCAPY = "scapy"  # scapy 监听套接字，Windows 上为 Npcap
+BACKEND_AF_PACKET = "af_packet"  # Linux AF_PACKET TPACKET_V3 内存映射环形缓冲
+BACKEND_PCAP = "pcap"  # pcap/pcapng 文件回放
+
+# Linux AF_PACKET 常量（linux/if_packet.h）
+ETH_P_ALL = 0x0003
+SOL_PACKET = 263
+PACKET_ADD_MEMBERSHIP = 1
+PACKET_RX_RING = 5
+PACKET_VERSION = 10
+PACKET_MR_PROMISC = 1
+TPACKET_V3 = 2
+TP_STATUS_KERNEL = 0
+TP_STATUS_USER = 1
+# 接口的硬件类型（linux/if_arp.h）
+ARPHRD_ETHER = 1
+ARPHRD_PPP = 512
+ARPHRD_LOOPBACK = 772
+ARPHRD_NONE = 0xFFFE
+# 硬件类型对应的链路层类型：以太网和回环接口带以太网头，PPP 和没有链路层头的接口（如 tun）帧从 IP 头开始；
+# 其他类型（如无线监听模式、IPIP 隧道）的帧格式不同，不打开这些接口
+ARPHRD_LINKTYPES = {
+    ARPHRD_ETHER: DLT_EN10MB,
+    ARPHRD_LOOPBACK: DLT_EN10MB,
+    ARPHRD_PPP: DLT_RAW,
+    ARPHRD_NONE: DLT_RAW,
+}
+
+# 环形缓冲的块大小和块数，内核按块交给用户态，块写满或超时后才可读
+TPACKET_BLOCK_SIZE = 1 << 20
+TPACKET_BLOCK_COUNT = 8
+# 未写满的块最多等待多久交给用户态（毫秒），流量很少时决定抓包延迟
+TPACKET_BLOCK_TIMEOUT = 10
+# tpacket_req3 中的帧大小，TPACKET_V3 按实际长度存放帧，只用于计算帧数
+TPACKET_FRAME_SIZE = 2048
+
+# struct tpacket_block_desc：version, offset_to_priv, block_status, num_pkts, offset_to_first_pkt
+_unpack_block = struct.Struct("IIIII").unpack_from
+# struct tpacket3_hdr：tp_next_offset, tp_sec, tp_nsec, tp_snaplen, tp_len, tp_status, tp_mac, tp_net
+_unpack_frame = struct.Struct("IIIIIIHH").unpack_from
+_pack_status = struct.Struct("I").pack_into
+# block_status 在块描述符中的偏移
+BLOCK_STATUS_OFFSET = 8
+
+# 回放句柄每次读取的最多帧数
+REPLAY_BATCH = 64
+# 按原始时间间隔回放时每次最多等待的时间（秒），使抓包线程能及时响应停止
+REPLAY_WAIT = 0.1
+
+
+def get_interface_list():
+    """获取网络接口列表，非 Windows 平台（如 Linux 构建机）使用 scapy 通用接口列表"""
+    try:
+        from scapy.arch.windows import get_windows_if_list
+    except ImportError:
+        from scapy.interfaces import get_if_list
+
+        return [{"name": name} for name in get_if_list()]
+    return get_windows_if_list()
+
+
+def load_scapy_layers():
+    """导入抓包用到的 scapy 平台模块和协议层（链路层、IPv4/TCP），不导入 scapy.all 的其余协议
+
+    scapy 的监听套接字在打开时按 conf.l2types 确定链路层类型，快速解析无法处理的帧
+    也按 conf.l2types 交给 scapy 解析，因此需要在打开套接字或解析之前调用。重复调用没有开销。
+    """
+    import scapy.arch  # noqa: F401  导入时按平台设置 conf.L2listen
+    import scapy.layers.inet  # noqa: F401
+    import scapy.layers.l2  # noqa: F401
+
+
+def read_pcap_frames(path):
+    """逐个读取 pcap/pcapng 文件中的原始帧
+
+    Yields:
+        tuple: (时间戳, 原始帧字节, 链路层类型)
+    """
+    from scapy.utils import RawPcapReader
+
+    with RawPcapReader(path) as reader:
+        linktype = getattr(reader, "linktype", None)
+        for frame, meta in reader:
+            if hasattr(meta, "tsresol"):
+                # pcapng
+                timestamp = ((meta.tshigh << 32) | meta.tslow) / meta.tsresol
+                yield timestamp, frame, meta.linktype
+            else:
+                fraction = 1_000_000_000 if getattr(reader, "nano", False) else 1_000_000
+                yield meta.sec + meta.usec / fraction, frame, linktype
+
+
+class CaptureBackend(ABC):
+    """抓包后端，负责列出接口和打开抓包句柄
+
+    句柄需要提供：
+        fileno(): 可以用 select/epoll 等待的文件描述符（Windows 上使用 select 方法）
+        select(handles, timeout): 等待多个句柄中任意一个可读，返回可读的句柄列表
+        recv_frames(): 读取当前可读的帧，返回 [(帧, 链路层类型)]，没有数据时返回空列表，
+            数据包文件读完时抛出 EOFError
+        set_filter(bpf): 替换 BPF 过滤表达式，不需要重新打开句柄
+        close(): 关闭句柄
+    可选的 pcap_fd（libpcap/Npcap）或 ins（AF_PACKET 套接字）属性用于读取内核丢包数。
+    """
+
+    name = None
+
+    @abstractmethod
+    def list_interfaces(self):
+        """
+        列出可以捕获的接口
+        @return: [{"name": 接口名, ...}]
+        """
+
+    @abstractmethod
+    def open(self, interface, capture_filter=None):
+        """
+        打开接口的抓包句柄
+        @param interface: 接口名
+        @param capture_filter: CaptureFilter，None 时不设置过滤器和截断长度
+        @return: 抓包句柄
+        """
+
+
+class SuperSocketHandle:
+    """scapy 监听套接字（SuperSocket）的句柄包装，其余属性直接访问原套接字"""
+
+    def __init__(self, sock):
+        from scapy.config import conf
+
+        self.sock = sock
+        self.layer2num = conf.l2types.layer2num
+
+    def __getattr__(self, name):
+        return getattr(self.sock, name)
+
+    def recv_frames(self):
+        cls, frame, _ = self.sock.recv_raw()
+        if frame is None:
+            return []
+        return [(frame, self.layer2num.get(cls, DLT_EN10MB))]
+
+    def select(self, handles, timeout):
+        # scapy 的 select 需要原始套接字，唤醒管道等其他句柄原样传入
+        sockets = [getattr(handle, "sock", handle) for handle in handles]
+        ready = self.sock.select(sockets, timeout)
+        return [handle for handle, sock in zip(handles, sockets) if sock in ready]
+
+    def set_filter(self, bpf):
+        pcap_fd = getattr(self.sock, "pcap_fd", None)
+        if pcap_fd is not None:
+            pcap_fd.setfilter(bpf)
+            return
+        from scapy.arch.linux import attach_filter
+
+        attach_filter(self.sock.ins, bpf, self.sock.iface)
+
+    def close(self):
+        self.sock.close()
+
+
+class ScapyBackend(CaptureBackend):
+    """scapy 抓包后端：Windows 上使用 Npcap，其他平台使用 libpcap 或 scapy 的原生套接字"""
+
+    name = BACKEND_SCAPY
+
+    def list_interfaces(self):
+        return get_interface_list()
+
+    def open(self, interface, capture_filter=None):
+        load_scapy_layers()
+        if capture_filter is not None:
+            return SuperSocketHandle(capture_filter.open_socket(interface))
+        from scapy.config import conf
+
+        return SuperSocketHandle(conf.L2listen(iface=interface))
+
+
+class TpacketHandle:
+    """Linux AF_PACKET TPACKET_V3 抓包句柄
+
+    内核将帧直接写入与用户态共享的内存映射环形缓冲，按块交给用户态：读取一个块中的所有帧
+    不需要系统调用，帧头在共享内存中原地解析，只有需要交给处理线程的帧（按截断长度）复制一次，
+    随后立即将块归还内核。
+    """
+
+    def __init__(self, interface, snaplen=None, promisc=True, block_size=TPACKET_BLOCK_SIZE,
+                 block_count=TPACKET_BLOCK_COUNT, block_timeout=TPACKET_BLOCK_TIMEOUT):
+        """
+        打开抓包句柄
+        @param interface: 接口名
+        @param snaplen: 每帧最多复制的字节数，None 表示复制完整的帧
+        @param promisc: 是否开启混杂模式
+        @param block_size: 环形缓冲的块大小（字节，页大小的整数倍）
+        @param block_count: 块数
+        @param block_timeout: 未写满的块最多等待多久交给用户态（毫秒）
+        """
+        self.iface = interface
+        self.snaplen = snaplen
+        self.block_size = block_size
+        self.block_count = block_count
+        self.block = 0
+        self.ring = None
+        self.view = None
+        self.ins = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+        try:
+            self.ins.setsockopt(SOL_PACKET, PACKET_VERSION, TPACKET_V3)
+            self.ins.setsockopt(SOL_PACKET, PACKET_RX_RING, struct.pack(
+                "IIIIIII", block_size, block_count, TPACKET_FRAME_SIZE,
+                block_size * block_count // TPACKET_FRAME_SIZE, block_timeout, 0, 0,
+            ))
+            self.ring = mmap.mmap(
+                self.ins.fileno(), block_size * block_count, mmap.MAP_SHARED,
+                mmap.PROT_READ | mmap.PROT_WRITE,
+            )
+            self.view = memoryview(self.ring)
+            self.ins.bind((interface, ETH_P_ALL))
+            if promisc:
+                self.ins.setsockopt(SOL_PACKET, PACKET_ADD_MEMBERSHIP, struct.pack(
+                    "IHH8s", socket.if_nametoindex(interface), PACKET_MR_PROMISC, 0, b"",
+                ))
+            hatype = self.ins.getsockname()[3]
+            self.linktype = ARPHRD_LINKTYPES.get(hatype)
+            if self.linktype is None:
+                raise OSError(f"不支持的接口硬件类型: {hatype}")
+        except Exception:
+            self.close()
+            raise
+
+    def fileno(self):
+        return self.ins.fileno()
+
+    @staticmethod
+    def select(handles, timeout):
+        import select
+
+        return select.select(handles, [], [], timeout)[0]
+
+    def recv_frames(self):
+        """读取当前块中的所有帧并将块归还内核，当前块尚未交给用户态时返回空列表"""
+        view = self.view
+        start = self.block * self.block_size
+        _, _, status, count, offset = _unpack_block(view, start)
+        if not status & TP_STATUS_USER:
+            return []
+        frames = []
+        snaplen = self.snaplen
+        linktype = self.linktype
+        position = start + offset
+        for _ in range(count):
+            next_offset, _, _, captured, _, _, mac, _ = _unpack_frame(view, position)
+            if snaplen is not None and captured > snaplen:
+                captured = snaplen
+            frame_start = position + mac
+            frames.append((bytes(view[frame_start:frame_start + captured]), linktype))
+            position += next_offset
+        _pack_status(view, start + BLOCK_STATUS_OFFSET, TP_STATUS_KERNEL)
+        self.block = (self.block + 1) % self.block_count
+        return frames
+
+    def set_filter(self, bpf):
+        from scapy.arch.linux import attach_filter
+
+        attach_filter(self.ins, bpf, self.iface)
+
+    def close(self):
+        if self.ring is not None:
+            self.view.release()
+            self.ring.close()
+            self.ring = None
+        self.ins.close()
+
+
+class AfPacketBackend(CaptureBackend):
+    """Linux AF_PACKET 抓包后端，使用 TPACKET_V3 内存映射环形缓冲，需要 root 或 CAP_NET_RAW"""
+
+    name = BACKEND_AF_PACKET
+
+    def list_interfaces(self):
+        return [{"name": name} for _, name in socket.if_nameindex()]
+
+    def open(self, interface, capture_filter=None):
+        bpf = capture_filter.build() if capture_filter is not None else None
+        handle = TpacketHandle(interface, capture_filter.snaplen if bpf else None)
+        if bpf:
+            try:
+                handle.set_filter(bpf)
+            except Exception:
+                handle.close()
+                raise
+            # 设置过滤器之前可能已经收到了不匹配的帧
+            while handle.recv_frames():
+                pass
+        return handle
+
+
+class PcapReplayHandle:
+    """将 pcap/pcapng 文件作为抓包句柄，帧经过与实时捕获相同的抓包线程和处理线程
+
+    句柄始终可读；speed 不为 0 时按原始时间间隔放出帧，文件读完后抛出 EOFError。
+    数据包文件已经是捕获结果，不再应用 BPF 过滤器。
+    """
+
+    def __init__(self, path, speed=None):
+        """
+        打开数据包文件
+        @param path: pcap 或 pcapng 文件路径
+        @param speed: 回放速度，None 或 0 表示尽可能快，1.0 表示按原始时间间隔
+        """
+        self.iface = path
+        self.speed = speed
+        self.frames = read_pcap_frames(path)
+        self.pending = None
+        self.first_time = None
+        self.started = None
+        # 始终可读的管道，使句柄可以和实时抓包句柄一起等待
+        self.reader, self.writer = os.pipe()
+        os.write(self.writer, b"\x00")
+
+    def fileno(self):
+        return self.reader
+
+    @staticmethod
+    def select(handles, timeout):
+        ready = [handle for handle in handles if isinstance(handle, PcapReplayHandle)]
+        if ready:
+            return ready
+        time.sleep(timeout)
+        return []
+
+    def recv_frames(self):
+        frames = []
+        for _ in range(REPLAY_BATCH):
+            item = self.pending
+            self.pending = None
+            if item is None:
+                item = next(self.frames, None)
+                if item is None:
+                    if frames:
+                        break
+                    raise EOFError(self.iface)
+            timestamp, frame, linktype = item
+            if self.speed:
+                now = time.perf_counter()
+                if self.first_time is None:
+                    self.first_time, self.started = timestamp, now
+                delay = (timestamp - self.first_time) / self.speed - (now - self.started)
+                if delay > 0:
+                    self.pending = item
+                    if not frames:
+                        time.sleep(min(delay, REPLAY_WAIT))
+                    break
+            frames.append((frame, linktype))
+        return frames
+
+    def set_filter(self, bpf):
+        pass
+
+    def close(self):
+        self.frames.close()
+        os.close(self.reader)
+        os.close(self.writer)
+
+
+class PcapReplayBackend(CaptureBackend):
+    """数据包文件回放后端，接口名为文件路径，用于在没有网卡权限的环境中测试完整的抓包流程"""
+
+    name = BACKEND_PCAP
+
+    def __init__(self, paths, speed=None):
+        """
+        @param paths: pcap/pcapng 文件路径列表
+        @param speed: 回放速度，见 PcapReplayHandle
+        """
+        self.paths = list(paths)
+        self.speed = speed
+
+    def list_interfaces(self):
+        return [{"name": path} for path in self.paths]
+
+    def open(self, interface, capture_filter=None):
+        return PcapReplayHandle(interface, self.speed)
+
+
+def create_backend(name=None):
+    """
+    创建实时捕获使用的抓包后端
+    @param name: 后端名称，默认读取配置 capture_backend，不支持的平台上退回到 scapy 后端
+    @return: CaptureBackend
+    """
+    name = name or get_config("capture_backend") or BACKEND_SCAPY
+    if name == BACKEND_AF_PACKET and hasattr(socket, "AF_PACKET"):
+        return AfPacketBackend()
+    return ScapyBackend()
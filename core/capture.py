@@ -1,33 +1,137 @@
-from scapy.all import sniff, IP, TCP, Raw
+import os
 import re
 import threading
+import time
 from datetime import datetime
+from socket import inet_ntoa
+from core.aio import EVENT_STOPPED, AsyncCaptureMixin
+from core.backends import create_backend, load_scapy_layers, read_pcap_frames
+from core.capture_filter import CaptureFilter, PacketRateMeter
+from core.packet import DLT_EN10MB, decode_tcp, decode_udp
+from core.dedup import SegmentDeduplicator, dedup_enabled
+from core.dns import DNS_PORT, IngestLearner, dns_learning_enabled
+from core.flow import FLOW_DROP, FLOW_HANDSHAKE, FLOW_UNKNOWN, FlowTable
+from core.pipeline import (
+    DROP_POLL_INTERVAL, SAMPLE_INTERVAL, FrameRing, HandleSelector, InterfaceCounters, KernelDrops,
+)
+from core.probe import probe_interfaces
+from core.process_scope import ProcessScope, process_scope_name
+from core.pruning import INTERFACE_ACTIVE, InterfacePruner, pruning_enabled
+from core.reassembly import TCP_SYN, StreamReassembler
+from core.recorder import ControlRecorder, recording_enabled
+from core.rtmp import RtmpParser
+from core.session import (
+    LATENCY_SAMPLE_INTERVAL, CandidateBuffer, FlowCredentials, SessionBudget, SessionStats,
+    process_rss,
+)
+from utils.config import get_config
 
+# 抓包线程等待数据的超时时间（秒），停止时通过唤醒管道立即返回，不依赖该超时
+WAIT_INTERVAL = 1.0
+# 停止时等待线程退出的最长时间（秒）
+STOP_TIMEOUT = 1.0
 
-class PacketCapture:
-    def __init__(self, logger):
+# 处理线程每处理多少帧测量一次单帧处理耗时
+COST_SAMPLE_FRAMES = 256
+# 单接口抓包线程每收到多少帧读取一次内核丢包数（另外在等待超时和关闭时读取）
+DROP_POLL_PACKETS = 1024
+
+# 默认获取到一组推流信息后停止捕获
+DEFAULT_STOP_AFTER = 1
+
+# 多接口捕获时每个接口使用独立线程，默认在单线程事件循环中读取所有接口
+CAPTURE_MODE_THREADS = "threads"
+
+# 在字节流上判断是否包含 RTMP 命令
+CONNECT_PATTERN = re.compile(rb"connect")
+FCPUBLISH_PATTERN = re.compile(rb"FCPublish")
+
+
+class PacketCapture(AsyncCaptureMixin):
+    def __init__(self, logger, backend=None):
+        """
+        @param logger: 日志对象
+        @param backend: 抓包后端（见 core.backends），默认按配置 capture_backend 创建
+        """
         self.logger = logger
+        self.backend = backend or create_backend()
         self.is_capturing = False
         self.capture_thread = None
         self.callbacks = []
+        # 捕获因达到停止条件（获取到足够的推流信息或超时）而结束时的回调
+        self.finish_callbacks = []
+        # 持续监听模式下推流信息变化时的回调
+        self.update_callbacks = []
+        # 是否处于持续监听模式，见 watch
+        self.watching = False
+        # 最近获取到的推流服务器地址和推流码
         self.server_address = None
         self.stream_code = None
+        # 本次会话获取到的每组推流信息（已去重）
+        self.credentials = []
+        # 每个推流连接上已提取的推流信息，以及每个主机最近的推流服务器地址
+        self.flow_credentials = {}
+        self.host_servers = {}
+        # 停止条件，None 时读取配置 capture_stop_after 和 capture_timeout
+        self.stop_after = None
+        self.timeout = None
+        self.match_limit = DEFAULT_STOP_AFTER
+        self.deadline = None
+        # 多接口捕获的读取方式，None 时读取配置 capture_mode
+        self.capture_mode = None
         self.capture_threads = {}
+        # 过滤器版本，捕获过程中过滤器改变时加一，由持有句柄的抓包线程在两次读取之间替换过滤器
+        self.filter_generation = 0
         self.interface_status = {}
+        # 每个接口的抓包计数
+        self.interface_counters = {}
         self.lock = threading.Lock()
+        # 持有锁时产生的回调通知，释放锁后再执行，回调中可以调用 get_credentials 等加锁的方法
+        self.notifications = []
+        self.capture_filter = CaptureFilter()
+        self.rate_meter = PacketRateMeter(logger, drops=lambda: self.ring.dropped)
+        self.reassembler = StreamReassembler()
+        self.flow_table = FlowTable(is_server_port=self.capture_filter.is_server_port)
+        # 抓包线程与处理线程之间的帧缓冲
+        self.ring = FrameRing()
+        # 单次会话的内存预算，以及可选保留的候选 RTMP 控制段
+        self.budget = SessionBudget()
+        self.candidates = None
+        # 配置 capture_record 时将候选 RTMP 流的控制段写入轮转的 pcapng 文件
+        self.recorder = None
+        # 配置 capture_dns 时从 DNS 响应中学习推流服务器地址，并将这些地址加入抓包过滤器
+        self.ingest = None
+        # 只捕获指定进程（默认为 MediaSDK_Server）的连接，None 时读取配置 capture_process_scope
+        self.scope_process = None
+        self.process_scope = None
+        # 本次会话的检查与过滤计数、处理耗时和各阶段耗时
+        self.stats = SessionStats()
+        self.workers = []
+        # 多接口单线程事件循环中按流量裁剪接口
+        self.pruner = None
+        # 多接口捕获时过滤在多个接口上重复出现的段
+        self.deduplicator = None
+        # 本次会话的停止事件，以及用于立即唤醒等待中的抓包线程的管道
+        self.stop_event = threading.Event()
+        self.wakeup = None
+        # asyncio 接口的事件订阅，见 core.aio
+        self._init_events()
 
     def start(self, interface_display_name):
-        """开始捕获数据包"""
+        """
+        开始捕获数据包
+        @param interface_display_name: 接口名或界面中的显示名称
+        @return: 是否已开始捕获，接口不存在或启动出错时返回 False
+        """
         if self.is_capturing:
-            return
+            return False
 
         try:
             # 从显示名称中提取实际的接口名称（格式：name [状态] - 描述）
             interface = interface_display_name.split(" [")[0].strip()
 
-            # 获取Windows网络接口列表
-            from scapy.arch.windows import get_windows_if_list
-            interfaces = get_windows_if_list()
+            # 获取网络接口列表
+            interfaces = self.backend.list_interfaces()
 
             # 查找匹配的接口
             interface_found = None
@@ -38,215 +142,1170 @@ class PacketCapture:
 
             if not interface_found:
                 self.logger.error(f"找不到网络接口: {interface}")
-                return
+                return False
 
             # 清空之前捕获的地址
-            self.server_address = None
-            self.stream_code = None
+            self._reset_session()
 
+            self._start_pipeline()
             self.is_capturing = True
+            self.interface_status[interface_found] = True
+            self.interface_counters.clear()
+            self.interface_counters[interface_found] = InterfaceCounters()
             # 创建新的捕获线程，使用找到的接口名称
             self.capture_thread = threading.Thread(
-                target=self._start_capture, args=(interface_found,)
+                target=self._start_capture,
+                args=(interface_found, self.stop_event, self.wakeup),
             )
             self.capture_thread.daemon = True
             self.capture_thread.start()
             self.logger.info(f"开始在接口 {interface_found} 上捕获数据包")
+            self._log_filter()
+            self.rate_meter.start([interface_found])
+            return True
         except Exception as e:
             self.logger.error(f"启动捕获时发生错误: {str(e)}，如果检测可用，则忽略此错误")
             self.is_capturing = False
+            return False
 
     def stop(self):
-        """停止捕获数据包"""
-        if not self.is_capturing:
-            return
-
+        """停止捕获数据包，返回前等待所有抓包和处理线程退出"""
+        was_capturing = self.is_capturing
         self.is_capturing = False
-        
-        # 停止所有接口的捕获
-        for interface in self.interface_status:
-            self.interface_status[interface] = False
-        
-        # 使用更短的超时时间并并行等待所有线程
-        current_thread = threading.current_thread()
-        active_threads = []
-        for interface, thread in self.capture_threads.items():
-            if thread and thread.is_alive() and current_thread != thread:
-                active_threads.append(thread)
-        
-        for thread in active_threads:
-            thread.join(timeout=0.2)
-                
-        # 清理线程记录
-        self.capture_threads.clear()
-        self.capture_thread = None
+        self.watching = False
+        self._halt()
+        self._join_threads()
+        if not was_capturing:
+            return
+        self._log_session_summary()
         self.logger.info("停止所有接口的数据包捕获")
+        self._publish({"type": EVENT_STOPPED})
 
     def add_callback(self, callback):
-        """添加回调函数"""
+        """添加回调函数，每获取到一组新的推流信息调用一次，参数为 (推流服务器地址, 推流码)"""
         self.callbacks.append(callback)
 
+    def add_finish_callback(self, callback):
+        """添加捕获因达到停止条件而结束时的回调函数，参数为获取到的推流信息列表"""
+        self.finish_callbacks.append(callback)
+
+    def add_update_callback(self, callback):
+        """添加持续监听模式下推流信息变化时的回调函数，
+        参数为 (推流服务器地址, 推流码, 从新连接的第一段数据到发现变化的秒数)"""
+        self.update_callbacks.append(callback)
+
+    def set_stop_condition(self, matches=None, timeout=None):
+        """
+        设置停止条件，下次开始捕获时生效
+        @param matches: 获取到多少组不同的推流信息后停止，0 表示不按数量停止，
+            None 时读取配置 capture_stop_after，默认 1 即获取到第一组后停止
+        @param timeout: 开始捕获后多少秒停止，0 或 None（且未配置 capture_timeout）表示不限时
+        """
+        self.stop_after = matches
+        self.timeout = timeout
+
+    def set_process_scope(self, name):
+        """
+        按进程的连接过滤，下次开始捕获时生效
+        @param name: 进程名，如 MediaSDK_Server.exe；进程打开连接后过滤器只保留这些连接，
+            进程不存在或没有连接时使用原过滤器；空字符串表示不按进程过滤，
+            None 时读取配置 capture_process_scope
+        """
+        self.scope_process = name
+
+    def get_credentials(self):
+        """
+        获取本次会话获取到的推流信息
+
+        Returns:
+            list: [{"server_address", "stream_code", "host"（推流客户端地址）,
+                "interface", "elapsed"（距开始捕获的秒数）,
+                "latency"（从连接的第一段数据到获取推流信息的秒数）}]，按获取顺序排列
+        """
+        with self.lock:
+            return [dict(item) for item in self.credentials]
+
+    def _latest_credentials(self):
+        """本次会话最近获取的一组推流信息，还没有时返回 None"""
+        with self.lock:
+            if not self.credentials:
+                return None
+            item = self.credentials[-1]
+            return item["server_address"], item["stream_code"]
+
     def start_multi(self, interfaces):
-        """开始多接口捕获"""
+        """
+        开始多接口捕获
+        @param interfaces: 接口列表
+        @return: 是否已开始捕获，指定的接口都不存在时返回 False
+        """
         if self.is_capturing:
-            return
+            return False
+
+        # 获取网络接口列表，从显示名称中提取实际的接口名称并查找匹配的接口
+        names = {iface.get("name") for iface in self.backend.list_interfaces()}
+        found = []
+        for interface_display_name in interfaces:
+            interface = interface_display_name.split(" [")[0].strip()
+            if interface in names:
+                found.append(interface)
+            else:
+                self.logger.error(f"找不到网络接口: {interface}")
+        if not found:
+            return False
 
         # 清空之前捕获的地址
-        self.server_address = None
-        self.stream_code = None
+        self._reset_session()
+        self._start_pipeline()
         self.is_capturing = True
         self.capture_threads.clear()  # 清理之前的线程记录
         self.interface_status.clear()  # 清空接口状态
 
-        # 获取Windows网络接口列表
-        from scapy.arch.windows import get_windows_if_list
-        windows_interfaces = get_windows_if_list()
+        self.interface_counters.clear()
 
-        for interface_display_name in interfaces:
+        # 默认在一个事件循环中读取所有接口，配置 capture_mode 为 threads 时每个接口一个线程
+        mode = self.capture_mode or get_config("capture_mode")
+        threaded = mode == CAPTURE_MODE_THREADS
+
+        for interface in found:
             try:
-                # 从显示名称中提取实际的接口名称
-                interface = interface_display_name.split(" [")[0].strip()
-
-                # 查找匹配的接口
-                interface_found = None
-                for iface in windows_interfaces:
-                    if iface.get("name") == interface:
-                        interface_found = iface.get("name")
-                        break
-
-                if interface_found:
-                    # 初始化接口状态
-                    self.interface_status[interface_found] = True
+                # 初始化接口状态
+                self.interface_status[interface] = True
+                self.interface_counters[interface] = InterfaceCounters()
+                if threaded:
                     # 为每个接口创建独立的捕获线程
                     thread = threading.Thread(
-                        target=self._start_capture, args=(interface_found,)
+                        target=self._start_capture,
+                        args=(interface, self.stop_event, self.wakeup),
                     )
                     thread.daemon = True
                     thread.start()
-                    self.capture_threads[interface_found] = thread
-                    self.logger.info(f"开始在接口 {interface_found} 上捕获数据包")
+                    self.capture_threads[interface] = thread
+                self.logger.info(f"开始在接口 {interface} 上捕获数据包")
             except Exception as e:
                 self.logger.error(
-                    f"启动接口 {interface_display_name} 捕获时发生错误: {str(e)}，如果检测可用，则忽略此错误"
+                    f"启动接口 {interface} 捕获时发生错误: {str(e)}，如果检测可用，则忽略此错误"
                 )
 
-    def _start_capture(self, interface):
-        """实际的捕获过程"""
+        if len(self.interface_status) > 1 and dedup_enabled():
+            self.deduplicator = SegmentDeduplicator()
+        if not threaded and self.interface_status:
+            if len(self.interface_status) > 1 and pruning_enabled():
+                self.pruner = InterfacePruner(list(self.interface_status), self.logger)
+            self.capture_thread = threading.Thread(
+                target=self._capture_loop,
+                args=(list(self.interface_status), self.stop_event, self.wakeup),
+                daemon=True,
+            )
+            self.capture_thread.start()
+            self.logger.info(f"使用单线程事件循环读取 {len(self.interface_status)} 个接口")
+        self._log_filter()
+        self.rate_meter.start(self.interface_status.keys())
+        return True
+
+    def watch(self, interfaces):
+        """持续监听模式：在指定接口上长时间捕获，直播伴侣轮换推流码或更换推流服务器时发出更新
+
+        不因获取到推流信息或超时而停止；只有推流服务器地址或推流码与上一组不同时才调用回调和更新回调。
+        已获取推流信息的连接会从内核过滤器中排除，之后只有新建立的连接送达 Python；
+        确定不是 RTMP 的连接由流分类直接丢弃，不占用排除名额。
+
+        Args:
+            interfaces: 接口列表
+
+        Returns:
+            bool: 是否已开始监听，指定的接口都不存在时返回 False
+        """
+        if self.is_capturing:
+            return False
+        self.watching = True
+        if not self.start_multi(interfaces):
+            self.watching = False
+            return False
+        self.logger.info("已开启持续监听模式，推流信息变化时自动更新")
+        return True
+
+    def replay(self, path, speed=None):
+        """回放 pcap/pcapng 文件，数据包在调用线程中直接处理，经过与实时捕获相同的解析流程
+
+        需要同时经过抓包线程和处理线程时，使用 core.backends.PcapReplayBackend 创建 PacketCapture。
+
+        Args:
+            path: pcap 或 pcapng 文件路径
+            speed: 回放速度，None 或 0 表示尽可能快，1.0 表示按原始时间间隔实时回放，
+                2.0 表示两倍速
+
+        Returns:
+            dict: 回放结果，包含 packets（处理的数据包数）、elapsed（耗时秒数）、
+                found（是否获取到推流信息）、time_to_credentials（获取推流信息耗时）
+        """
+        if self.is_capturing:
+            self.logger.error("正在捕获中，无法回放数据包文件")
+            return None
+
+        interface = os.path.basename(path)
+        self._reset_session()
+        self.is_capturing = True
+        self.interface_status[interface] = True
+        self.interface_counters.clear()
+        counters = self.interface_counters[interface] = InterfaceCounters()
+        self.logger.info(f"开始回放数据包文件 {path}")
+
+        packets = 0
+        first_time = None
+        time_to_credentials = None
+        start = time.perf_counter()
         try:
-            sniff(
-                iface=interface,
-                prn=lambda x: self._packet_callback(x, interface), 
-                stop_filter=lambda x: not self.interface_status.get(interface, False),
+            for timestamp, frame, linktype in read_pcap_frames(path):
+                if speed:
+                    # 按原始时间间隔回放
+                    if first_time is None:
+                        first_time = timestamp
+                    delay = (timestamp - first_time) / speed - (
+                        time.perf_counter() - start
+                    )
+                    if delay > 0:
+                        time.sleep(delay)
+
+                if not counters.packets:
+                    counters.first_packet = time.monotonic()
+                counters.packets += 1
+                counters.bytes += len(frame)
+                frame_start = time.perf_counter()
+                inspected = self._frame_callback(frame, interface, linktype)
+                self.stats.record(interface, inspected, time.perf_counter() - frame_start)
+                packets += 1
+                self._check_deadline()
+
+                if not self.is_capturing:
+                    # 已获取推流信息或被停止
+                    if self.credentials:
+                        time_to_credentials = time.perf_counter() - start
+                    break
+        except Exception as e:
+            self.logger.error(f"回放数据包文件时发生错误: {str(e)}")
+        finally:
+            self.is_capturing = False
+            self.interface_status.pop(interface, None)
+
+        elapsed = time.perf_counter() - start
+        self.logger.info(f"回放结束，共处理 {packets} 个数据包，耗时 {elapsed:.3f} 秒")
+        return {
+            "packets": packets,
+            "elapsed": elapsed,
+            "found": bool(self.credentials),
+            "time_to_credentials": time_to_credentials,
+        }
+
+    def _reset_session(self):
+        """清空上次会话的结果和状态，按内存预算设置本次会话各缓冲的上限"""
+        # 先等上次会话的抓包和处理线程退出，它们可能仍在访问下面清空的流表和重组状态
+        self._halt()
+        self._join_threads()
+        self.server_address = None
+        self.stream_code = None
+        self.credentials = []
+        self.notifications = []
+        self.flow_credentials = {}
+        self.host_servers = {}
+        stop_after = self.stop_after
+        if stop_after is None:
+            stop_after = get_config("capture_stop_after")
+        self.match_limit = DEFAULT_STOP_AFTER if stop_after is None else max(int(stop_after), 0)
+        timeout = self.timeout or get_config("capture_timeout")
+        self.deadline = time.monotonic() + float(timeout) if timeout else None
+        if self.watching:
+            # 持续监听模式只在调用 stop 时停止
+            self.match_limit = 0
+            self.deadline = None
+        self.capture_filter.clear_excluded()
+        self.ingest = IngestLearner() if dns_learning_enabled() else None
+        self.capture_filter.dns = self.ingest is not None
+        # 缓存中的推流服务器地址可能已过时，收到本次会话的 DNS 响应之前仍按端口过滤
+        self.capture_filter.set_ingest_hosts([])
+        self.capture_filter.set_process_endpoints([])
+        self.budget = SessionBudget()
+        self.stats = SessionStats()
+        self.reassembler.clear()
+        self.reassembler.max_streams = self.budget.max_streams
+        self.flow_table.clear()
+        self.pruner = None
+        self.deduplicator = None
+        # 默认不保留任何数据包，配置 capture_keep_candidates 时保留候选流的控制段
+        self.candidates = (
+            CandidateBuffer(self.budget.candidate_bytes)
+            if get_config("capture_keep_candidates") else None
+        )
+
+    def get_pipeline_stats(self):
+        """
+        获取抓包缓冲的统计信息
+
+        Returns:
+            dict: queued（缓冲中的帧数）、capacity（容量）、peak（占用峰值）、
+                dropped（缓冲已满丢弃的帧数）、sampled（抽样跳过的数据包数）、
+                flow_dropped（非 RTMP 流丢弃的数据包数）
+        """
+        return {
+            "queued": len(self.ring),
+            "capacity": self.ring.capacity,
+            "peak": self.ring.peak,
+            "dropped": self.ring.dropped,
+            "sampled": self.flow_table.sampled,
+            "flow_dropped": self.flow_table.dropped,
+        }
+
+    def get_duplicate_stats(self):
+        """
+        获取跨接口重复段的统计
+
+        Returns:
+            dict: suppressed（过滤的重复段数）、pairs（{(先到的接口, 重复的接口): 次数}），
+                未启用重复段过滤时为 None
+        """
+        deduplicator = self.deduplicator
+        return deduplicator.get_stats() if deduplicator is not None else None
+
+    def get_interface_stats(self):
+        """
+        获取每个接口的抓包计数
+
+        Returns:
+            dict: {接口名: {"packets": 收到的帧数, "bytes": 字节数, "dropped": 缓冲已满丢弃的帧数,
+                "kernel_dropped": 内核或驱动丢弃的帧数，无法获取时为 None}}
+        """
+        return {
+            interface: counters.as_dict()
+            for interface, counters in self.interface_counters.items()
+        }
+
+    def get_session_stats(self):
+        """
+        获取本次会话的统计，捕获过程中和结束后都可以读取
+
+        Returns:
+            dict: elapsed（会话已进行的秒数）、time_to_first_packet（收到第一个数据包的耗时）、
+                time_to_connect（发现 connect 即推流服务器地址的耗时）、
+                time_to_fcpublish（发现 FCPublish 即推流码的耗时）、
+                interfaces（{接口名: 接口抓包计数以及 inspected（进入 RTMP 检查的数据包数）、
+                filtered（直接过滤的数据包数）、latency（单包处理耗时的 p50/p90/p99/max 毫秒）、
+                time_to_first_packet}）、pipeline（抓包缓冲统计，见 get_pipeline_stats），
+                尚未发生的事件耗时为 None
+        """
+        stats = self.stats
+        interfaces = {}
+        for interface in list(self.interface_counters) + stats.interface_names():
+            if interface in interfaces:
+                continue
+            counters = self.interface_counters.get(interface) or InterfaceCounters()
+            interfaces[interface] = dict(
+                counters.as_dict(),
+                time_to_first_packet=stats.since_start(counters.first_packet),
+                **stats.get_interface_stats(interface),
+            )
+        first_packets = [
+            item["time_to_first_packet"] for item in interfaces.values()
+            if item["time_to_first_packet"] is not None
+        ]
+        milestones = stats.milestones
+        return {
+            "elapsed": time.monotonic() - stats.started,
+            "time_to_first_packet": min(first_packets) if first_packets else None,
+            "time_to_connect": milestones.get("connect", (None,))[0],
+            "time_to_fcpublish": milestones.get("FCPublish", (None,))[0],
+            "interfaces": interfaces,
+            "pipeline": self.get_pipeline_stats(),
+        }
+
+    def _start_pipeline(self):
+        """创建本次会话的停止事件、唤醒管道和帧缓冲，并启动处理线程"""
+        from scapy.automaton import ObjectPipe
+
+        self._halt()
+        self._join_threads()
+        self.stop_event = threading.Event()
+        self.wakeup = ObjectPipe()
+        self.ring = FrameRing(max_bytes=self.budget.ring_bytes)
+        count = max(int(get_config("capture_workers") or 1), 1)
+        self.workers = [
+            threading.Thread(
+                target=self._process_frames, args=(self.ring, self.stop_event), daemon=True
             )
+            for _ in range(count)
+        ]
+        for thread in self.workers:
+            thread.start()
+        self.recorder = ControlRecorder(self.logger) if recording_enabled() else None
+        if self.recorder is not None:
+            self.recorder.start()
+        name = self.scope_process
+        if name is None:
+            name = process_scope_name()
+        self.process_scope = ProcessScope(name, self._scope_to_process) if name else None
+        if self.process_scope is not None:
+            self.logger.info(f"将按进程 {name} 的连接过滤数据包")
+            self.process_scope.start()
+
+    def _halt(self):
+        """通知所有抓包和处理线程退出并立即唤醒它们，不等待线程结束"""
+        for interface in self.interface_status:
+            self.interface_status[interface] = False
+        self.stop_event.set()
+        if self.wakeup is not None:
+            self.wakeup.send(b"")
+        self.ring.wake(len(self.workers))
+        self.rate_meter.stop()
+        if self.recorder is not None:
+            self.recorder.stop()
+        if self.process_scope is not None:
+            self.process_scope.stop()
+
+    def _join_threads(self, timeout=STOP_TIMEOUT):
+        """等待本次会话的所有线程退出，在其中某个线程内调用时跳过该线程"""
+        current_thread = threading.current_thread()
+        threads = list(self.capture_threads.values()) + [self.capture_thread] + self.workers
+        deadline = time.monotonic() + timeout
+        alive = False
+        for thread in threads:
+            if thread is None or thread is current_thread:
+                continue
+            thread.join(max(deadline - time.monotonic(), 0))
+            alive = alive or thread.is_alive()
+        self.rate_meter.join(max(deadline - time.monotonic(), 0))
+        if self.recorder is not None:
+            self.recorder.join(max(deadline - time.monotonic(), 0))
+        if self.process_scope is not None:
+            self.process_scope.join(max(deadline - time.monotonic(), 0))
+        if current_thread in threads:
+            # 在处理线程中调用（如获取到推流信息后的回调），由 stop 或下次启动时清理
+            return
+        if alive:
+            self.logger.error("部分抓包线程未能及时退出")
+        if self.wakeup is not None and not alive:
+            self.wakeup.close()
+            self.wakeup = None
+        # 清理线程记录
+        self.capture_threads.clear()
+        self.capture_thread = None
+        self.workers = []
+
+    def _process_frames(self, ring, stop):
+        """处理线程：从帧缓冲取出原始帧解析，缓冲超过高水位时对未分类的流抽样
+
+        同时记录每个接口的检查与过滤计数，并抽样测量单包处理耗时。
+        """
+        flow_table = self.flow_table
+        stats = self.stats
+        shard = stats.shard()
+        frames = 0
+        cpu = time.thread_time()
+        while not stop.is_set():
+            item = ring.get()
+            if item is None:
+                self._check_deadline()
+                continue
+            flow_table.sample_interval = SAMPLE_INTERVAL if ring.above_high_water() else 1
+            frames += 1
+            if frames % LATENCY_SAMPLE_INTERVAL:
+                stats.record(item[1], self._frame_callback(*item), shard=shard)
+            else:
+                start = time.perf_counter()
+                inspected = self._frame_callback(*item)
+                stats.record(item[1], inspected, time.perf_counter() - start, shard)
+            if frames == COST_SAMPLE_FRAMES:
+                self._check_deadline()
+                # 测量单帧处理耗时，用于估计接口裁剪节省的 CPU
+                pruner = self.pruner
+                now = time.thread_time()
+                if pruner is not None:
+                    pruner.frame_cost = (now - cpu) / frames
+                frames = 0
+                cpu = now
+
+    def _log_session_summary(self):
+        """输出会话摘要：每个接口的计数、检查与过滤、丢包和处理耗时，各阶段耗时，
+        抓包缓冲的丢弃和抽样、跨接口重复段、接口裁剪、保留和记录的控制段以及内存占用"""
+        session = self.get_session_stats()
+        for interface, counters in session["interfaces"].items():
+            kernel_dropped = counters["kernel_dropped"]
+            latency = counters["latency"]
+            first_packet = counters["time_to_first_packet"]
+            self.logger.info(
+                f"接口 {interface}: 收到 {counters['packets']} 个数据包"
+                f"（{counters['bytes'] / 1024:.0f} KB），检查 {counters['inspected']} 个，"
+                f"过滤 {counters['filtered']} 个，缓冲丢弃 {counters['dropped']} 个，"
+                + ("内核丢弃数未知" if kernel_dropped is None else f"内核丢弃 {kernel_dropped} 个")
+                + (f"，首包 {first_packet:.2f} 秒" if first_packet is not None else "")
+                + (
+                    f"，处理耗时 p50 {latency['p50']:.3f} / p90 {latency['p90']:.3f} / "
+                    f"p99 {latency['p99']:.3f} / 最大 {latency['max']:.3f} ms"
+                    if latency else ""
+                )
+            )
+        milestones = "，".join(
+            f"{name} {seconds:.2f} 秒（{interface}）"
+            for name, (seconds, interface) in sorted(
+                self.stats.milestones.items(), key=lambda item: item[1][0]
+            )
+        )
+        first_packet = session["time_to_first_packet"]
+        self.logger.info(
+            f"会话 {session['elapsed']:.1f} 秒，首包 "
+            + ("未收到" if first_packet is None else f"{first_packet:.2f} 秒")
+            + (f"，{milestones}" if milestones else "，未发现 connect/FCPublish")
+        )
+        stats = session["pipeline"]
+        if stats["dropped"] or stats["sampled"]:
+            self.logger.info(
+                f"抓包缓冲峰值 {stats['peak']}/{stats['capacity']}，"
+                f"缓冲已满丢弃 {stats['dropped']} 个数据包，抽样跳过 {stats['sampled']} 个数据包"
+            )
+        duplicates = self.get_duplicate_stats()
+        if duplicates and duplicates["suppressed"]:
+            pairs = "，".join(
+                f"{first} -> {second} {count} 个"
+                for (first, second), count in sorted(duplicates["pairs"].items())
+            )
+            self.logger.info(f"过滤重复段 {duplicates['suppressed']} 个: {pairs}")
+        pruner = self.pruner
+        if pruner is not None and any(
+            state.state != INTERFACE_ACTIVE for state in pruner.states.values()
+        ):
+            self.logger.info(f"接口裁剪: {pruner.summary()}")
+        if self.candidates is not None:
+            self.logger.info(
+                f"保留候选控制段 {len(self.candidates)} 个（{self.candidates.bytes / 1024:.0f} KB），"
+                f"超出上限丢弃 {self.candidates.evicted} 个"
+            )
+        recorder = self.recorder
+        if recorder is not None and (recorder.recorded or recorder.dropped):
+            self.logger.info(
+                f"记录控制段 {recorder.recorded} 个到 {recorder.directory}，"
+                f"写入不及时丢弃 {recorder.dropped} 个"
+            )
+        rss = process_rss()
+        if rss is not None:
+            self.logger.info(
+                f"内存占用: {rss / 1024 / 1024:.1f} MB（会话缓冲预算 {self.budget.megabytes:g} MB）"
+            )
+
+    def _log_filter(self):
+        """输出当前使用的抓包过滤器"""
+        bpf = self.capture_filter.build()
+        if bpf:
+            self.logger.info(
+                f"抓包过滤器: {bpf}，截断长度: {self.capture_filter.snaplen} 字节"
+            )
+        else:
+            self.logger.info("抓包过滤器未启用，将处理接口上的全部数据包")
+
+    def _open_capture_socket(self, interface):
+        """通过抓包后端打开接口的抓包句柄，无法设置过滤器时退回到全量抓包"""
+        try:
+            sock = self.backend.open(interface, self.capture_filter)
+        except Exception as e:
+            # 无法编译过滤器（如缺少 libpcap）时退回到全量抓包
+            self.logger.error(f"设置抓包过滤器失败: {str(e)}，接口 {interface} 将不使用过滤器")
+            sock = self.backend.open(interface)
+        return sock
+
+    def _close_capture_socket(self, sock):
+        """关闭抓包句柄"""
+        sock.close()
+
+    def _apply_filter(self):
+        """过滤器改变后通知抓包线程替换过滤器，在持有锁时调用
+
+        libpcap/Npcap 句柄不是线程安全的，这里只增加过滤器版本，
+        由持有句柄的抓包线程在两次读取之间调用 _refresh_filter，不需要重新打开句柄。
+        """
+        self._log_filter()
+        self.filter_generation += 1
+
+    def _refresh_filter(self, sock, interface):
+        """
+        在持有句柄的抓包线程中将句柄的过滤器替换为当前的过滤表达式
+        @return: 替换后的过滤器版本
+        """
+        with self.lock:
+            generation = self.filter_generation
+            bpf = self.capture_filter.build()
+        if bpf:
+            try:
+                sock.set_filter(bpf)
+            except Exception as e:
+                self.logger.error(f"更新接口 {interface} 的抓包过滤器失败: {str(e)}")
+        return generation
+
+    def _scope_to_process(self, endpoints):
+        """推流进程的连接变化时按连接重建所有句柄的过滤器，在进程检查线程中调用"""
+        with self.lock:
+            if not self.capture_filter.set_process_endpoints(endpoints):
+                return
+            if endpoints:
+                connections = "，".join(f"{host} 本地端口 {port}" for host, port in endpoints)
+                self.logger.info(f"推流进程的连接: {connections}")
+            else:
+                self.logger.info("推流进程没有连接，恢复原抓包过滤器")
+            self._apply_filter()
+
+    def _exclude_flow(self, src_ip, src_port, dst_ip, dst_port):
+        """持续监听模式下从过滤器中排除一个已获取推流信息的连接（按推流客户端一侧的地址和端口）"""
+        if self.capture_filter.is_server_port(dst_port):
+            host, port = src_ip, src_port
+        else:
+            host, port = dst_ip, dst_port
+        if self.capture_filter.exclude(host, port):
+            self._apply_filter()
+
+    def _start_capture(self, interface, stop, wakeup):
+        """实际的捕获过程：直接读取原始帧，不经过 scapy 逐层解析
+
+        同时等待抓包句柄和唤醒管道，停止时无论接口上是否有流量都会立即返回。
+        """
+        sock = None
+        drops = None
+        selector = None
+        counters = self.interface_counters[interface]
+        try:
+            generation = self.filter_generation
+            sock = self._open_capture_socket(interface)
+            drops = KernelDrops(sock)
+            put = self.ring.put
+            selector = HandleSelector([sock, wakeup])
+            next_drop_poll = 0
+            while not stop.is_set() and self.interface_status.get(interface, False):
+                if self.filter_generation != generation:
+                    generation = self._refresh_filter(sock, interface)
+                if sock not in selector.select(WAIT_INTERVAL):
+                    counters.kernel_dropped = drops.poll()
+                    continue
+                for frame, linktype in sock.recv_frames():
+                    if not counters.packets:
+                        counters.first_packet = time.monotonic()
+                    counters.packets += 1
+                    counters.bytes += len(frame)
+                    # 抓包线程只负责放入缓冲，解析在处理线程中进行
+                    if not put((frame, interface, linktype)):
+                        counters.dropped += 1
+                if counters.packets >= next_drop_poll:
+                    next_drop_poll = counters.packets + DROP_POLL_PACKETS
+                    counters.kernel_dropped = drops.poll()
+        except EOFError:
+            self.logger.info(f"接口 {interface} 的数据包已全部读取")
+            self.interface_status[interface] = False
         except Exception as e:
             self.logger.error(f"捕获过程中发生错误: {str(e)}，如果数据包监控有一条条日志在跑，则忽略此错误")
             self.interface_status[interface] = False
+        finally:
+            if selector is not None:
+                selector.close()
+            if sock:
+                counters.kernel_dropped = drops.poll()
+                self._close_capture_socket(sock)
+
+    def _capture_loop(self, interfaces, stop, wakeup):
+        """单线程事件循环：同时打开所有接口的抓包句柄，用一次 select 等待任意接口的数据
+
+        启用接口裁剪时，降级接口的帧只计数不放入缓冲，符合过滤器的推流候选帧除外（并立即恢复该接口）；
+        降级接口的句柄保持打开，只关闭回环接口和配置忽略的接口。
+        """
+        sockets = {}
+        # {句柄: 丢包计数}
+        drops = {}
+        # 所有句柄上已应用的过滤器版本
+        generation = self.filter_generation
+        for interface in interfaces:
+            if stop.is_set():
+                # 打开句柄需要一定时间，接口较多时在打开过程中也要及时响应停止
+                break
+            try:
+                sockets[self._open_capture_socket(interface)] = interface
+            except Exception as e:
+                self.logger.error(f"打开接口 {interface} 时发生错误: {str(e)}")
+                self.interface_status[interface] = False
+        if not sockets and not stop.is_set():
+            # 没有可读取的句柄，结束会话，等待推流信息的调用方不会一直等待
+            self._end_session("所有接口都无法打开，停止捕获")
+
+        put = self.ring.put
+        counters = self.interface_counters
+        status = self.interface_status
+        pruner = self.pruner
+        demoted = pruner.demoted if pruner is not None else ()
+        if pruner is not None:
+            for interface in interfaces:
+                if not status.get(interface, False):
+                    # 无法打开的接口不参与裁剪
+                    pruner.remove(interface)
+        for sock in sockets:
+            drops[sock] = KernelDrops(sock)
+        selector = HandleSelector(list(sockets) + [wakeup])
+        last_check = time.monotonic()
+        next_drop_poll = last_check + DROP_POLL_INTERVAL
+        try:
+            while not stop.is_set() and sockets:
+                ready = selector.select(WAIT_INTERVAL)
+                for sock in ready:
+                    interface = sockets.get(sock)
+                    if interface is None:
+                        # 唤醒管道
+                        continue
+                    try:
+                        frames = sock.recv_frames()
+                    except EOFError:
+                        self.logger.info(f"接口 {interface} 的数据包已全部读取")
+                        self.interface_status[interface] = False
+                        continue
+                    except Exception as e:
+                        self.logger.error(f"接口 {interface} 捕获过程中发生错误: {str(e)}")
+                        self.interface_status[interface] = False
+                        continue
+                    counter = counters[interface]
+                    for frame, linktype in frames:
+                        if not counter.packets:
+                            counter.first_packet = time.monotonic()
+                        counter.packets += 1
+                        counter.bytes += len(frame)
+                        if interface in demoted:
+                            if not self._is_candidate(frame, linktype):
+                                continue
+                            # 推流可能在降级的接口上开始，该帧照常放入缓冲，之后的帧也正常解析
+                            pruner.promote(interface, "出现推流候选数据包")
+                        if not put((frame, interface, linktype)):
+                            counter.dropped += 1
+                if self.filter_generation != generation:
+                    for sock, interface in sockets.items():
+                        generation = self._refresh_filter(sock, interface)
+                # 定期关闭已停止的接口，不在每个数据包后检查
+                now = time.monotonic()
+                if ready and now - last_check < 0.1:
+                    continue
+                last_check = now
+                if now >= next_drop_poll:
+                    next_drop_poll = now + DROP_POLL_INTERVAL
+                    for sock, interface in sockets.items():
+                        self._poll_kernel_drops(interface, drops[sock])
+                closing = pruner.update(counters, now) if pruner else ()
+                for sock, interface in list(sockets.items()):
+                    stopped = not status.get(interface, False)
+                    if stopped and pruner is not None:
+                        pruner.remove(interface)
+                    if stopped or interface in closing:
+                        selector.unregister(sock)
+                        del sockets[sock]
+                        self._poll_kernel_drops(interface, drops.pop(sock))
+                        self._close_capture_socket(sock)
+        except Exception as e:
+            self.logger.error(f"捕获过程中发生错误: {str(e)}，如果数据包监控有一条条日志在跑，则忽略此错误")
+        finally:
+            selector.close()
+            for sock, interface in sockets.items():
+                self._poll_kernel_drops(interface, drops[sock])
+                self._close_capture_socket(sock)
+
+    def _is_candidate(self, frame, linktype):
+        """帧是否为符合过滤器的 TCP 段，无法快速解析的帧也视为候选"""
+        segment = decode_tcp(frame, linktype)
+        if segment is None:
+            return True
+        if not segment:
+            return False
+        src_ip, dst_ip, src_port, dst_port = segment[:4]
+        return self.capture_filter.matches(inet_ntoa(src_ip), src_port, inet_ntoa(dst_ip), dst_port)
+
+    def _poll_kernel_drops(self, interface, drops):
+        """读取句柄的内核丢包数写入接口计数"""
+        total = drops.poll()
+        if total is not None:
+            self.interface_counters[interface].kernel_dropped = total
 
     def _packet_callback(self, packet, interface):
-        """处理捕获的数据包"""
+        """处理 scapy 数据包（回放等场景），有原始字节时走快速解析路径"""
+        from scapy.config import conf
+
+        frame = getattr(packet, "original", None)
+        linktype = conf.l2types.layer2num.get(type(packet))
+        if frame is not None and linktype is not None:
+            self._frame_callback(frame, interface, linktype)
+            return
+
         try:
-            if IP in packet and TCP in packet and Raw in packet:
-                # 记录基本连接信息
-                src_ip = packet[IP].src
-                dst_ip = packet[IP].dst
-                src_port = packet[TCP].sport
-                dst_port = packet[TCP].dport
-
-                # 记录基本连接信息
-                current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                self.logger.packet(
-                    f"[{current_time}] {src_ip}:{src_port} -> {dst_ip}:{dst_port}"
-                )
+            self.rate_meter.count()
+            self._scapy_callback(packet, interface)
+        except Exception as e:
+            self.logger.error(f"处理数据包时发生错误: {str(e)}")
 
-                try:
-                    payload = packet[Raw].load.decode("utf-8", errors="ignore")
-                    # 使用线程锁保护共享资源的访问
-                    with self.lock:
-                        # 查找推流服务器地址
-                        if not self.server_address and "connect" in payload:
-                            server_match = re.search(
-                                r"(rtmp://[a-zA-Z0-9\-\.]+/[^/]+)", payload
-                            )
-                            if server_match:
-                                self.server_address = server_match.group(1).split(
-                                    "\x00"
-                                )[0]
-                                self.logger.info(
-                                    f"\n>>> 找到推流服务器地址 <<<\n地址:{self.server_address}"
-                                )
-
-                        # 查找推流码
-                        if not self.stream_code and "FCPublish" in payload:
-                            code_match = re.search(
-                                r"(stream-\d+\?[a-zA-Z0-9_]+=[a-zA-Z0-9\-]+(?:&[a-zA-Z0-9_]+=[a-zA-Z0-9\-]+)*)",
-                                payload,
-                            )
-                            if code_match:
-                                self.stream_code = code_match.group(1)
-                                if self.stream_code.endswith("C"):
-                                    self.stream_code = self.stream_code[:-1]
-                                self.logger.info(
-                                    f"\n>>> 找到推流码 <<<\n推流码:{self.stream_code}"
-                                )
-
-                        # 当两个信息都获取到时，停止所有接口的捕获
-                        if self.server_address and self.stream_code:
-                            # 先触发回调
-                            for callback in self.callbacks:
-                                try:
-                                    callback(self.server_address, self.stream_code)
-                                except Exception as e:
-                                    self.logger.error(f"执行回调函数时发生错误: {str(e)}")
-                            # 停止所有接口的捕获
-                            for iface in self.interface_status:
-                                self.interface_status[iface] = False
-                            self.is_capturing = False
-                            self.logger.info("已获取所需信息，停止所有接口捕获")
-
-                except UnicodeDecodeError:
-                    pass  # 忽略无法解码的数据包
+    def _frame_callback(self, frame, interface, linktype=DLT_EN10MB):
+        """处理原始帧，只有快速解析无法处理的帧才交给 scapy 解析，返回是否进入 RTMP 检查"""
+        inspected = False
+        try:
+            self.rate_meter.count()
+            segment = decode_tcp(frame, linktype)
+            if segment is None:
+                from scapy.config import conf
 
+                load_scapy_layers()
+                inspected = self._scapy_callback(conf.l2types[linktype](bytes(frame)), interface)
+            elif segment:
+                src_ip, dst_ip, src_port, dst_port, seq, flags, payload, length = segment
+                inspected = self._process_segment(
+                    interface, inet_ntoa(src_ip), inet_ntoa(dst_ip), src_port, dst_port,
+                    seq, flags, payload, length,
+                )
+            elif self.ingest is not None:
+                self._learn_ingest(frame, linktype)
         except Exception as e:
             self.logger.error(f"处理数据包时发生错误: {str(e)}")
+        return inspected
+
+    def _learn_ingest(self, frame, linktype):
+        """从 DNS 响应中学习推流服务器地址，学习到新地址时更新所有句柄的过滤器"""
+        datagram = decode_udp(frame, linktype)
+        if datagram is None or datagram[2] != DNS_PORT:
+            return
+        with self.lock:
+            ingest = self.ingest
+            if ingest is None:
+                return
+            learned = ingest.feed(datagram[4])
+            for address, domain in learned:
+                self.logger.info(f"从 DNS 响应中学习到推流服务器地址: {domain} -> {address}")
+            if learned and self.capture_filter.set_ingest_hosts(ingest.confirmed_addresses()):
+                self._apply_filter()
+        # 写缓存文件不占用抓包锁，避免阻塞其他工作线程
+        ingest.save()
+
+    def _scapy_callback(self, packet, interface):
+        """使用 scapy 解析结果处理数据包，返回是否进入 RTMP 检查"""
+        from scapy.layers.inet import IP, TCP
+        from scapy.packet import Raw
+
+        if IP in packet and TCP in packet:
+            return self._process_segment(
+                interface,
+                packet[IP].src,
+                packet[IP].dst,
+                packet[TCP].sport,
+                packet[TCP].dport,
+                packet[TCP].seq,
+                int(packet[TCP].flags),
+                packet[Raw].load if Raw in packet else b"",
+            )
+        return False
+
+    def _process_segment(self, interface, src_ip, dst_ip, src_port, dst_port, seq, flags,
+                         payload, length=None):
+        """处理 TCP 段，payload 可以是 bytes 或 memoryview，命令在重组后的字节流上提取
+
+        Returns:
+            bool: 是否进入 RTMP 检查，重复段和已确定不是 RTMP 的流返回 False
+        """
+        # 使用线程锁保护共享资源的访问，推流信息的回调在释放锁后执行
+        with self.lock:
+            inspected = self._handle_segment(
+                interface, src_ip, dst_ip, src_port, dst_port, seq, flags, payload, length
+            )
+            notifications = self.notifications
+            if notifications:
+                self.notifications = []
+        for notify in notifications:
+            notify()
+        return inspected
+
+    def _handle_segment(self, interface, src_ip, dst_ip, src_port, dst_port, seq, flags,
+                        payload, length):
+        """在持有锁时处理 TCP 段，返回值同 _process_segment"""
+        key = (src_ip, src_port, dst_ip, dst_port)
+        deduplicator = self.deduplicator
+        if payload and deduplicator is not None and deduplicator.is_duplicate(
+            interface, key, seq, payload
+        ):
+            # 已在其他接口上处理过的段
+            return False
+        flow = self.flow_table.classify(key, seq, flags, payload, length)
+        if flow is None or flow.state == FLOW_DROP:
+            # 已确定不是 RTMP 的流直接丢弃，不加入过滤器的排除列表，以免挤掉已获取推流信息的连接
+            return False
+
+        if payload:
+            # 记录基本连接信息
+            current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            self.logger.packet(
+                f"[{current_time}] {src_ip}:{src_port} -> {dst_ip}:{dst_port}"
+            )
+        if flow.state == FLOW_UNKNOWN:
+            if flow.isn is not None and payload:
+                # 从 SYN 开始跟踪的流在分类前先缓存段，连接开头的段乱序到达时字节流仍然完整
+                if key not in self.reassembler:
+                    self.reassembler.add(key, flow.isn, TCP_SYN, b"")
+                self.reassembler.add(key, seq, flags, payload, length)
+            return True
+
+        if flow.isn is not None and key not in self.reassembler:
+            # 从 SYN 开始的流在确定分类后才开始重组，先补上 SYN 以确定起始序列号
+            self.reassembler.add(key, flow.isn, TCP_SYN, b"")
+            if self.recorder is not None:
+                self.recorder.add(interface, key, flow.isn, TCP_SYN, b"")
+        if payload and key not in self.reassembler.finished and (
+            self.candidates is not None or self.recorder is not None
+        ) and self._carries_control(key):
+            # 只保留连接开始的握手和命令，出现音视频消息或推流信息已发出后不再保留
+            if self.candidates is not None:
+                self.candidates.add(interface, key, seq, flags, payload)
+            if self.recorder is not None:
+                self.recorder.add(interface, key, seq, flags, payload, length)
+        result = self.reassembler.add(key, seq, flags, payload, length)
+        if result is None:
+            return True
+        stream = result[0]
+        entry = self.flow_credentials.get(key)
+        if entry is None:
+            if len(self.flow_credentials) >= self.reassembler.max_streams:
+                # 持续监听时连接会不断累积，字典保持插入顺序，清理最早的连接
+                del self.flow_credentials[next(iter(self.flow_credentials))]
+            entry = self.flow_credentials[key] = FlowCredentials(src_ip)
+        if entry.done:
+            # 该连接的推流信息已经发出
+            return True
+        had_server_address = bool(entry.server_address)
+        had_stream_code = bool(entry.stream_code)
+
+        if stream.context is None:
+            if flow.state == FLOW_HANDSHAKE:
+                # 以 RTMP 握手开头的流使用块流解析器
+                stream.context = RtmpParser()
+                self._log_handshake(src_ip, src_port, dst_ip, dst_port)
+            else:
+                # 命中命令特征的流按文本匹配
+                stream.context = True
+        parser = stream.context
+        if parser is not True:
+            parser.feed(stream.data)
+            if parser.failed:
+                # 无法解析时退回到文本匹配
+                stream.context = True
+                self._match_text(stream.data, dst_port, entry)
+            else:
+                if parser.tc_url and not entry.server_address:
+                    self._set_server_address(entry, parser.tc_url, dst_port)
+                if parser.publish_name and not entry.stream_code:
+                    self._set_stream_code(entry, parser.publish_name)
+        else:
+            self._match_text(stream.data, dst_port, entry)
+
+        if entry.server_address and not had_server_address:
+            self.stats.mark("connect", interface)
+        if entry.stream_code and not had_stream_code:
+            self.stats.mark("FCPublish", interface)
+        self._check_complete(entry, interface)
+        if entry.done and self.watching:
+            # 该连接之后只有音视频数据
+            self._exclude_flow(*key)
+        return True
+
+    def _carries_control(self, key):
+        """
+        连接之后的段是否可能还有控制消息：推流信息已发出，或块流解析器已经看到音视频消息时，
+        之后的段基本都是媒体数据
+        @param key: 单向四元组
+        @return: 是否可能还有控制消息
+        """
+        entry = self.flow_credentials.get(key)
+        if entry is not None and entry.done:
+            return False
+        stream = self.reassembler.streams.get(key)
+        parser = stream.context if stream is not None else None
+        return not (isinstance(parser, RtmpParser) and parser.media_started)
+
+    def _log_handshake(self, src_ip, src_port, dst_ip, dst_port):
+        """记录不在过滤端口上的 RTMP 握手，每个连接只记录先发起握手的一方"""
+        ports = self.capture_filter.all_ports()
+        if src_port in ports or dst_port in ports:
+            return
+        reverse = self.flow_table.flows.get((dst_ip, dst_port, src_ip, src_port))
+        if reverse is not None and reverse.state == FLOW_HANDSHAKE:
+            return
+        self.logger.info(f"检测到非标准端口上的 RTMP 握手: {src_ip}:{src_port} -> {dst_ip}:{dst_port}")
+
+    def _match_text(self, data, dst_port, entry):
+        """在字节流文本中匹配推流服务器地址和推流码，用于无法按 RTMP 块流解析的流"""
+        # 直接在原始字节上判断是否包含命令，只有命中时才解码字节流
+        has_connect = not entry.server_address and CONNECT_PATTERN.search(data)
+        has_publish = not entry.stream_code and FCPUBLISH_PATTERN.search(data)
+        if not (has_connect or has_publish):
+            return
+
+        payload = bytes(data).decode("utf-8", errors="ignore")
+        # 查找推流服务器地址
+        if has_connect:
+            server_match = re.search(
+                r"(rtmp://[a-zA-Z0-9\-\.]+/[^/]+)", payload
+            )
+            if server_match:
+                self._set_server_address(entry, server_match.group(1).split("\x00")[0], dst_port)
+
+        # 查找推流码
+        if has_publish:
+            code_match = re.search(
+                r"(stream-\d+\?[a-zA-Z0-9_]+=[a-zA-Z0-9\-]+(?:&[a-zA-Z0-9_]+=[a-zA-Z0-9\-]+)*)",
+                payload,
+            )
+            if code_match:
+                stream_code = code_match.group(1)
+                # 去掉紧跟在推流码后的 RTMP 块头字节
+                if stream_code.endswith("C"):
+                    stream_code = stream_code[:-1]
+                self._set_stream_code(entry, stream_code)
+
+    def _set_server_address(self, entry, server_address, dst_port):
+        """记录连接上的推流服务器地址"""
+        entry.server_address = server_address
+        self.host_servers[entry.host] = server_address
+        if server_address != self.server_address:
+            self.server_address = server_address
+            self.logger.info(
+                f"\n>>> 找到推流服务器地址 <<<\n地址:{self.server_address}"
+            )
+        # 记录非默认推流端口，下次抓包时加入过滤器
+        if self.capture_filter.learn_port(dst_port):
+            self.logger.info(f"已记录推流端口 {dst_port}")
+
+    def _set_stream_code(self, entry, stream_code):
+        """记录连接上的推流码"""
+        entry.stream_code = stream_code
+        if stream_code != self.stream_code:
+            self.stream_code = stream_code
+            self.logger.info(
+                f"\n>>> 找到推流码 <<<\n推流码:{self.stream_code}"
+            )
+
+    def _check_complete(self, entry, interface):
+        """连接上的两个信息都获取到时发出一组推流信息，达到停止条件时停止所有接口的捕获
+
+        同一主机的连接可以使用该主机其他连接上发现的推流服务器地址；相同的推流信息只发出一次。
+        在持有锁时调用，回调加入 notifications，释放锁后执行。
+        """
+        server_address = entry.server_address or self.host_servers.get(entry.host)
+        if not (server_address and entry.stream_code and self.is_capturing):
+            return
+        entry.done = True
+        # 持续监听模式只与上一组比较，轮换后又换回之前的推流信息时也会发出
+        previous = self.credentials[-1:] if self.watching else self.credentials
+        for item in previous:
+            if item["server_address"] == server_address and item["stream_code"] == entry.stream_code:
+                return
+        now = time.monotonic()
+        latency = now - entry.started
+        self.credentials.append({
+            "server_address": server_address,
+            "stream_code": entry.stream_code,
+            "host": entry.host,
+            "interface": interface,
+            "elapsed": now - self.stats.started,
+            "latency": latency,
+        })
+        self.server_address = server_address
+        self.stream_code = entry.stream_code
+        final = bool(self.match_limit) and len(self.credentials) >= self.match_limit
+        if final:
+            # 停止所有接口的捕获，只发出通知，当前处理线程返回后退出
+            self.is_capturing = False
+            self._halt()
+        count = len(self.credentials)
+        watching = self.watching
+        stream_code = entry.stream_code
+        host = entry.host
+
+        def notify():
+            # 触发回调
+            for callback in self.callbacks:
+                try:
+                    callback(server_address, stream_code)
+                except Exception as e:
+                    self.logger.error(f"执行回调函数时发生错误: {str(e)}")
+            if final:
+                self._finish("已获取所需信息，停止所有接口捕获")
+            elif watching:
+                self._notify_update(server_address, stream_code, latency, count)
+            else:
+                self.logger.info(f"已获取第 {count} 组推流信息（推流主机 {host}），继续捕获")
+
+        self.notifications.append(notify)
+
+    def _notify_update(self, server_address, stream_code, latency, count):
+        """持续监听模式下推流信息变化：输出发现变化的耗时并调用更新回调"""
+        if count > 1:
+            self.logger.info(f"检测到推流信息变化，从新连接建立到发现变化耗时 {latency:.3f} 秒")
+        else:
+            self.logger.info(f"已获取推流信息，从连接建立到获取耗时 {latency:.3f} 秒，继续监听")
+        for callback in self.update_callbacks:
+            try:
+                callback(server_address, stream_code, latency)
+            except Exception as e:
+                self.logger.error(f"执行回调函数时发生错误: {str(e)}")
+
+    def _check_deadline(self):
+        """达到配置的捕获时长时停止所有接口的捕获"""
+        deadline = self.deadline
+        if deadline is None or not self.is_capturing or time.monotonic() < deadline:
+            return
+        with self.lock:
+            count = len(self.credentials)
+        self._end_session(f"已达到捕获时长，共获取 {count} 组推流信息，停止所有接口捕获")
+
+    def _end_session(self, message):
+        """在抓包或处理线程中结束会话：通知所有线程退出并按达到停止条件通知，不等待线程结束"""
+        with self.lock:
+            if not self.is_capturing:
+                return
+            self.is_capturing = False
+            self._halt()
+        self._finish(message)
+
+    def _finish(self, message):
+        """捕获因达到停止条件而结束：通知并输出会话摘要，在释放锁后调用"""
+        credentials = self.get_credentials()
+        for callback in self.finish_callbacks:
+            try:
+                callback(credentials)
+            except Exception as e:
+                self.logger.error(f"执行回调函数时发生错误: {str(e)}")
+        self.logger.info(message)
+        self._log_session_summary()
 
     def test_capture(self, interfaces, callback):
         """测试接口是否可以捕获到数据
-        
+
+        所有接口并行检测：先比较网卡收发包计数，只对有流量的接口短时间抓包确认，
+        任意接口抓到数据包即结束。
+
         Args:
             interfaces: 要测试的接口列表
-            callback: 测试完成的回调函数，参数为布尔值表示是否检测到数据
+            callback: 测试完成的回调函数，参数为 {接口名: {"status": 探测结果, "packets": 网卡计数变化}}，
+                探测结果见 core.probe 中的 PROBE_* 常量
         """
         def _test():
             try:
-                # 获取Windows网络接口列表
-                from scapy.arch.windows import get_windows_if_list
-                windows_interfaces = get_windows_if_list()
-                
-                has_data = False
+                # 获取网络接口列表
+                names = {iface.get("name") for iface in self.backend.list_interfaces()}
+                selected = []
                 for interface_display_name in interfaces:
                     # 从显示名称中提取实际的接口名称
                     interface = interface_display_name.split(" [")[0].strip()
-                    
-                    # 查找匹配的接口
-                    interface_found = None
-                    for iface in windows_interfaces:
-                        if iface.get("name") == interface:
-                            interface_found = iface.get("name")
-                            break
-                    
-                    if interface_found:
-                        # 使用sniff函数进行短时间捕获
-                        packets = sniff(iface=interface_found, timeout=5)
-                        if len(packets) > 0:
-                            has_data = True
-                            break
-                
-                # 调用回调函数
-                callback(has_data)
-                
+                    if interface in names:
+                        selected.append(interface)
+
+                start = time.perf_counter()
+                results = probe_interfaces(selected, open_socket=self.backend.open)
+                self.logger.info(
+                    f"检测 {len(selected)} 个接口耗时 {time.perf_counter() - start:.1f} 秒"
+                )
+                callback(results)
+
             except Exception as e:
                 self.logger.error(f"测试捕获时发生错误: {str(e)}")
-                callback(False)
+                callback({})
         
         # 在新线程中运行测试
         threading.Thread(target=_test, daemon=True).start()
@@ -0,0 +1,291 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import psutil
+
+from core.dns import DNS_PORT
+from utils.config import get_config, set_config
+
+# RTMP 默认端口
+DEFAULT_RTMP_PORTS = [1935]
+# 默认截断长度：以太网/IP/TCP 头约 66 字节，connect/FCPublish 的 AMF 命令位于其后的几百字节内
+DEFAULT_SNAPLEN = 640
+# 速率统计的输出间隔（秒）
+RATE_REPORT_INTERVAL = 5
+# 多个抓包线程同时打开 libpcap 句柄时，避免互相覆盖临时替换的 snaplen
+_PCAP_OPEN_LOCK = threading.Lock()
+# 最多从过滤器中排除的连接数量，超出时恢复最早排除的连接（旧连接通常已经结束）
+MAX_EXCLUDED = 8
+
+
+class CaptureFilter:
+    """抓包过滤器，根据端口和主机提示生成内核侧 BPF 表达式"""
+
+    def __init__(self, ports=None, hosts=None, snaplen=None):
+        """
+        初始化抓包过滤器
+        @param ports: 推流端口列表，默认读取配置 capture_ports，否则使用 1935
+        @param hosts: 推流服务器主机提示列表，默认读取配置 capture_hosts
+        @param snaplen: 截断长度，默认读取配置 capture_snaplen
+        """
+        self.ports = set(ports or get_config("capture_ports") or DEFAULT_RTMP_PORTS)
+        self.learned_ports = set(get_config("learned_ports") or [])
+        self.hosts = set(hosts or get_config("capture_hosts") or [])
+        self.snaplen = int(snaplen or get_config("capture_snaplen") or DEFAULT_SNAPLEN)
+        # 配置 capture_filter 为 False 时退回到不过滤的全量抓包
+        enabled = get_config("capture_filter")
+        self.enabled = True if enabled is None else bool(enabled)
+        # 已获取推流信息、不再需要检查的推流连接 {(客户端地址, 客户端端口): None}，只在本次运行中有效
+        self.excluded = OrderedDict()
+        # 是否同时捕获 DNS 响应，以及从中学习到的推流服务器地址，见 core.dns.IngestLearner
+        self.dns = False
+        self.ingest_hosts = []
+        # 推流进程的连接 [(远端地址, 本地端口)]，见 core.process_scope.ProcessScope
+        self.process_endpoints = []
+
+    def all_ports(self):
+        """返回配置端口和学习到的端口"""
+        return sorted(self.ports | self.learned_ports)
+
+    def learn_port(self, port):
+        """记录在非默认端口上发现的推流端口，下次抓包时加入过滤器"""
+        if not port or port in self.ports or port in self.learned_ports:
+            return False
+        self.learned_ports.add(port)
+        set_config("learned_ports", sorted(self.learned_ports))
+        return True
+
+    def is_server_port(self, port):
+        """端口是否为配置或学习到的推流端口"""
+        return port in self.ports or port in self.learned_ports
+
+    def exclude(self, host, port):
+        """
+        从过滤器中排除一个推流连接，连接上之后的音视频数据不再送达 Python
+        @param host: 推流客户端地址
+        @param port: 推流客户端端口
+        @return: 过滤器是否改变
+        """
+        if (host, port) in self.excluded:
+            return False
+        self.excluded[(host, port)] = None
+        while len(self.excluded) > MAX_EXCLUDED:
+            self.excluded.popitem(last=False)
+        return True
+
+    def clear_excluded(self):
+        self.excluded.clear()
+
+    def set_ingest_hosts(self, addresses):
+        """
+        设置本次会话 DNS 响应确认的推流服务器地址，非空时只捕获与这些地址之间的 TCP 数据包，
+        不再按端口过滤（缓存中的地址可能已过时，不应传入）
+        @param addresses: 地址列表
+        @return: 过滤器是否改变
+        """
+        addresses = sorted(addresses)
+        if addresses == self.ingest_hosts:
+            return False
+        self.ingest_hosts = addresses
+        return True
+
+    def set_process_endpoints(self, endpoints):
+        """
+        设置推流进程的连接，非空时只捕获这些连接的 TCP 数据包，优先于端口和学习到的推流服务器地址
+        @param endpoints: [(远端地址, 本地端口)]
+        @return: 过滤器是否改变
+        """
+        endpoints = sorted(endpoints)
+        if endpoints == self.process_endpoints:
+            return False
+        self.process_endpoints = endpoints
+        return True
+
+    def build(self):
+        """
+        生成 BPF 过滤表达式
+        @return: BPF 表达式字符串，未启用时返回 None
+        """
+        if not self.enabled:
+            return None
+
+        if self.process_endpoints:
+            expression = "tcp and (" + " or ".join(
+                f"(host {host} and port {port})" for host, port in self.process_endpoints
+            ) + ")"
+        elif self.ingest_hosts:
+            expression = "tcp and (" + " or ".join(
+                f"host {host}" for host in self.ingest_hosts
+            ) + ")"
+        else:
+            expression = " or ".join(f"port {port}" for port in self.all_ports())
+            if self.hosts:
+                expression = f"({expression}) and (" + " or ".join(
+                    f"host {host}" for host in sorted(self.hosts)
+                ) + ")"
+            expression = f"tcp and ({expression})"
+        for host, port in self.excluded:
+            expression += f" and not (host {host} and port {port})"
+        if self.dns:
+            expression = f"({expression}) or (udp src port {DNS_PORT})"
+        return expression
+
+    def matches(self, src_ip, src_port, dst_ip, dst_port):
+        """
+        TCP 段是否符合当前过滤表达式中的 TCP 部分（不考虑排除的连接），
+        用于在用户态判断句柄送达的帧是否为推流候选（句柄可能未能设置过滤器）
+        @return: 是否符合
+        """
+        hosts = (src_ip, dst_ip)
+        ports = (src_port, dst_port)
+        if self.process_endpoints:
+            return any(
+                host in hosts and port in ports for host, port in self.process_endpoints
+            )
+        if self.ingest_hosts:
+            return src_ip in self.ingest_hosts or dst_ip in self.ingest_hosts
+        return (self.is_server_port(src_port) or self.is_server_port(dst_port)) and (
+            not self.hosts or src_ip in self.hosts or dst_ip in self.hosts
+        )
+
+    def open_socket(self, interface):
+        """
+        打开带过滤器的监听套接字
+        @param interface: 网络接口名称
+        @return: scapy 监听套接字
+        """
+        from core.backends import load_scapy_layers
+        from scapy.config import conf
+
+        load_scapy_layers()
+        bpf = self.build()
+        if conf.use_pcap and self.enabled:
+            # Npcap/libpcap：在打开句柄时设置 snaplen，由驱动截断数据包
+            return _open_pcap_socket(interface, bpf, self.snaplen)
+        return conf.L2listen(iface=interface, filter=bpf)
+
+
+def _open_pcap_socket(interface, bpf, snaplen):
+    """打开指定 snaplen 的 libpcap 监听套接字
+
+    使用 scapy 的公开构造函数，由它设置 BIOCIMMEDIATE 并合并 conf.except_filter；
+    构造函数固定以 scapy.arch.libpcap 模块中的 MTU 作为 snaplen，打开句柄期间临时替换
+    （依赖的 scapy 版本范围见 requirements.txt）
+    """
+    from scapy.arch import libpcap
+    from scapy.config import conf
+
+    with _PCAP_OPEN_LOCK:
+        mtu = libpcap.MTU
+        libpcap.MTU = snaplen
+        try:
+            return libpcap.L2pcapListenSocket(
+                iface=interface, promisc=conf.sniff_promisc, filter=bpf or None
+            )
+        finally:
+            libpcap.MTU = mtu
+
+
+class PacketRateMeter:
+    """统计过滤前后的包速率，并定期输出到数据包控制台"""
+
+    def __init__(self, logger, interval=RATE_REPORT_INTERVAL, drops=None):
+        """
+        初始化速率统计
+        @param logger: 日志对象
+        @param interval: 输出间隔（秒）
+        @param drops: 返回累计丢弃包数的函数，用于输出处理不及时丢弃的数据包
+        """
+        self.logger = logger
+        self.interval = interval
+        self.drops = drops
+        self.interfaces = []
+        # 每个线程一个计数器 [送达包数]，读取时求和，计数时不加锁
+        self.local = threading.local()
+        self.counters = []
+        self.lock = threading.Lock()
+        self.running = False
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    @property
+    def delivered(self):
+        """送达 Python 的数据包总数"""
+        with self.lock:
+            counters = list(self.counters)
+        return sum(counter[0] for counter in counters)
+
+    def count(self):
+        """记录一个送达 Python 的数据包"""
+        local = self.local
+        counter = getattr(local, "counter", None)
+        if counter is None:
+            counter = local.counter = [0]
+            with self.lock:
+                self.counters.append(counter)
+        counter[0] += 1
+
+    def start(self, interfaces):
+        """开始统计指定接口"""
+        self.interfaces = list(interfaces)
+        with self.lock:
+            self.local = threading.local()
+            self.counters = []
+        if self.running:
+            return
+        self.running = True
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(
+            target=self._report_loop, args=(self.stop_event,), daemon=True
+        )
+        self.thread.start()
+
+    def stop(self):
+        """停止统计，不等待线程结束"""
+        self.running = False
+        self.stop_event.set()
+
+    def join(self, timeout=None):
+        """等待统计线程退出"""
+        thread = self.thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+            if not thread.is_alive():
+                self.thread = None
+
+    def _nic_packets(self):
+        """读取接口的收发包计数，即不过滤时需要处理的包数量"""
+        try:
+            counters = psutil.net_io_counters(pernic=True)
+        except Exception:
+            return None
+        total = 0
+        for interface in self.interfaces:
+            counter = counters.get(interface)
+            if counter:
+                total += counter.packets_recv + counter.packets_sent
+        return total
+
+    def _report_loop(self, stop):
+        last_time = time.monotonic()
+        last_nic = self._nic_packets()
+        last_delivered = 0
+        while not stop.wait(self.interval):
+            now = time.monotonic()
+            elapsed = now - last_time
+            nic = self._nic_packets()
+            delivered = self.delivered
+
+            if last_nic is not None and nic is not None:
+                before = f"{(nic - last_nic) / elapsed:.0f} pps"
+            else:
+                before = "未知"
+            after = f"{(delivered - last_delivered) / elapsed:.0f} pps"
+            dropped = f" / 丢弃: {self.drops()} 个" if self.drops else ""
+            current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            self.logger.packet(
+                f"[{current_time}] 速率统计 过滤前: {before} / 过滤后: {after}{dropped}"
+            )
+            last_time, last_nic, last_delivered = now, nic, delivered
@@ -0,0 +1,87 @@
+import time
+from collections import OrderedDict
+
+from utils.config import get_config
+
+# 同一个段在不同接口上出现的最大时间间隔（秒），超过后视为新的段（如重传）
+DEDUP_WINDOW = 0.5
+# 最多记录的段数量，超出时淘汰最早的记录
+DEFAULT_MAX_SEGMENTS = 4096
+# 计算负载哈希时使用的前缀长度（字节）
+HASH_PREFIX = 64
+
+
+class SegmentDeduplicator:
+    """跨接口的重复段过滤
+
+    VPN 或虚拟网卡桥接到物理网卡时，同一个 TCP 段会在多个接口上各出现一次。
+    按 (四元组, 序列号, 负载长度, 负载前缀哈希) 记录最近 DEDUP_WINDOW 秒内见过的段，
+    在另一个接口上重复出现的段只计数，不再分类和提取，并按 (先到的接口, 重复的接口) 统计重复次数；
+    同一接口上再次出现的段是重传，照常交给重组处理。
+    """
+
+    def __init__(self, window=DEDUP_WINDOW, max_segments=DEFAULT_MAX_SEGMENTS):
+        """
+        初始化重复段过滤
+        @param window: 时间窗口（秒）
+        @param max_segments: 最多记录的段数量
+        """
+        self.window = window
+        self.max_segments = max_segments
+        # {段标识: (首次出现时间, 接口)}，按出现时间排序
+        self.segments = OrderedDict()
+        # {(先到的接口, 重复的接口): 重复次数}
+        self.pairs = {}
+        self.suppressed = 0
+
+    def __len__(self):
+        return len(self.segments)
+
+    def is_duplicate(self, interface, key, seq, payload, now=None):
+        """
+        判断段是否在时间窗口内已经在其他接口上出现过，未出现过时记录
+        @param interface: 接口名
+        @param key: 单向四元组 (源地址, 源端口, 目的地址, 目的端口)
+        @param seq: TCP 序列号
+        @param payload: TCP 负载（bytes 或 memoryview）
+        @param now: 当前时间（time.monotonic）
+        @return: 是否为其他接口上已出现过的重复段
+        """
+        now = time.monotonic() if now is None else now
+        segment = (key, seq, len(payload), hash(bytes(payload[:HASH_PREFIX])))
+        segments = self.segments
+        seen = segments.get(segment)
+        if seen is not None and now - seen[0] <= self.window and seen[1] != interface:
+            pair = (seen[1], interface)
+            self.pairs[pair] = self.pairs.get(pair, 0) + 1
+            self.suppressed += 1
+            return True
+
+        if seen is not None:
+            del segments[segment]
+        segments[segment] = (now, interface)
+        # 淘汰超出时间窗口或数量上限的记录
+        while segments:
+            first_time = next(iter(segments.values()))[0]
+            if now - first_time <= self.window and len(segments) <= self.max_segments:
+                break
+            segments.popitem(last=False)
+        return False
+
+    def get_stats(self):
+        """
+        获取重复统计
+        @return: {"suppressed": 过滤的重复段数, "pairs": {(先到的接口, 重复的接口): 次数}}
+        """
+        return {"suppressed": self.suppressed, "pairs": dict(self.pairs)}
+
+    def clear(self):
+        self.segments.clear()
+        self.pairs.clear()
+        self.suppressed = 0
+
+
+def dedup_enabled():
+    """配置 capture_dedup 为 False 时不过滤重复段"""
+    enabled = get_config("capture_dedup")
+    return True if enabled is None else bool(enabled)
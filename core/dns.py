@@ -0,0 +1,214 @@
+import json
+import os
+import re
+import struct
+import threading
+import time
+from socket import inet_ntoa
+
+from utils.config import get_config
+
+DNS_PORT = 53
+# 推流域名特征（小写，不含末尾的点），配置 capture_dns_domains 可以替换
+DEFAULT_PUSH_DOMAINS = (r"^push-rtmp-[a-z0-9\-]+\.douyincdn\.com$",)
+# 学习到的推流服务器地址缓存文件
+CACHE_FILE = os.path.join("~", ".douyin-rtmp", "ingest_cache.json")
+# 缓存有效期的上下限（秒），DNS TTL 为 0 或很短时仍保留一小段时间
+MIN_CACHE_TTL = 30
+MAX_CACHE_TTL = 3600
+# 最多缓存和同时用于过滤的推流服务器地址数量，超出时淘汰最早过期的地址
+MAX_INGEST_HOSTS = 16
+
+DNS_TYPE_A = 1
+DNS_TYPE_CNAME = 5
+DNS_FLAG_RESPONSE = 0x8000
+DNS_RCODE_MASK = 0x000F
+# 解析域名时最多跟随的压缩指针数，避免恶意构造的响应形成循环
+MAX_NAME_POINTERS = 16
+
+_unpack_header = struct.Struct("!2xHHH4x").unpack_from
+_unpack_record = struct.Struct("!HHIH").unpack_from
+_unpack_u16 = struct.Struct("!H").unpack_from
+DNS_HEADER_SIZE = 12
+
+
+def dns_learning_enabled():
+    """是否从 DNS 响应中学习推流服务器地址，配置 capture_dns"""
+    return bool(get_config("capture_dns"))
+
+
+def _read_name(data, offset):
+    """读取（可能压缩的）域名，返回 (小写域名, 域名之后的偏移)"""
+    labels = []
+    end = None
+    pointers = 0
+    while True:
+        length = data[offset]
+        if length & 0xC0 == 0xC0:
+            if end is None:
+                end = offset + 2
+            pointers += 1
+            if pointers > MAX_NAME_POINTERS:
+                raise ValueError("域名压缩指针过多")
+            offset = _unpack_u16(data, offset)[0] & 0x3FFF
+            continue
+        offset += 1
+        if not length:
+            break
+        labels.append(bytes(data[offset:offset + length]).decode("ascii", errors="replace"))
+        offset += length
+    return ".".join(labels).lower(), offset if end is None else end
+
+
+def parse_response(payload):
+    """
+    解析 DNS 响应中的域名和 IPv4 地址，snaplen 截断时返回截断前已解析的部分
+    @param payload: UDP 负载（bytes 或 memoryview）
+    @return: (域名集合, [(地址, TTL)])，域名包括查询的域名和 CNAME 链上的域名；
+        不是成功的 DNS 响应时返回 None
+    """
+    try:
+        flags, questions, answers = _unpack_header(payload)
+    except struct.error:
+        return None
+    if not flags & DNS_FLAG_RESPONSE or flags & DNS_RCODE_MASK:
+        return None
+
+    names = set()
+    addresses = []
+    try:
+        offset = DNS_HEADER_SIZE
+        for _ in range(questions):
+            name, offset = _read_name(payload, offset)
+            names.add(name)
+            offset += 4
+        for _ in range(answers):
+            name, offset = _read_name(payload, offset)
+            record_type, _, ttl, length = _unpack_record(payload, offset)
+            offset += 10
+            if offset + length > len(payload):
+                break
+            if record_type == DNS_TYPE_CNAME:
+                names.add(name)
+                names.add(_read_name(payload, offset)[0])
+            elif record_type == DNS_TYPE_A and length == 4:
+                addresses.append((inet_ntoa(bytes(payload[offset:offset + 4])), ttl))
+            offset += length
+    except (struct.error, IndexError, ValueError):
+        pass
+    return names, addresses
+
+
+class IngestLearner:
+    """从 DNS 响应中学习推流服务器地址
+
+    直播伴侣在连接推流服务器之前解析推流域名，抓包时读取 DNS 响应（UDP 源端口 53），
+    查询域名或 CNAME 链命中推流域名特征时记录响应中的全部 IPv4 地址。
+    学习到的地址按 DNS TTL 缓存到 ~/.douyin-rtmp。缓存中的地址可能已经过时（推流服务器换了地址），
+    只有本次会话的 DNS 响应中再次出现的地址才会用于收窄过滤器，见 confirmed_addresses。
+    """
+
+    def __init__(self, patterns=None, cache_path=None):
+        """
+        初始化
+        @param patterns: 推流域名正则列表，默认读取配置 capture_dns_domains
+        @param cache_path: 缓存文件路径
+        """
+        self.patterns = [
+            re.compile(pattern)
+            for pattern in patterns or get_config("capture_dns_domains") or DEFAULT_PUSH_DOMAINS
+        ]
+        self.cache_path = os.path.expanduser(cache_path or CACHE_FILE)
+        # {地址: (域名, 过期时间 time.time())}
+        self.hosts = self._load()
+        # 本次会话 DNS 响应中出现过的地址
+        self.confirmed = set()
+        # feed 只修改内存中的地址，由调用方在释放抓包锁之后调用 save 写入缓存文件
+        self.dirty = False
+        self.save_lock = threading.Lock()
+        # 本次会话从 DNS 响应中学习到的地址数量和检查的 DNS 响应数量
+        self.learned = 0
+        self.responses = 0
+
+    def is_push_domain(self, name):
+        return any(pattern.search(name) for pattern in self.patterns)
+
+    def addresses(self):
+        """未过期的推流服务器地址，按地址排序"""
+        now = time.time()
+        return sorted(address for address, (_, expires) in self.hosts.items() if expires > now)
+
+    def confirmed_addresses(self):
+        """本次会话 DNS 响应确认且未过期的推流服务器地址，按地址排序"""
+        now = time.time()
+        return sorted(
+            address for address in self.confirmed
+            if address in self.hosts and self.hosts[address][1] > now
+        )
+
+    def feed(self, payload):
+        """
+        检查一个 DNS 响应
+        @param payload: UDP 负载
+        @return: 本次会话新确认的 [(地址, 域名)]，已确认的地址只刷新过期时间
+        """
+        self.responses += 1
+        result = parse_response(payload)
+        if result is None:
+            return []
+        names, addresses = result
+        domain = next((name for name in sorted(names) if self.is_push_domain(name)), None)
+        if domain is None or not addresses:
+            return []
+
+        now = time.time()
+        learned = []
+        for address, ttl in addresses:
+            known = self.hosts.get(address)
+            if address not in self.confirmed or known is None or known[1] <= now:
+                self.confirmed.add(address)
+                learned.append((address, domain))
+            ttl = min(max(ttl, MIN_CACHE_TTL), MAX_CACHE_TTL)
+            self.hosts[address] = (domain, now + ttl)
+        while len(self.hosts) > MAX_INGEST_HOSTS:
+            oldest = min(self.hosts, key=lambda address: self.hosts[address][1])
+            del self.hosts[oldest]
+            self.confirmed.discard(oldest)
+        self.learned += len(learned)
+        self.dirty = True
+        return learned
+
+    def _load(self):
+        """读取缓存中未过期的地址"""
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        now = time.time()
+        hosts = {}
+        for address, entry in cache.items():
+            try:
+                if entry["expires"] > now:
+                    hosts[address] = (entry["host"], float(entry["expires"]))
+            except (TypeError, KeyError):
+                continue
+        return hosts
+
+    def save(self):
+        """将 feed 之后的地址写入缓存文件，没有变化时不写，可以在多个线程中调用"""
+        with self.save_lock:
+            if not self.dirty:
+                return
+            self.dirty = False
+            now = time.time()
+            cache = {
+                address: {"host": host, "expires": expires}
+                for address, (host, expires) in dict(self.hosts).items() if expires > now
+            }
+            try:
+                os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+                with open(self.cache_path, "w", encoding="utf-8") as f:
+                    json.dump(cache, f, ensure_ascii=False, indent=4)
+            except OSError:
+                pass
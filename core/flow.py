@@ -0,0 +1,162 @@
+from collections import OrderedDict
+
+from core.prefilter import has_signature
+from core.reassembly import TCP_FIN, TCP_RST, TCP_SYN
+from core.rtmp import RTMP_VERSION
+
+# 流的分类结果
+FLOW_UNKNOWN = 0    # 尚未确定
+FLOW_HANDSHAKE = 1  # 以 RTMP 握手开始的流
+FLOW_COMMAND = 2    # 负载命中推流命令特征的流
+FLOW_DROP = 3       # 不是 RTMP，之后的数据包直接丢弃
+
+# 流表最多保存的流数量，超出时淘汰最久未使用的流
+DEFAULT_MAX_FLOWS = 4096
+# 中途开始跟踪的流（未见到 SYN 或连接开头的段）最多检查的负载包数量
+MIDSTREAM_PACKETS = 8
+# C0+C1 共 1537 字节，按 MSS 拆分时首个段也不少于 TCP 最小 MSS（536 字节）；
+# 客户端也可能先单独发送 1 字节的 C0
+MIN_HANDSHAKE_SEGMENT = 536
+
+# HTTP 请求和响应的开头
+HTTP_PREFIXES = (
+    b"GET ", b"POST ", b"PUT ", b"HEAD ", b"DELETE ", b"OPTIONS ", b"PATCH ", b"CONNECT ",
+    b"HTTP/1.",
+)
+# TLS 记录类型：change_cipher_spec、alert、handshake、application_data
+TLS_RECORD_TYPES = frozenset((0x14, 0x15, 0x16, 0x17))
+
+
+class Flow:
+    """单个方向的流状态"""
+
+    __slots__ = ("state", "isn", "packets")
+
+    def __init__(self, isn=None):
+        self.state = FLOW_UNKNOWN
+        # SYN 的序列号，中途开始跟踪的流为 None
+        self.isn = isn
+        # 已检查的负载包数量
+        self.packets = 0
+
+
+def is_tls(payload):
+    """负载是否以 TLS 记录头开始"""
+    return len(payload) >= 3 and payload[0] in TLS_RECORD_TYPES and payload[1] == 0x03 \
+        and payload[2] <= 0x04
+
+
+def is_http(payload):
+    """负载是否以 HTTP 请求方法或响应行开始"""
+    return bytes(payload[:8]).startswith(HTTP_PREFIXES)
+
+
+class FlowTable:
+    """按四元组记录流的分类结果
+
+    每个流只在最初的几个负载包中分类，确定不是 RTMP 的流之后只需一次字典查找即可丢弃。
+    推流端口上的流不按内容丢弃，一直等待握手或命令。
+    """
+
+    def __init__(self, max_flows=DEFAULT_MAX_FLOWS, is_server_port=None):
+        """
+        初始化流表
+        @param max_flows: 最多保存的流数量
+        @param is_server_port: 判断端口是否为推流端口的函数，见 CaptureFilter.is_server_port
+        """
+        self.max_flows = max_flows
+        self.is_server_port = is_server_port or (lambda port: False)
+        self.flows = OrderedDict()
+        # 因分类为非 RTMP 而丢弃的数据包数量
+        self.dropped = 0
+        # 中途开始跟踪且尚未分类的流每隔多少个数据包检查一次，1 表示全部检查
+        self.sample_interval = 1
+        # 因抽样而跳过检查的数据包数量
+        self.sampled = 0
+        self.tick = 0
+
+    def __len__(self):
+        return len(self.flows)
+
+    def clear(self):
+        """清空所有流"""
+        self.flows.clear()
+        self.dropped = 0
+        self.sample_interval = 1
+        self.sampled = 0
+
+    def classify(self, key, seq, flags, payload, length=None):
+        """
+        更新并返回流的分类
+        @param key: 单向四元组 (源地址, 源端口, 目的地址, 目的端口)
+        @param seq: TCP 序列号
+        @param flags: TCP 标志
+        @param payload: TCP 负载（bytes 或 memoryview）
+        @param length: 负载的实际长度（snaplen 截断前）
+        @return: Flow；未跟踪的流的纯 ACK 等无需处理的段返回 None
+        """
+        flows = self.flows
+        flow = flows.get(key)
+        if flow is not None:
+            if flow.state == FLOW_DROP:
+                if flags & (TCP_FIN | TCP_RST):
+                    del flows[key]
+                self.dropped += 1
+                return flow
+            if flags & (TCP_FIN | TCP_RST):
+                # 连接结束，端口复用时重新分类
+                del flows[key]
+            else:
+                # 已丢弃的流不刷新 LRU 位置，表满时优先淘汰
+                flows.move_to_end(key)
+            if flow.state == FLOW_UNKNOWN and payload:
+                if flow.isn is None and self._sampled_out():
+                    return flow
+                self._inspect(flow, key, seq, payload, length)
+            return flow
+
+        if flags & TCP_SYN:
+            flow = Flow(seq)
+        elif payload and not self._sampled_out():
+            flow = Flow()
+        else:
+            return None
+        if len(flows) >= self.max_flows:
+            flows.popitem(last=False)
+        flows[key] = flow
+        if payload:
+            if flags & TCP_SYN:
+                # SYN 携带的数据（TCP Fast Open）从下一个序列号开始
+                seq = (seq + 1) & 0xFFFFFFFF
+            self._inspect(flow, key, seq, payload, length)
+        return flow
+
+    def _sampled_out(self):
+        """抽样时判断本包是否跳过；从 SYN 开始跟踪的流需要首个负载段分类，不参与抽样"""
+        if self.sample_interval <= 1:
+            return False
+        self.tick += 1
+        if self.tick % self.sample_interval:
+            self.sampled += 1
+            return True
+        return False
+
+    def _inspect(self, flow, key, seq, payload, length):
+        """根据负载内容分类"""
+        flow.packets += 1
+        # 从连接建立开始跟踪且本段从连接的第一个字节开始（乱序或丢失时首个到达的段可能不是）
+        first = flow.isn is not None and seq == (flow.isn + 1) & 0xFFFFFFFF
+        size = length or len(payload)
+        if first and payload[0] == RTMP_VERSION and (size == 1 or size >= MIN_HANDSHAKE_SEGMENT):
+            # 应用协议的开头为 C0 或 C0+C1，端口不限
+            flow.state = FLOW_HANDSHAKE
+        elif has_signature(payload):
+            flow.state = FLOW_COMMAND
+        elif self.is_server_port(key[1]) or self.is_server_port(key[3]):
+            # 推流端口上的流不丢弃，等待握手（首段乱序到达时）或命令
+            return
+        elif is_tls(payload) or is_http(payload):
+            flow.state = FLOW_DROP
+        elif first or flow.packets >= MIDSTREAM_PACKETS:
+            # 连接的开头既不是握手也不是命令，或中途开始跟踪的流在最初几个包中没有命令
+            flow.state = FLOW_DROP
@@ -5,7 +5,9 @@ import threading
 from datetime import datetime
 from pathlib import Path
 
-class LogCapture:
+from core.aio import EVENT_FINISHED, EVENT_STOPPED, AsyncCaptureMixin
+
+class LogCapture(AsyncCaptureMixin):
     def __init__(self, logger):
         self.logger = logger
         self.is_capturing = False
@@ -13,6 +15,8 @@ class LogCapture:
         self.callbacks = []
         self.server_address = None
         self.stream_code = None
+        # asyncio 接口的事件订阅，见 core.aio
+        self._init_events()
 
     def add_callback(self, callback):
         """添加回调函数"""
@@ -46,6 +50,7 @@ class LogCapture:
             self.capture_thread.join()
             self.capture_thread = None
         self.logger.info("停止日志模式抓取推流系统")
+        self._publish({"type": EVENT_STOPPED})
         
     def _get_latest_log_file(self, log_dir):
         """获取最新的日志文件"""
@@ -123,6 +128,11 @@ class LogCapture:
                             callback(self.server_address, self.stream_code)
                         except Exception as e:
                             self.logger.info(f"回调执行失败: {e}")
+                    if not self.is_capturing:
+                        self._publish({"type": EVENT_FINISHED, "credentials": [{
+                            "server_address": self.server_address,
+                            "stream_code": self.stream_code,
+                        }]})
         except Exception as e:
             self.logger.info(f"解析推流信息失败: {e}")
             
@@ -0,0 +1,101 @@
+import struct
+
+# 链路层类型（pcap linktype）
+DLT_NULL = 0
+DLT_EN10MB = 1
+DLT_RAW_ALT = 12
+DLT_RAW = 101
+DLT_LOOP = 108
+DLT_LINUX_SLL = 113
+
+ETH_P_IP = 0x0800
+ETH_P_8021Q = 0x8100
+ETH_P_IPV6 = 0x86DD
+PROTO_TCP = 6
+PROTO_UDP = 17
+
+# 可以解析但不是 IPv4 TCP 的帧（IPv6、ARP、UDP、IP 分片等），无需处理
+SKIP = ()
+
+_unpack_u16 = struct.Struct("!H").unpack_from
+_unpack_ip = struct.Struct("!BxHxxHxB2x4s4s").unpack_from
+_unpack_tcp = struct.Struct("!HHIxxxxBB").unpack_from
+_unpack_udp = struct.Struct("!HHH").unpack_from
+
+
+def _ip_offset(frame, linktype):
+    """
+    按链路层类型跳过链路层头
+    @return: IPv4 头的偏移；非 IPv4 帧返回 SKIP；不支持的链路层类型返回 None。
+        帧过短时抛出 struct.error 或 IndexError，由调用方处理
+    """
+    if linktype == DLT_EN10MB:
+        eth_type = _unpack_u16(frame, 12)[0]
+        if eth_type == ETH_P_8021Q:
+            return 18 if _unpack_u16(frame, 16)[0] == ETH_P_IP else SKIP
+        return 14 if eth_type == ETH_P_IP else SKIP
+    if linktype == DLT_NULL or linktype == DLT_LOOP:
+        # 4 字节地址族，DLT_NULL 为主机字节序，AF_INET 为 2
+        return 4 if frame[0] | frame[3] == 2 else SKIP
+    if linktype == DLT_RAW or linktype == DLT_RAW_ALT:
+        return 0 if frame[0] >> 4 == 4 else SKIP
+    if linktype == DLT_LINUX_SLL:
+        return 16 if _unpack_u16(frame, 14)[0] == ETH_P_IP else SKIP
+    return None
+
+
+def decode_tcp(frame, linktype=DLT_EN10MB):
+    """
+    直接从原始帧字节中解析以太网/IPv4/TCP 头，不经过 scapy 逐层解析
+    @param frame: 原始帧（bytes 或 memoryview）
+    @param linktype: 链路层类型
+    @return: (源地址, 目的地址, 源端口, 目的端口, 序列号, TCP 标志, 负载, 负载长度)，
+        地址为 4 字节 bytes，负载为指向原始帧的 memoryview（不复制），
+        负载长度为按 IP 头计算的实际长度（snaplen 截断时大于负载的字节数）；
+        非 IPv4 TCP 帧返回 SKIP；无法解析的帧返回 None，由调用方交给 scapy 处理
+    """
+    try:
+        offset = _ip_offset(frame, linktype)
+        if offset is None or offset is SKIP:
+            return offset
+
+        ver_ihl, total_length, frag, proto, src, dst = _unpack_ip(frame, offset)
+        if ver_ihl >> 4 != 4 or ver_ihl & 0x0F < 5:
+            return None
+        if proto != PROTO_TCP or frag & 0x1FFF:
+            # 非 TCP 或非首个 IP 分片
+            return SKIP
+
+        tcp_offset = offset + (ver_ihl & 0x0F) * 4
+        sport, dport, seq, data_offset, flags = _unpack_tcp(frame, tcp_offset)
+        payload_offset = tcp_offset + (data_offset >> 4) * 4
+        # 以 IP 总长度为准，去掉以太网填充；网卡分段卸载时本机发出的包总长度可能为 0
+        end = offset + total_length if total_length else len(frame)
+        payload = memoryview(frame)[payload_offset:end]
+        return src, dst, sport, dport, seq, flags, payload, end - payload_offset
+    except (struct.error, IndexError):
+        return None
+
+
+def decode_udp(frame, linktype=DLT_EN10MB):
+    """
+    从原始帧字节中解析以太网/IPv4/UDP 头，用于在抓包时读取 DNS 响应，不在 TCP 热路径上调用
+    @param frame: 原始帧（bytes 或 memoryview）
+    @param linktype: 链路层类型
+    @return: (源地址, 目的地址, 源端口, 目的端口, 负载)，地址为 4 字节 bytes，
+        负载为指向原始帧的 memoryview（snaplen 截断时不完整）；非 IPv4 UDP 帧或无法解析的帧返回 None
+    """
+    try:
+        offset = _ip_offset(frame, linktype)
+        if offset is None or offset is SKIP:
+            return None
+
+        ver_ihl, total_length, frag, proto, src, dst = _unpack_ip(frame, offset)
+        if ver_ihl >> 4 != 4 or ver_ihl & 0x0F < 5 or proto != PROTO_UDP or frag & 0x1FFF:
+            return None
+        udp_offset = offset + (ver_ihl & 0x0F) * 4
+        sport, dport, length = _unpack_udp(frame, udp_offset)
+        end = udp_offset + length if length >= 8 else len(frame)
+        return src, dst, sport, dport, memoryview(frame)[udp_offset + 8:end]
+    except (struct.error, IndexError):
+        return None
@@ -0,0 +1,201 @@
+import os
+import queue
+import selectors
+import socket
+import struct
+import threading
+
+from utils.config import get_config
+
+# 帧缓冲的默认容量（帧数），按 snaplen 640 字节计算约占用 5 MB
+DEFAULT_RING_SIZE = 8192
+# 缓冲占用超过该比例时对未分类的流抽样处理
+HIGH_WATER_RATIO = 0.75
+# 超过高水位时，未分类的流每隔多少个数据包检查一次
+SAMPLE_INTERVAL = 8
+# 处理线程等待新帧的超时时间（秒），停止时通过 wake 立即唤醒
+WORKER_POLL_INTERVAL = 1.0
+# 读取内核/驱动丢包数的间隔（秒）
+DROP_POLL_INTERVAL = 1.0
+
+# Linux AF_PACKET 套接字选项，读取 struct tpacket_stats 后内核计数清零
+SOL_PACKET = 263
+PACKET_STATISTICS = 6
+
+
+class FrameRing:
+    """有界帧缓冲
+
+    抓包线程只负责将原始帧放入缓冲，解析由处理线程完成；缓冲已满时丢弃新到的帧并计数，
+    避免处理变慢时阻塞抓包线程导致内核缓冲区溢出。缓冲项为 (帧, 接口, 链路层类型)。
+    """
+
+    def __init__(self, capacity=None, max_bytes=None, high_water_ratio=HIGH_WATER_RATIO):
+        """
+        初始化帧缓冲
+        @param capacity: 最多缓存的帧数，默认读取配置 capture_ring_size
+        @param max_bytes: 缓存帧的总字节数上限，None 表示只限制帧数
+        @param high_water_ratio: 高水位占容量的比例
+        """
+        self.capacity = int(capacity or get_config("capture_ring_size") or DEFAULT_RING_SIZE)
+        self.max_bytes = max_bytes
+        self.high_water = max(int(self.capacity * high_water_ratio), 1)
+        self.queue = queue.SimpleQueue()
+        self.lock = threading.Lock()
+        # 缓冲中帧的总字节数，只在限制字节数时统计
+        self.bytes = 0
+        # 缓冲已满而丢弃的帧数
+        self.dropped = 0
+        # 缓冲占用的峰值
+        self.peak = 0
+
+    def __len__(self):
+        return self.queue.qsize()
+
+    def put(self, item):
+        """
+        放入一帧，缓冲已满时丢弃
+        @return: 是否放入
+        """
+        size = self.queue.qsize()
+        if size >= self.capacity:
+            with self.lock:
+                self.dropped += 1
+            return False
+        if self.max_bytes is not None:
+            frame_size = len(item[0])
+            with self.lock:
+                if self.bytes + frame_size > self.max_bytes:
+                    self.dropped += 1
+                    return False
+                self.bytes += frame_size
+        self.queue.put(item)
+        if size >= self.peak:
+            self.peak = size + 1
+        return True
+
+    def get(self, timeout=WORKER_POLL_INTERVAL):
+        """
+        取出一帧
+        @return: 放入的帧，超时返回 None
+        """
+        try:
+            item = self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if item is not None and self.max_bytes is not None:
+            with self.lock:
+                self.bytes -= len(item[0])
+        return item
+
+    def wake(self, count):
+        """唤醒 count 个等待中的处理线程"""
+        for _ in range(count):
+            self.queue.put(None)
+
+    def above_high_water(self):
+        """缓冲占用是否超过高水位"""
+        return self.queue.qsize() >= self.high_water
+
+
+class InterfaceCounters:
+    """单个接口的抓包计数，只由读取该接口的线程更新"""
+
+    __slots__ = ("packets", "bytes", "dropped", "kernel_dropped", "first_packet")
+
+    def __init__(self):
+        self.packets = 0
+        self.bytes = 0
+        # 帧缓冲已满而丢弃的帧数
+        self.dropped = 0
+        # 内核或驱动中丢弃的帧数（接收缓冲区已满等），无法获取时为 None
+        self.kernel_dropped = None
+        # 收到第一个帧的时间（time.monotonic）
+        self.first_packet = None
+
+    def as_dict(self):
+        return {
+            "packets": self.packets,
+            "bytes": self.bytes,
+            "dropped": self.dropped,
+            "kernel_dropped": self.kernel_dropped,
+        }
+
+
+class KernelDrops:
+    """读取抓包句柄在内核（AF_PACKET）或驱动（libpcap/Npcap）中的累计丢包数"""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.total = None
+
+    def poll(self):
+        """
+        读取丢包数
+        @return: 本句柄打开以来的累计丢包数，无法获取时返回 None
+        """
+        try:
+            pcap_fd = getattr(self.sock, "pcap_fd", None)
+            if pcap_fd is not None:
+                from ctypes import byref
+
+                from scapy.libs.winpcapy import pcap_stat, pcap_stats
+
+                stat = pcap_stat()
+                if pcap_stats(pcap_fd.pcap, byref(stat)) == 0:
+                    # libpcap 返回打开以来的累计值
+                    self.total = stat.ps_drop + stat.ps_ifdrop
+                return self.total
+            ins = getattr(self.sock, "ins", None)
+            if isinstance(ins, socket.socket) and ins.family == getattr(socket, "AF_PACKET", None):
+                _, drops = struct.unpack("II", ins.getsockopt(SOL_PACKET, PACKET_STATISTICS, 8))
+                # 内核每次读取后清零，在这里累加
+                self.total = (self.total or 0) + drops
+        except Exception:
+            pass
+        return self.total
+
+
+class HandleSelector:
+    """等待多个抓包句柄中任意一个可读
+
+    Linux/macOS 上句柄的 fileno 为真实的文件描述符，使用 epoll/kqueue 一次注册，
+    每次等待的开销与句柄数量无关；Windows 上 Npcap 句柄为事件对象，使用 scapy 句柄自带的 select。
+    """
+
+    def __init__(self, handles):
+        self.handles = list(handles)
+        self.selector = None
+        if os.name != "nt":
+            self.selector = selectors.DefaultSelector()
+            for handle in self.handles:
+                self.selector.register(handle, selectors.EVENT_READ)
+
+    def __len__(self):
+        return len(self.handles)
+
+    def select(self, timeout):
+        """
+        等待句柄可读
+        @param timeout: 超时时间（秒）
+        @return: 可读的句柄列表
+        """
+        if self.selector is not None:
+            return [key.fileobj for key, _ in self.selector.select(timeout)]
+        return self.handles[0].select(self.handles, timeout)
+
+    def register(self, handle):
+        """添加一个句柄"""
+        self.handles.append(handle)
+        if self.selector is not None:
+            self.selector.register(handle, selectors.EVENT_READ)
+
+    def unregister(self, handle):
+        """移除一个句柄，需要在关闭句柄之前调用"""
+        self.handles.remove(handle)
+        if self.selector is not None:
+            self.selector.unregister(handle)
+
+    def close(self):
+        if self.selector is not None:
+            self.selector.close()
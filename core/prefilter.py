@@ -0,0 +1,22 @@
+import re
+
+# 只检查负载的前若干字节，RTMP 命令名位于块头之后的几十字节内
+SIGNATURE_WINDOW = 512
+
+# 推流相关命令及地址的特征，"ublish" 同时覆盖 publish 与 FCPublish
+SIGNATURES = (b"connect", b"ublish", b"releaseStream", b"rtmp://")
+
+# 每个特征单独编译：纯字面量正则使用快速子串查找，合并为分支正则后会退化为逐字节尝试
+_SEARCHES = tuple(re.compile(re.escape(signature)).search for signature in SIGNATURES)
+
+
+def has_signature(payload):
+    """
+    判断负载的前 SIGNATURE_WINDOW 字节中是否包含推流命令特征
+    @param payload: TCP 负载（bytes 或 memoryview，不会复制）
+    @return: 是否命中
+    """
+    for search in _SEARCHES:
+        if search(payload, 0, SIGNATURE_WINDOW) is not None:
+            return True
+    return False
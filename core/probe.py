@@ -0,0 +1,100 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import psutil
+
+from core.backends import ScapyBackend
+from core.pipeline import HandleSelector
+
+# 采样网卡计数的时间窗口（秒）
+COUNTER_WINDOW = 0.5
+# 并行抓包确认的最长时间（秒）
+SNIFF_TIMEOUT = 3.0
+
+# 探测结果
+PROBE_CAPTURED = "captured"  # 抓到了数据包，接口可用
+PROBE_NO_CAPTURE = "no_capture"  # 打开了抓包句柄，但在超时内没有抓到数据包
+PROBE_IDLE = "idle"  # 网卡计数没有流量，未抓包
+PROBE_UNCHECKED = "unchecked"  # 其他接口已确认可用，提前结束而未检查
+PROBE_ERROR = "error"  # 无法打开接口
+
+
+def _nic_counters():
+    """读取每个网卡的收发包数，无法读取时返回空字典"""
+    try:
+        counters = psutil.net_io_counters(pernic=True)
+    except Exception:
+        return {}
+    return {
+        name: counter.packets_recv + counter.packets_sent for name, counter in counters.items()
+    }
+
+
+def _open_listener(interface):
+    """打开不带过滤器的抓包句柄"""
+    return ScapyBackend().open(interface)
+
+
+def probe_interfaces(interfaces, counter_window=COUNTER_WINDOW, sniff_timeout=SNIFF_TIMEOUT,
+                     open_socket=_open_listener):
+    """
+    并行探测接口是否可以抓到数据
+
+    先比较网卡计数在 counter_window 内的变化，只对有流量（或没有计数）的接口打开抓包句柄，
+    在一个 select 循环中同时等待，任意接口抓到数据包即结束。
+    @param interfaces: 接口名列表
+    @param counter_window: 采样网卡计数的时间窗口（秒）
+    @param sniff_timeout: 并行抓包的最长时间（秒）
+    @param open_socket: 打开抓包句柄的函数，句柄见 core.backends.CaptureBackend
+    @return: {接口名: {"status": 探测结果, "packets": 时间窗口内网卡收发包数，没有计数时为 None}}
+    """
+    before = _nic_counters()
+    time.sleep(counter_window)
+    after = _nic_counters()
+
+    results = {}
+    candidates = []
+    for interface in interfaces:
+        packets = None
+        if interface in before and interface in after:
+            packets = after[interface] - before[interface]
+        results[interface] = {"status": PROBE_IDLE, "packets": packets}
+        if packets is None or packets > 0:
+            candidates.append(interface)
+    # 流量多的接口排在前面
+    candidates.sort(key=lambda name: results[name]["packets"] or 0, reverse=True)
+    if not candidates:
+        return results
+
+    sockets = {}
+    with ThreadPoolExecutor(max_workers=len(candidates)) as executor:
+        futures = {interface: executor.submit(open_socket, interface) for interface in candidates}
+    for interface, future in futures.items():
+        try:
+            sockets[future.result()] = interface
+        except Exception:
+            results[interface]["status"] = PROBE_ERROR
+    if not sockets:
+        return results
+
+    selector = HandleSelector(sockets)
+    captured = False
+    try:
+        deadline = time.monotonic() + sniff_timeout
+        while not captured:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            for sock in selector.select(remaining):
+                if sock.recv_frames():
+                    results[sockets[sock]]["status"] = PROBE_CAPTURED
+                    captured = True
+    finally:
+        selector.close()
+        for sock in sockets:
+            sock.close()
+
+    for interface in sockets.values():
+        if results[interface]["status"] == PROBE_IDLE:
+            results[interface]["status"] = PROBE_UNCHECKED if captured else PROBE_NO_CAPTURE
+    return results
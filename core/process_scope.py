@@ -0,0 +1,137 @@
+import threading
+import time
+
+import psutil
+
+from utils.config import get_config
+
+# 直播伴侣的推流进程，被结束后由直播伴侣重新启动并重新连接推流服务器
+MEDIA_SDK_PROCESS = "MediaSDK_Server.exe"
+# 检查进程连接的间隔（秒），新连接在下次检查前仍按原过滤器捕获
+PROCESS_POLL_INTERVAL = 0.05
+# 进程列表的刷新间隔（秒），期间只检查已找到的进程的连接
+PROCESS_SCAN_INTERVAL = 0.5
+# 找到连接且连续这么久（秒）没有变化后，降低检查和刷新进程列表的频率；连接变化时恢复
+PROCESS_SETTLE_TIME = 2.0
+PROCESS_IDLE_POLL_INTERVAL = 0.5
+PROCESS_IDLE_SCAN_INTERVAL = 5.0
+# 视为进程连接的 TCP 状态，TIME_WAIT 等已关闭的连接不再加入过滤器
+ACTIVE_STATES = frozenset((
+    psutil.CONN_SYN_SENT, psutil.CONN_SYN_RECV, psutil.CONN_ESTABLISHED,
+))
+
+
+def process_scope_name():
+    """配置 capture_process_scope 为 True 时按 MediaSDK_Server 进程的连接过滤，也可以配置为进程名"""
+    scope = get_config("capture_process_scope")
+    if not scope:
+        return None
+    return scope if isinstance(scope, str) else MEDIA_SDK_PROCESS
+
+
+def restart_media_sdk(logger):
+    """
+    结束直播伴侣的推流进程，直播伴侣会重新启动它并重新连接推流服务器，
+    应在开始捕获之后调用，重新连接时的握手和命令才能被捕获到
+    @param logger: 日志对象
+    """
+    try:
+        for proc in psutil.process_iter(["name"]):
+            if proc.info["name"] == MEDIA_SDK_PROCESS:
+                proc.kill()
+                logger.info("已终止 MediaSDK_Server 进程")
+    except Exception as e:
+        logger.error(f"（可忽略该报错）尝试终止 MediaSDK_Server 进程时出错: {str(e)}")
+
+
+class ProcessScope:
+    """跟踪指定名称进程的 TCP 连接
+
+    定期通过 psutil 读取进程的连接（net_connections），连接集合变化时回调，
+    回调参数为 [(远端地址, 本地端口)]，进程不存在或没有连接时为空列表。
+    进程被结束并重新启动后按名称找到新的进程。
+    已找到连接且一段时间没有变化时（推流中）降低检查频率，连接变化或进程退出后恢复。
+    """
+
+    def __init__(self, name, on_change, interval=PROCESS_POLL_INTERVAL):
+        """
+        初始化
+        @param name: 进程名
+        @param on_change: 连接集合变化时的回调，在检查线程中调用
+        @param interval: 检查间隔（秒）
+        """
+        self.name = name
+        self.on_change = on_change
+        self.interval = interval
+        self.processes = []
+        self.endpoints = []
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def start(self):
+        """开始跟踪"""
+        if self.thread is not None:
+            return
+        self.thread = threading.Thread(target=self._poll_loop, args=(self.stop_event,), daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """停止跟踪，不等待线程结束"""
+        self.stop_event.set()
+
+    def join(self, timeout=None):
+        """等待检查线程退出"""
+        thread = self.thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+            if not thread.is_alive():
+                self.thread = None
+
+    def _find_processes(self):
+        processes = []
+        for proc in psutil.process_iter(["name"]):
+            if proc.info["name"] == self.name:
+                processes.append(proc)
+        return processes
+
+    def _connections(self):
+        """读取已找到的进程的连接，返回 (远端地址, 本地端口) 集合，进程已退出时从列表中移除"""
+        endpoints = set()
+        alive = []
+        for proc in self.processes:
+            try:
+                connections = proc.net_connections(kind="tcp4")
+            except (psutil.NoSuchProcess, psutil.ZombieProcess):
+                continue
+            except psutil.AccessDenied:
+                alive.append(proc)
+                continue
+            alive.append(proc)
+            for connection in connections:
+                if connection.raddr and connection.status in ACTIVE_STATES:
+                    endpoints.add((connection.raddr.ip, connection.laddr.port))
+        self.processes = alive
+        return endpoints
+
+    def _poll_loop(self, stop):
+        next_scan = 0.0
+        # 连接集合最近一次变化的时间
+        changed = time.monotonic()
+        while not stop.is_set():
+            now = time.monotonic()
+            idle = bool(self.endpoints) and now - changed >= PROCESS_SETTLE_TIME
+            if not self.processes or now >= next_scan:
+                # 进程可能被结束后重新启动，定期按名称重新查找
+                try:
+                    self.processes = self._find_processes()
+                except psutil.Error:
+                    self.processes = []
+                next_scan = now + (PROCESS_IDLE_SCAN_INTERVAL if idle else PROCESS_SCAN_INTERVAL)
+            endpoints = sorted(self._connections())
+            if endpoints != self.endpoints:
+                self.endpoints = endpoints
+                self.on_change(endpoints)
+                changed = now
+                idle = False
+                next_scan = min(next_scan, now + PROCESS_SCAN_INTERVAL)
+            stop.wait(max(self.interval, PROCESS_IDLE_POLL_INTERVAL) if idle else self.interval)
@@ -0,0 +1,255 @@
+import socket
+import time
+from datetime import datetime
+
+import psutil
+
+from core.capture_filter import RATE_REPORT_INTERVAL
+from utils.config import get_config
+
+# 开始捕获后先观察多久再裁剪接口（秒）
+PRUNE_WARMUP = 5.0
+# 检查接口流量的间隔（秒）
+PRUNE_INTERVAL = 1.0
+# 出站包速率低于该值视为没有出站流量（pps），推流时出站速率通常在数百 pps 以上
+MIN_EGRESS_PPS = 5
+# 连续多少次检查没有出站流量后降级为只计数不解析
+DEMOTE_AFTER = 3
+# 降级的接口连续多少次检查有出站流量后恢复
+PROMOTE_AFTER = 2
+# 尚未测量到处理耗时时使用的单帧处理耗时估计（秒）
+DEFAULT_FRAME_COST = 6e-6
+
+# 接口状态
+INTERFACE_ACTIVE = "active"  # 正常解析
+INTERFACE_DEMOTED = "demoted"  # 仍在读取，只计数不解析
+INTERFACE_CLOSED = "closed"  # 已关闭抓包句柄（回环接口和配置忽略的接口）
+
+LOOPBACK_NAMES = ("lo", "loopback")
+
+
+def nic_egress():
+    """读取每个网卡的发送包数，无法读取时返回空字典"""
+    try:
+        counters = psutil.net_io_counters(pernic=True)
+    except Exception:
+        return {}
+    return {name: counter.packets_sent for name, counter in counters.items()}
+
+
+def is_loopback(interface):
+    """判断接口是否为回环接口（如 lo、Npcap Loopback Adapter），推流不会经过这类接口"""
+    name = interface.lower()
+    if name == LOOPBACK_NAMES[0] or LOOPBACK_NAMES[1] in name:
+        return True
+    try:
+        addresses = psutil.net_if_addrs().get(interface)
+    except Exception:
+        return False
+    ips = [
+        address.address for address in addresses or []
+        if address.family in (socket.AF_INET, socket.AF_INET6)
+    ]
+    return bool(ips) and all(ip.startswith("127.") or ip == "::1" for ip in ips)
+
+
+class InterfaceState:
+    """单个接口的裁剪状态"""
+
+    __slots__ = ("state", "closable", "idle", "busy", "last_packets", "last_egress", "rate",
+                 "skipped", "candidate")
+
+    def __init__(self, closable):
+        self.state = INTERFACE_ACTIVE
+        # 回环接口或配置忽略的接口，观察期后关闭抓包句柄且不再恢复
+        self.closable = closable
+        # 连续没有出站流量的检查次数
+        self.idle = 0
+        # 降级后连续有出站流量的检查次数
+        self.busy = 0
+        self.last_packets = 0
+        self.last_egress = None
+        # 最近一次检查时送达 Python 的包速率，关闭后用于估计跳过的包数
+        self.rate = 0.0
+        # 降级或关闭后没有解析的包数
+        self.skipped = 0.0
+        # 是否因出现推流候选数据包而恢复，之后不再降级（如镜像端口上的推流）
+        self.candidate = False
+
+
+class InterfacePruner:
+    """多接口捕获时按流量裁剪接口
+
+    开始捕获后先观察 PRUNE_WARMUP 秒，之后：
+    - 回环接口和配置 capture_prune_ignore 中的接口关闭抓包句柄；
+    - 连续 DEMOTE_AFTER 次检查没有出站流量的接口降级为只计数不解析，抓包句柄保持打开，
+      推流随时可能在这些接口上开始，重新打开句柄会错过连接开始时的握手和命令；
+    - 降级的接口连续 PROMOTE_AFTER 次检查有出站流量后恢复解析；
+      出现符合过滤器的推流候选数据包时立即恢复解析，不丢弃推流开始时的握手和命令。
+    判断依据为系统网卡计数，降级的接口仍能被观察到，可以随时恢复。
+    """
+
+    def __init__(self, interfaces, logger, egress=nic_egress, loopback=is_loopback,
+                 warmup=PRUNE_WARMUP, interval=PRUNE_INTERVAL, ignored=None):
+        """
+        初始化接口裁剪
+        @param interfaces: 接口名列表
+        @param logger: 日志对象
+        @param egress: 返回 {网卡名: 累计发送包数} 的函数
+        @param loopback: 判断接口是否为回环接口的函数
+        @param warmup: 观察时间（秒）
+        @param interval: 检查间隔（秒）
+        @param ignored: 观察期后关闭的接口名列表，默认读取配置 capture_prune_ignore
+        """
+        self.logger = logger
+        self.egress = egress
+        self.interval = interval
+        if ignored is None:
+            ignored = get_config("capture_prune_ignore") or ()
+        self.states = {
+            interface: InterfaceState(interface in ignored or loopback(interface))
+            for interface in interfaces
+        }
+        # 降级的接口，抓包循环对其中接口的帧只计数
+        self.demoted = set()
+        self.started = time.monotonic()
+        self.warmup_end = self.started + warmup
+        self.next_check = self.started + interval
+        self.next_report = self.warmup_end
+        # 最近一次检查的时间
+        self.checked = self.started
+        # 单帧处理耗时（秒），由处理线程测量后更新
+        self.frame_cost = None
+        self._read_egress()
+
+    def _read_egress(self):
+        counters = self.egress()
+        for interface, state in self.states.items():
+            state.last_egress = counters.get(interface)
+
+    def update(self, counters, now=None):
+        """
+        检查各接口的流量并更新状态，未到检查时间时直接返回
+        @param counters: {接口名: InterfaceCounters}
+        @param now: 当前时间（time.monotonic）
+        @return: 需要关闭的接口列表
+        """
+        now = time.monotonic() if now is None else now
+        if now < self.next_check:
+            return []
+        elapsed = now - self.checked
+        self.checked = now
+        self.next_check = now + self.interval
+        egress = self.egress()
+        pruning = now >= self.warmup_end
+        close = []
+
+        for interface, state in self.states.items():
+            counter = counters.get(interface)
+            if counter is not None:
+                delivered = counter.packets - state.last_packets
+                state.last_packets = counter.packets
+                if state.state != INTERFACE_CLOSED:
+                    state.rate = delivered / elapsed
+                if state.state == INTERFACE_DEMOTED:
+                    state.skipped += delivered
+            if state.state == INTERFACE_CLOSED:
+                state.skipped += state.rate * elapsed
+
+            sent = egress.get(interface)
+            if sent is None or state.last_egress is None:
+                # 没有网卡计数（如名称不一致）时不裁剪
+                state.last_egress = sent
+                continue
+            busy = (sent - state.last_egress) / elapsed >= MIN_EGRESS_PPS
+            state.last_egress = sent
+
+            if state.state == INTERFACE_ACTIVE:
+                state.idle = 0 if busy else state.idle + 1
+                if not pruning:
+                    continue
+                if state.closable:
+                    self._set_state(interface, INTERFACE_CLOSED, "回环接口或已配置忽略")
+                    close.append(interface)
+                elif state.idle >= DEMOTE_AFTER and not state.candidate:
+                    self._set_state(interface, INTERFACE_DEMOTED, "没有出站流量")
+            elif state.state == INTERFACE_CLOSED:
+                continue
+            elif busy:
+                state.busy += 1
+                if state.busy >= PROMOTE_AFTER:
+                    self._set_state(interface, INTERFACE_ACTIVE, "恢复出站流量")
+            else:
+                state.busy = 0
+
+        if pruning and now >= self.next_report:
+            self.next_report = now + RATE_REPORT_INTERVAL
+            if any(state.state != INTERFACE_ACTIVE for state in self.states.values()):
+                self.logger.packet(f"[{_now()}] 接口裁剪 {self.summary()}")
+        return close
+
+    def _set_state(self, interface, state_name, reason):
+        state = self.states[interface]
+        state.state = state_name
+        state.idle = 0
+        state.busy = 0
+        if state_name == INTERFACE_DEMOTED:
+            self.demoted.add(interface)
+            text = "降级为只计数"
+        else:
+            self.demoted.discard(interface)
+            text = "关闭抓包句柄" if state_name == INTERFACE_CLOSED else "恢复解析"
+        self.logger.packet(f"[{_now()}] 接口 {interface} {reason}，{text}")
+
+    def promote(self, interface, reason):
+        """
+        立即恢复降级接口的解析，用于降级接口上出现推流候选数据包时
+        @return: 接口是否由降级恢复
+        """
+        state = self.states.get(interface)
+        if state is None or state.state != INTERFACE_DEMOTED:
+            return False
+        state.candidate = True
+        self._set_state(interface, INTERFACE_ACTIVE, reason)
+        return True
+
+    def remove(self, interface):
+        """不再裁剪已停止的接口"""
+        self.states.pop(interface, None)
+        self.demoted.discard(interface)
+
+    def closed(self):
+        """已关闭抓包句柄的接口列表"""
+        return [
+            interface for interface, state in self.states.items()
+            if state.state == INTERFACE_CLOSED
+        ]
+
+    def saved_cpu(self):
+        """
+        估计裁剪节省的 CPU 时间
+        @return: (跳过的包数, 节省的 CPU 时间（秒）)
+        """
+        skipped = sum(state.skipped for state in self.states.values())
+        return int(skipped), skipped * (self.frame_cost or DEFAULT_FRAME_COST)
+
+    def summary(self):
+        """裁剪结果的简要说明"""
+        demoted = sum(1 for state in self.states.values() if state.state == INTERFACE_DEMOTED)
+        closed = len(self.closed())
+        skipped, saved = self.saved_cpu()
+        elapsed = max(self.checked - self.started, 1e-9)
+        return (
+            f"降级: {demoted} 个 / 关闭: {closed} 个 / 跳过: {skipped} 个数据包 / "
+            f"节省 CPU 约 {saved * 1000:.0f} ms（单核 {saved / elapsed * 100:.1f}%）"
+        )
+
+
+def pruning_enabled():
+    """配置 capture_prune 为 False 时不裁剪接口"""
+    enabled = get_config("capture_prune")
+    return True if enabled is None else bool(enabled)
+
+
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
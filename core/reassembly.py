@@ -0,0 +1,162 @@
+import time
+
+TCP_FIN = 0x01
+TCP_SYN = 0x02
+TCP_RST = 0x04
+
+# 每个方向最多保留的字节数，RTMP 握手和 connect/FCPublish 命令都在前几 KB 内
+DEFAULT_MAX_BYTES = 16 * 1024
+# 空闲超过该时间（秒）的流会被清理
+DEFAULT_IDLE_TIMEOUT = 30
+# 同时跟踪的最大流数量
+DEFAULT_MAX_STREAMS = 512
+# 清理空闲流的检查间隔（秒）
+SWEEP_INTERVAL = 5
+
+
+class TcpStream:
+    """单个方向的字节流"""
+
+    __slots__ = ("base", "data", "pending", "last_seen", "syn", "context")
+
+    def __init__(self, base, now, syn=False):
+        self.base = base
+        self.data = bytearray()
+        self.pending = {}
+        self.last_seen = now
+        # 是否从连接建立（SYN）开始跟踪，即字节流从连接的第一个字节开始
+        self.syn = syn
+        # 调用方附加的解析状态
+        self.context = None
+
+
+class StreamReassembler:
+    """按四元组重组 TCP 字节流，每个方向只保留前 max_bytes 字节"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, idle_timeout=DEFAULT_IDLE_TIMEOUT,
+                 max_streams=DEFAULT_MAX_STREAMS):
+        """
+        初始化重组器
+        @param max_bytes: 每个方向最多保留的字节数
+        @param idle_timeout: 空闲流的清理时间（秒）
+        @param max_streams: 同时跟踪的最大流数量，超出时清理最早的流
+        """
+        self.max_bytes = max_bytes
+        self.idle_timeout = idle_timeout
+        self.max_streams = max_streams
+        self.streams = {}
+        # 已经收满 max_bytes 的流，不再重组
+        self.finished = {}
+        self.last_sweep = time.monotonic()
+
+    def __len__(self):
+        return len(self.streams)
+
+    def __contains__(self, key):
+        return key in self.streams or key in self.finished
+
+    def discard(self, key):
+        """停止跟踪一个流，之后的数据会作为新流处理"""
+        self.streams.pop(key, None)
+        self.finished.pop(key, None)
+
+    def clear(self):
+        """清空所有流"""
+        self.streams.clear()
+        self.finished.clear()
+
+    def add(self, key, seq, flags, payload, length=None, create=True):
+        """
+        加入一个 TCP 段
+        @param key: 单向四元组 (源地址, 源端口, 目的地址, 目的端口)
+        @param seq: TCP 序列号
+        @param flags: TCP 标志
+        @param payload: TCP 负载（bytes 或 memoryview）
+        @param length: 负载的实际长度，snaplen 截断时缺失的部分以 0 填充
+        @param create: 未跟踪的流是否开始跟踪
+        @return: 有新的连续数据时返回 (TcpStream, 新数据起始位置)，否则返回 None
+        """
+        now = time.monotonic()
+        if now - self.last_sweep > SWEEP_INTERVAL:
+            self._sweep(now)
+
+        if flags & TCP_SYN:
+            # SYN 占用一个序列号，SYN 携带的数据（TCP Fast Open）从下一个序列号开始
+            seq = (seq + 1) & 0xFFFFFFFF
+
+        if flags & (TCP_FIN | TCP_RST):
+            # 连接结束，先处理本段数据再释放
+            self.finished.pop(key, None)
+            stream = self.streams.pop(key, None)
+            if stream is None or not payload:
+                return None
+            return self._append(stream, seq, payload, length)
+
+        if key in self.finished:
+            self.finished[key] = now
+            return None
+
+        stream = self.streams.get(key)
+        if stream is None:
+            if not create:
+                return None
+            if len(self.streams) >= self.max_streams:
+                # 字典保持插入顺序，清理最早的流
+                del self.streams[next(iter(self.streams))]
+            stream = self.streams[key] = TcpStream(seq, now, bool(flags & TCP_SYN))
+        stream.last_seen = now
+
+        if not payload:
+            return None
+        result = self._append(stream, seq, payload, length)
+        if len(stream.data) >= self.max_bytes:
+            # 已收满，释放缓冲区，之后该流的数据直接丢弃
+            del self.streams[key]
+            self.finished[key] = now
+        return result
+
+    def _append(self, stream, seq, payload, length):
+        """将负载写入字节流，返回新增的连续数据"""
+        if length and length > len(payload):
+            payload = bytes(payload) + bytes(length - len(payload))
+        offset = (seq - stream.base) & 0xFFFFFFFF
+        end = len(stream.data)
+        if offset >= self.max_bytes:
+            # 重传的旧数据（序列号回绕后为很大的偏移）或超出窗口的数据
+            return None
+
+        if offset > end:
+            # 乱序到达，暂存等待前面的数据
+            stream.pending[offset] = bytes(payload[:self.max_bytes - offset])
+            return None
+        if offset + len(payload) <= end:
+            # 完全重复的重传
+            return None
+
+        start = end
+        stream.data += payload[end - offset:self.max_bytes - offset]
+        # 合并已经连续的乱序数据
+        while stream.pending:
+            end = len(stream.data)
+            ready = sorted(item for item in stream.pending if item <= end)
+            if not ready:
+                break
+            for item in ready:
+                data = stream.pending.pop(item)
+                if item + len(data) > end:
+                    stream.data += data[end - item:]
+                    end = len(stream.data)
+        del stream.data[self.max_bytes:]
+        return stream, start
+
+    def _sweep(self, now):
+        """清理空闲的流"""
+        self.last_sweep = now
+        deadline = now - self.idle_timeout
+        for streams in (self.streams, self.finished):
+            idle = [
+                key for key, value in streams.items()
+                if (value.last_seen if isinstance(value, TcpStream) else value) < deadline
+            ]
+            for key in idle:
+                del streams[key]
@@ -0,0 +1,261 @@
+import os
+import queue
+import struct
+import threading
+import time
+from datetime import datetime
+from socket import inet_aton
+
+from core.packet import DLT_RAW
+from utils.config import get_config
+
+# 默认的记录目录，配置 capture_record_dir 可以修改
+DEFAULT_RECORD_DIR = os.path.join("~", ".douyin-rtmp", "recordings")
+# 单个文件的大小上限（MB）和时间跨度上限（秒），超出任一上限时换新文件
+DEFAULT_FILE_MB = 8
+DEFAULT_FILE_SECONDS = 3600
+# 最多保留的文件数，超出时删除最早的文件
+DEFAULT_MAX_FILES = 10
+# 处理线程与写入线程之间的队列容量（段数），写入跟不上时丢弃新的段
+RECORD_QUEUE_SIZE = 4096
+# 写入缓冲大小（字节）和刷新到磁盘的间隔（秒）
+WRITE_BUFFER_SIZE = 64 * 1024
+FLUSH_INTERVAL = 1.0
+# 记录文件名前缀和扩展名
+RECORD_PREFIX = "rtmp-"
+RECORD_SUFFIX = ".pcapng"
+
+# pcapng 块类型和选项
+SHB_TYPE = 0x0A0D0D0A
+IDB_TYPE = 0x00000001
+EPB_TYPE = 0x00000006
+BYTE_ORDER_MAGIC = 0x1A2B3C4D
+OPT_ENDOFOPT = 0
+IF_NAME = 2
+
+_pack_block_header = struct.Struct("<II").pack
+_pack_shb = struct.Struct("<IHHq").pack
+_pack_idb = struct.Struct("<HHI").pack
+_pack_epb = struct.Struct("<IIIII").pack
+_pack_option = struct.Struct("<HH").pack
+_pack_length = struct.Struct("<I").pack
+# IPv4 和 TCP 头（不含选项），记录时按四元组和序列号重新构造
+_pack_ip = struct.Struct("!BBHHHBBH4s4s").pack
+_pack_tcp = struct.Struct("!HHIIBBHHH").pack
+_unpack_words = struct.Struct("!10H").unpack
+IP_HEADER_SIZE = 20
+TCP_HEADER_SIZE = 20
+
+
+def recording_enabled():
+    """是否启用控制段记录，配置 capture_record"""
+    return bool(get_config("capture_record"))
+
+
+def _pad(data):
+    """补齐到 4 字节边界"""
+    return data + b"\x00" * (-len(data) % 4)
+
+
+def _block(block_type, body):
+    """构造 pcapng 块：块类型、总长度、内容、总长度"""
+    body = _pad(body)
+    length = len(body) + 12
+    return _pack_block_header(block_type, length) + body + _pack_length(length)
+
+
+def _ip_checksum(header):
+    total = sum(_unpack_words(header))
+    total = (total & 0xFFFF) + (total >> 16)
+    total = (total & 0xFFFF) + (total >> 16)
+    return ~total & 0xFFFF
+
+
+def build_packet(key, seq, flags, payload, length=None):
+    """
+    按四元组构造 IPv4/TCP 数据包（链路层类型 DLT_RAW）
+    @param key: 单向四元组 (源地址, 源端口, 目的地址, 目的端口)
+    @param seq: TCP 序列号
+    @param flags: TCP 标志
+    @param payload: TCP 负载
+    @param length: 负载的实际长度（snaplen 截断前），用于 IP 总长度
+    @return: (数据包字节, 未截断时的长度)
+    """
+    src_ip, src_port, dst_ip, dst_port = key
+    original = IP_HEADER_SIZE + TCP_HEADER_SIZE + (len(payload) if length is None else length)
+    header = _pack_ip(
+        0x45, 0, min(original, 0xFFFF), 0, 0x4000, 64, 6, 0, inet_aton(src_ip), inet_aton(dst_ip)
+    )
+    header = header[:10] + struct.pack("!H", _ip_checksum(header)) + header[12:]
+    tcp = _pack_tcp(src_port, dst_port, seq & 0xFFFFFFFF, 0, TCP_HEADER_SIZE // 4 << 4,
+                    flags & 0xFF, 0xFFFF, 0, 0)
+    return header + tcp + payload, original
+
+
+class ControlRecorder:
+    """将候选 RTMP 流连接开始的控制段（握手和命令）写入轮转的 pcapng 文件
+
+    调用方在连接的推流信息已发出或块流解析器看到第一条音视频消息后停止记录该连接，
+    因此文件中只有最后一段可能带有少量媒体数据；无法按块流解析的流最多记录重组窗口内的数据。
+    处理线程只复制负载并放入有界队列，构造数据包和带缓冲的文件写入都在写入线程中完成；
+    队列已满时丢弃新的段并计数，不阻塞处理线程。抓包时只拿到解析后的 TCP 段，
+    因此按四元组重新构造 IPv4/TCP 头，每个接口在文件中对应一个 pcapng 接口。
+    单个文件超过大小或时间跨度上限时换新文件，只保留最近的若干个文件。
+    """
+
+    def __init__(self, logger, directory=None, file_mb=None, file_seconds=None, max_files=None):
+        """
+        初始化记录器
+        @param logger: 日志对象
+        @param directory: 记录目录，默认读取配置 capture_record_dir
+        @param file_mb: 单个文件的大小上限（MB），默认读取配置 capture_record_file_mb
+        @param file_seconds: 单个文件的时间跨度上限（秒），默认读取配置 capture_record_file_seconds
+        @param max_files: 最多保留的文件数，默认读取配置 capture_record_files
+        """
+        self.logger = logger
+        self.directory = os.path.expanduser(
+            directory or get_config("capture_record_dir") or DEFAULT_RECORD_DIR
+        )
+        self.max_bytes = int(
+            float(file_mb or get_config("capture_record_file_mb") or DEFAULT_FILE_MB) * 1024 * 1024
+        )
+        self.max_seconds = float(
+            file_seconds or get_config("capture_record_file_seconds") or DEFAULT_FILE_SECONDS
+        )
+        self.max_files = max(
+            int(max_files or get_config("capture_record_files") or DEFAULT_MAX_FILES), 1
+        )
+        self.queue = queue.Queue(RECORD_QUEUE_SIZE)
+        self.thread = None
+        self.stop_event = threading.Event()
+        # 已写入的段数和队列已满丢弃的段数
+        self.recorded = 0
+        self.dropped = 0
+        # 当前文件及其已写入的字节数、打开时间和接口编号 {接口名: 编号}
+        self.file = None
+        self.path = None
+        self.file_bytes = 0
+        self.file_started = 0.0
+        self.interface_ids = {}
+
+    def start(self):
+        """启动写入线程"""
+        if self.thread is not None:
+            return
+        self.thread = threading.Thread(
+            target=self._write_loop, args=(self.queue, self.stop_event), daemon=True
+        )
+        self.thread.start()
+
+    def add(self, interface, key, seq, flags, payload, length=None):
+        """
+        记录一个 TCP 段，在处理线程中调用
+        @param interface: 接口名
+        @param key: 单向四元组 (源地址, 源端口, 目的地址, 目的端口)
+        @param seq: TCP 序列号
+        @param flags: TCP 标志
+        @param payload: TCP 负载，会复制一份，不引用原始帧
+        @param length: 负载的实际长度（snaplen 截断前）
+        """
+        try:
+            self.queue.put_nowait((time.time(), interface, key, seq, flags, bytes(payload), length))
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self):
+        """通知写入线程写完已放入的段后关闭文件，不等待线程结束"""
+        self.stop_event.set()
+        try:
+            # 唤醒等待中的写入线程；队列已满时写入线程正忙，写完队列中的段后自行退出
+            self.queue.put_nowait(None)
+        except queue.Full:
+            pass
+
+    def join(self, timeout=None):
+        """等待写入线程退出"""
+        thread = self.thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+            if not thread.is_alive():
+                self.thread = None
+
+    def _write_loop(self, items, stop):
+        last_flush = time.monotonic()
+        try:
+            while True:
+                try:
+                    item = items.get(timeout=FLUSH_INTERVAL)
+                except queue.Empty:
+                    item = None
+                if item is not None:
+                    self._write(*item)
+                if stop.is_set() and items.empty():
+                    return
+                now = time.monotonic()
+                if self.file is not None and now - last_flush >= FLUSH_INTERVAL:
+                    # 定期刷新，进程异常退出时也能保留大部分记录
+                    self.file.flush()
+                    last_flush = now
+        except OSError as e:
+            self.logger.error(f"写入控制段记录失败: {str(e)}，停止记录")
+        finally:
+            self._close_file()
+
+    def _write(self, timestamp, interface, key, seq, flags, payload, length):
+        if self.file is None or self.file_bytes >= self.max_bytes or \
+                time.monotonic() - self.file_started >= self.max_seconds:
+            self._rotate()
+        interface_id = self.interface_ids.get(interface)
+        if interface_id is None:
+            interface_id = self.interface_ids[interface] = len(self.interface_ids)
+            self._write_block(IDB_TYPE, _pack_idb(DLT_RAW, 0, 0) + self._name_option(interface))
+        packet, original = build_packet(key, seq, flags, payload, length)
+        microseconds = int(timestamp * 1_000_000)
+        self._write_block(EPB_TYPE, _pack_epb(
+            interface_id, microseconds >> 32, microseconds & 0xFFFFFFFF, len(packet), original,
+        ) + packet)
+        self.recorded += 1
+
+    @staticmethod
+    def _name_option(interface):
+        name = interface.encode("utf-8")
+        return _pack_option(IF_NAME, len(name)) + _pad(name) + _pack_option(OPT_ENDOFOPT, 0)
+
+    def _write_block(self, block_type, body):
+        data = _block(block_type, body)
+        self.file.write(data)
+        self.file_bytes += len(data)
+
+    def _rotate(self):
+        """关闭当前文件，打开新文件并删除超出数量的旧文件"""
+        self._close_file()
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")[:-3]
+        self.path = os.path.join(self.directory, f"{RECORD_PREFIX}{stamp}{RECORD_SUFFIX}")
+        index = 1
+        while os.path.exists(self.path):
+            # 同一毫秒内多次轮转
+            self.path = os.path.join(self.directory, f"{RECORD_PREFIX}{stamp}-{index}{RECORD_SUFFIX}")
+            index += 1
+        self.file = open(self.path, "wb", buffering=WRITE_BUFFER_SIZE)
+        self.file_bytes = 0
+        self.file_started = time.monotonic()
+        self.interface_ids = {}
+        self._write_block(SHB_TYPE, _pack_shb(BYTE_ORDER_MAGIC, 1, 0, -1))
+        self._remove_old_files()
+
+    def _remove_old_files(self):
+        names = sorted(
+            name for name in os.listdir(self.directory)
+            if name.startswith(RECORD_PREFIX) and name.endswith(RECORD_SUFFIX)
+        )
+        for name in names[:-self.max_files]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def _close_file(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
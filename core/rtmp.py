@@ -0,0 +1,285 @@
+import struct
+
+# 握手长度：C0/S0 (1) + C1/S1 (1536) + C2/S2 (1536)
+HANDSHAKE_SIZE = 1 + 1536 + 1536
+RTMP_VERSION = 0x03
+DEFAULT_CHUNK_SIZE = 128
+
+# RTMP 消息类型
+MSG_SET_CHUNK_SIZE = 1
+MSG_AUDIO = 8
+MSG_VIDEO = 9
+MSG_COMMAND_AMF3 = 17
+MSG_COMMAND_AMF0 = 20
+
+# 携带推流码的命令
+PUBLISH_COMMANDS = ("releaseStream", "FCPublish", "publish")
+
+# 不同 fmt 的消息头长度
+_HEADER_SIZES = (11, 7, 3, 0)
+
+_unpack_u16 = struct.Struct("!H").unpack_from
+_unpack_u32 = struct.Struct("!I").unpack_from
+_unpack_u32_le = struct.Struct("<I").unpack_from
+_unpack_double = struct.Struct("!d").unpack_from
+
+
+class RtmpError(Exception):
+    """无法解析的 RTMP 数据"""
+
+
+class RtmpCommand:
+    """解码后的 AMF0 命令消息"""
+
+    __slots__ = ("name", "transaction", "arguments")
+
+    def __init__(self, name, transaction, arguments):
+        self.name = name
+        self.transaction = transaction
+        self.arguments = arguments
+
+    def __repr__(self):
+        return f"RtmpCommand({self.name!r}, {self.transaction!r}, {self.arguments!r})"
+
+
+class _ChunkStream:
+    """单个块流（chunk stream）的状态"""
+
+    __slots__ = ("timestamp", "length", "type", "stream_id", "remaining", "body", "extended")
+
+    def __init__(self):
+        self.timestamp = 0
+        self.length = 0
+        self.type = 0
+        self.stream_id = 0
+        self.remaining = 0
+        self.body = None
+        self.extended = False
+
+
+class RtmpParser:
+    """增量 RTMP 块流解析器
+
+    按顺序输入单个方向的 TCP 字节流，跳过握手后解析块流，只缓存命令消息，
+    音视频等其他消息只推进偏移量，不复制数据。
+    """
+
+    def __init__(self):
+        self.offset = 0
+        self.chunk_size = DEFAULT_CHUNK_SIZE
+        self.chunk_streams = {}
+        self.failed = False
+        # connect 命令中的字段
+        self.tc_url = None
+        self.app = None
+        # releaseStream/FCPublish/publish 命令中的推流名（推流码）
+        self.publish_name = None
+        # 是否已出现音视频消息，之后的数据基本都是媒体数据
+        self.media_started = False
+
+    def feed(self, data):
+        """
+        解析字节流中尚未处理的部分
+        @param data: 从连接开始的完整字节流（bytes 或 bytearray），只会追加不会修改
+        @return: 本次解码出的命令列表
+        """
+        if self.failed:
+            return []
+        commands = []
+        try:
+            if self.offset == 0:
+                if not data:
+                    return commands
+                if data[0] != RTMP_VERSION:
+                    raise RtmpError(f"不是 RTMP 握手: 0x{data[0]:02x}")
+            if self.offset < HANDSHAKE_SIZE:
+                if len(data) < HANDSHAKE_SIZE:
+                    return commands
+                self.offset = HANDSHAKE_SIZE
+            while self._read_chunk(data, commands):
+                pass
+        except (RtmpError, struct.error, IndexError, UnicodeDecodeError):
+            self.failed = True
+        return commands
+
+    def _read_chunk(self, data, commands):
+        """读取一个完整的块，数据不足时返回 False"""
+        pos = self.offset
+        size = len(data)
+        if pos >= size:
+            return False
+
+        first = data[pos]
+        fmt = first >> 6
+        csid = first & 0x3F
+        pos += 1
+        if csid == 0:
+            if pos + 1 > size:
+                return False
+            csid = data[pos] + 64
+            pos += 1
+        elif csid == 1:
+            if pos + 2 > size:
+                return False
+            csid = data[pos] + data[pos + 1] * 256 + 64
+            pos += 2
+
+        header_size = _HEADER_SIZES[fmt]
+        if pos + header_size > size:
+            return False
+
+        chunk = self.chunk_streams.get(csid)
+        if chunk is None:
+            if fmt != 0:
+                raise RtmpError(f"块流 {csid} 缺少完整的消息头")
+            chunk = self.chunk_streams[csid] = _ChunkStream()
+
+        if fmt < 3:
+            timestamp = (data[pos] << 16) | (data[pos + 1] << 8) | data[pos + 2]
+            if fmt < 2:
+                length = (data[pos + 3] << 16) | (data[pos + 4] << 8) | data[pos + 5]
+                msg_type = data[pos + 6]
+                if fmt == 0:
+                    stream_id = _unpack_u32_le(data, pos + 7)[0]
+            pos += header_size
+            extended = timestamp == 0xFFFFFF
+        else:
+            extended = chunk.extended
+        if extended:
+            if pos + 4 > size:
+                return False
+            pos += 4
+
+        if fmt < 3 and chunk.remaining:
+            raise RtmpError(f"块流 {csid} 的消息尚未结束")
+        # 块的负载完整后再更新块流状态，负载跨越 TCP 段时下次从块头重新读取
+        remaining = chunk.remaining or (length if fmt < 2 else chunk.length)
+        payload_size = min(self.chunk_size, remaining)
+        if pos + payload_size > size:
+            return False
+        if fmt < 3:
+            chunk.extended = extended
+            chunk.timestamp = timestamp
+            if fmt < 2:
+                chunk.length = length
+                chunk.type = msg_type
+                if fmt == 0:
+                    chunk.stream_id = stream_id
+        if not chunk.remaining:
+            # 新消息开始，只缓存命令和设置块大小的消息
+            chunk.remaining = chunk.length
+            if chunk.type in (MSG_AUDIO, MSG_VIDEO):
+                self.media_started = True
+            if chunk.type in (MSG_COMMAND_AMF0, MSG_COMMAND_AMF3, MSG_SET_CHUNK_SIZE):
+                chunk.body = bytearray()
+            else:
+                chunk.body = None
+
+        if chunk.body is not None:
+            chunk.body += data[pos:pos + payload_size]
+        chunk.remaining -= payload_size
+        self.offset = pos + payload_size
+
+        if not chunk.remaining:
+            self._complete_message(chunk, commands)
+        return True
+
+    def _complete_message(self, chunk, commands):
+        """处理一条完整的消息"""
+        body = chunk.body
+        chunk.body = None
+        if body is None:
+            return
+        if chunk.type == MSG_SET_CHUNK_SIZE:
+            self.chunk_size = _unpack_u32(body, 0)[0] & 0x7FFFFFFF
+            if not self.chunk_size:
+                raise RtmpError("块大小为 0")
+            return
+        if chunk.type == MSG_COMMAND_AMF3:
+            # AMF3 命令消息首字节为 0，其后为 AMF0 编码
+            body = body[1:]
+        command = decode_command(body)
+        if command is None:
+            return
+        commands.append(command)
+
+        if command.name == "connect" and command.arguments:
+            properties = command.arguments[0]
+            if isinstance(properties, dict):
+                self.tc_url = properties.get("tcUrl") or self.tc_url
+                self.app = properties.get("app") or self.app
+        elif command.name in PUBLISH_COMMANDS and not self.publish_name:
+            # 参数依次为命令对象（null）和推流名
+            for argument in command.arguments[1:]:
+                if isinstance(argument, str) and argument:
+                    self.publish_name = argument
+                    break
+
+
+def decode_command(body):
+    """解码 AMF0 命令消息：命令名、事务 ID 以及其余参数"""
+    pos = 0
+    values = []
+    size = len(body)
+    while pos < size:
+        value, pos = decode_amf0(body, pos)
+        values.append(value)
+    if len(values) < 2 or not isinstance(values[0], str):
+        return None
+    return RtmpCommand(values[0], values[1], values[2:])
+
+
+def decode_amf0(data, pos):
+    """
+    解码一个 AMF0 值
+    @return: (值, 下一个值的位置)
+    """
+    marker = data[pos]
+    pos += 1
+    if marker == 0x00:  # number
+        return _unpack_double(data, pos)[0], pos + 8
+    if marker == 0x01:  # boolean
+        return data[pos] != 0, pos + 1
+    if marker == 0x02:  # string
+        length = _unpack_u16(data, pos)[0]
+        pos += 2
+        return _decode_string(data, pos, length), pos + length
+    if marker in (0x03, 0x08, 0x10):  # object / ECMA array / typed object
+        if marker == 0x08:
+            pos += 4
+        elif marker == 0x10:
+            pos += 2 + _unpack_u16(data, pos)[0]
+        result = {}
+        while True:
+            length = _unpack_u16(data, pos)[0]
+            pos += 2
+            if length == 0 and data[pos] == 0x09:
+                return result, pos + 1
+            key = _decode_string(data, pos, length)
+            value, pos = decode_amf0(data, pos + length)
+            result[key] = value
+    if marker in (0x05, 0x06):  # null / undefined
+        return None, pos
+    if marker == 0x07:  # reference
+        return None, pos + 2
+    if marker == 0x0A:  # strict array
+        count = _unpack_u32(data, pos)[0]
+        pos += 4
+        result = []
+        for _ in range(count):
+            value, pos = decode_amf0(data, pos)
+            result.append(value)
+        return result, pos
+    if marker == 0x0B:  # date
+        return _unpack_double(data, pos)[0], pos + 10
+    if marker in (0x0C, 0x0F):  # long string / XML document
+        length = _unpack_u32(data, pos)[0]
+        pos += 4
+        return _decode_string(data, pos, length), pos + length
+    raise RtmpError(f"不支持的 AMF0 类型: 0x{marker:02x}")
+
+
+def _decode_string(data, pos, length):
+    if pos + length > len(data):
+        raise RtmpError("AMF0 字符串越界")
+    return bytes(data[pos:pos + length]).decode("utf-8")
@@ -0,0 +1,221 @@
+import os
+import threading
+import time
+from collections import deque
+
+import psutil
+
+from core.reassembly import DEFAULT_MAX_BYTES, DEFAULT_MAX_STREAMS
+from utils.config import get_config
+
+# 单次抓包会话的默认内存预算（MB）
+DEFAULT_MEMORY_BUDGET_MB = 32
+# 预算在帧缓冲、流重组和候选控制段之间的分配比例
+RING_SHARE = 0.5
+STREAM_SHARE = 0.375
+CANDIDATE_SHARE = 0.125
+# 每个接口保留最近多少个处理耗时样本，用于计算分位数
+LATENCY_SAMPLES = 4096
+# 处理线程每隔多少个数据包测量一次处理耗时
+LATENCY_SAMPLE_INTERVAL = 8
+
+
+class SessionBudget:
+    """按内存预算计算抓包会话中各个缓冲的上限"""
+
+    def __init__(self, megabytes=None):
+        """
+        初始化内存预算
+        @param megabytes: 预算（MB），默认读取配置 capture_memory_mb
+        """
+        self.megabytes = float(
+            megabytes or get_config("capture_memory_mb") or DEFAULT_MEMORY_BUDGET_MB
+        )
+        total = int(self.megabytes * 1024 * 1024)
+        # 帧缓冲按字节数限制，与帧大小（是否截断、是否合并大包）无关
+        self.ring_bytes = int(total * RING_SHARE)
+        # 每个流最多缓存 DEFAULT_MAX_BYTES 字节
+        self.max_streams = max(
+            min(int(total * STREAM_SHARE) // DEFAULT_MAX_BYTES, DEFAULT_MAX_STREAMS), 1
+        )
+        self.candidate_bytes = int(total * CANDIDATE_SHARE)
+
+
+class CandidateBuffer:
+    """保留候选 RTMP 流的控制段，总字节数超出上限时丢弃最早的段
+
+    与 ControlRecorder 相同，调用方在连接出现音视频消息或推流信息已发出后不再加入该连接的段。
+    """
+
+    def __init__(self, max_bytes):
+        """
+        初始化候选控制段缓冲
+        @param max_bytes: 保留的负载总字节数上限
+        """
+        self.max_bytes = max_bytes
+        self.segments = deque()
+        self.bytes = 0
+        # 超出上限而丢弃的段数
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self.segments)
+
+    def add(self, interface, key, seq, flags, payload):
+        """
+        保留一个 TCP 段
+        @param interface: 接口名
+        @param key: 单向四元组 (源地址, 源端口, 目的地址, 目的端口)
+        @param seq: TCP 序列号
+        @param flags: TCP 标志
+        @param payload: TCP 负载，会复制一份，不引用原始帧
+        """
+        data = bytes(payload)
+        if len(data) > self.max_bytes:
+            self.evicted += 1
+            return
+        self.segments.append((time.time(), interface, key, seq, flags, data))
+        self.bytes += len(data)
+        while self.bytes > self.max_bytes:
+            self.bytes -= len(self.segments.popleft()[5])
+            self.evicted += 1
+
+    def clear(self):
+        self.segments.clear()
+        self.bytes = 0
+        self.evicted = 0
+
+
+class FlowCredentials:
+    """单个推流连接上提取到的推流服务器地址和推流码"""
+
+    __slots__ = ("host", "server_address", "stream_code", "done", "started")
+
+    def __init__(self, host):
+        # 推流客户端地址，同一主机的其他连接可以复用已发现的服务器地址
+        self.host = host
+        # 收到该连接第一段数据的时间（time.monotonic），用于计算获取推流信息的耗时
+        self.started = time.monotonic()
+        self.server_address = None
+        self.stream_code = None
+        # 是否已作为一组推流信息发出
+        self.done = False
+
+
+class InterfaceStats:
+    """单个接口在处理线程一侧的统计"""
+
+    __slots__ = ("inspected", "filtered", "latencies", "max_latency")
+
+    def __init__(self):
+        # 进入 RTMP 检查的数据包数
+        self.inspected = 0
+        # 非 TCP、重复段、已确定不是 RTMP 的流等直接过滤的数据包数
+        self.filtered = 0
+        # 最近的单包处理耗时（秒）
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.max_latency = 0.0
+
+
+class SessionStats:
+    """抓包会话的统计：每个接口的检查与过滤计数、处理耗时，以及获取各阶段信息的耗时
+
+    每个处理线程写入自己的分片，记录时不需要加锁，读取时合并所有分片；
+    处理耗时按 LATENCY_SAMPLE_INTERVAL 抽样测量。
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        # 每个线程的 {接口名: InterfaceStats}
+        self.shards = []
+        # {事件: (距开始的秒数, 接口)}，事件为 connect 或 FCPublish
+        self.milestones = {}
+
+    def shard(self):
+        """当前线程的分片 {接口名: InterfaceStats}，处理线程在开始时获取一次"""
+        try:
+            return self.local.interfaces
+        except AttributeError:
+            shard = self.local.interfaces = {}
+            with self.lock:
+                self.shards.append(shard)
+            return shard
+
+    def record(self, interface, inspected, latency=None, shard=None):
+        """
+        记录一个数据包的处理结果
+        @param interface: 接口名
+        @param inspected: 是否进入 RTMP 检查
+        @param latency: 处理耗时（秒），未测量时为 None
+        @param shard: 当前线程的分片，None 时自动获取
+        """
+        if shard is None:
+            shard = self.shard()
+        stats = shard.get(interface)
+        if stats is None:
+            stats = shard[interface] = InterfaceStats()
+        if inspected:
+            stats.inspected += 1
+        else:
+            stats.filtered += 1
+        if latency is not None:
+            stats.latencies.append(latency)
+            if latency > stats.max_latency:
+                stats.max_latency = latency
+
+    def mark(self, event, interface):
+        """记录首次发现某个命令的时间，重复调用时保留第一次"""
+        with self.lock:
+            if event not in self.milestones:
+                self.milestones[event] = (time.monotonic() - self.started, interface)
+
+    def since_start(self, moment):
+        """将 time.monotonic 时间转换为距会话开始的秒数，None 保持不变"""
+        return None if moment is None else max(moment - self.started, 0.0)
+
+    def interface_names(self):
+        """有处理记录的接口名"""
+        with self.lock:
+            shards = list(self.shards)
+        names = []
+        for shard in shards:
+            names.extend(name for name in list(shard) if name not in names)
+        return names
+
+    def get_interface_stats(self, interface):
+        """
+        获取单个接口的处理统计
+        @return: {"inspected", "filtered", "latency": {"p50", "p90", "p99", "max"}（毫秒），
+            没有处理记录时 latency 为 None}
+        """
+        with self.lock:
+            shards = list(self.shards)
+        result = {"inspected": 0, "filtered": 0, "latency": None}
+        latencies = []
+        max_latency = 0.0
+        for shard in shards:
+            stats = shard.get(interface)
+            if stats is None:
+                continue
+            result["inspected"] += stats.inspected
+            result["filtered"] += stats.filtered
+            latencies.extend(list(stats.latencies))
+            max_latency = max(max_latency, stats.max_latency)
+        if latencies:
+            latencies.sort()
+            result["latency"] = {
+                name: latencies[min(int(len(latencies) * ratio), len(latencies) - 1)] * 1000
+                for name, ratio in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99))
+            }
+            result["latency"]["max"] = max_latency * 1000
+        return result
+
+
+def process_rss():
+    """当前进程的常驻内存（字节），无法获取时返回 None"""
+    try:
+        return psutil.Process(os.getpid()).memory_info().rss
+    except Exception:
+        return None
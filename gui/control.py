@@ -3,14 +3,29 @@ from tkinter import ttk, messagebox
 from utils.network import NetworkInterface
 from core.capture import PacketCapture
 from core.log_capture import LogCapture
+from core.process_scope import restart_media_sdk
+from core.probe import (
+    COUNTER_WINDOW, PROBE_CAPTURED, PROBE_ERROR, PROBE_IDLE, PROBE_NO_CAPTURE, PROBE_UNCHECKED,
+)
+from utils.config import get_config
 import psutil
 
+# 接口检测结果的显示文本
+PROBE_STATUS_TEXT = {
+    PROBE_CAPTURED: "可用，已抓到数据包",
+    PROBE_NO_CAPTURE: "未抓到数据包",
+    PROBE_IDLE: "无流量",
+    PROBE_UNCHECKED: "有流量，已有其他接口可用，未单独检测",
+    PROBE_ERROR: "无法打开",
+}
+
 class ControlPanel:
     def __init__(self, gui):
         self.gui = gui
         self.network_interface = NetworkInterface(self.gui.logger)
         self.capture = PacketCapture(self.gui.logger)
         self.capture.add_callback(self.update_stream_url)
+        self.capture.add_finish_callback(self.on_capture_finished)
         self.log_capture = LogCapture(self.gui.logger)
         self.log_capture.add_callback(self.update_stream_url)
 
@@ -84,6 +99,16 @@ class ControlPanel:
         )
         self.file_mode_check.pack(side=tk.LEFT)
 
+        # 持续监听复选框，对应配置 capture_watch
+        self.watch_mode = tk.BooleanVar(value=bool(get_config("capture_watch")))
+        self.watch_mode_check = ttk.Checkbutton(
+            button_frame,
+            text="持续监听",
+            variable=self.watch_mode,
+            command=self.watch_mode_changed,
+        )
+        self.watch_mode_check.pack(side=tk.LEFT)
+
         # 服务器地址显示（第三行）
         ttk.Label(frame, text="推流服务器:").grid(
             row=2, column=0, sticky=tk.W, pady=5, padx=5
@@ -183,13 +208,7 @@ class ControlPanel:
             else:
                 self.gui.log_to_console("已开启抓包模式抓取推流")
                 # 结束 MediaSDK_Server 进程
-                try:
-                    for proc in psutil.process_iter(['name']):
-                        if proc.info['name'] == 'MediaSDK_Server.exe':
-                            proc.kill()
-                            self.gui.log_to_console("已终止 MediaSDK_Server 进程")
-                except Exception as e:
-                    self.gui.log_to_console(f"（可忽略该报错）尝试终止 MediaSDK_Server 进程时出错: {str(e)}")
+                restart_media_sdk(self.gui.logger)
 
                 if self.listening_all.get():
                     # 获取所有接口的实际名称
@@ -198,8 +217,11 @@ class ControlPanel:
                         # 从显示名称中提取实际的接口名称
                         actual_name = iface_display.split(" [")[0].strip()
                         selected_interfaces.append(actual_name)
-                    # 启动多接口捕获
-                    self.capture.start_multi(selected_interfaces)
+                    # 启动多接口捕获，勾选持续监听时持续监听推流信息的变化
+                    if self.watch_mode.get():
+                        self.capture.watch(selected_interfaces)
+                    else:
+                        self.capture.start_multi(selected_interfaces)
                 else:
                     # 获取选中接口的实际名称
                     selected_display = self.selected_interface.get()
@@ -209,7 +231,10 @@ class ControlPanel:
                     # 从显示名称中提取实际的接口名称
                     actual_name = selected_display.split(" [")[0].strip()
                     # 启动单接口捕获
-                    self.capture.start(actual_name)
+                    if self.watch_mode.get():
+                        self.capture.watch([actual_name])
+                    else:
+                        self.capture.start(actual_name)
         else:
             self.is_capturing = False
             self.capture_btn.configure(text="开始捕获")
@@ -250,13 +275,29 @@ class ControlPanel:
         self.gui.server_address.set(server_address)
         self.gui.stream_code.set(stream_code)
 
-        # 如果获取到了地址和推流码，更新界面状态
-        if server_address and stream_code:
+        # 如果获取到了地址和推流码且捕获已结束（未设置继续获取多组推流信息），更新界面状态
+        if server_address and stream_code and not (
+            self.capture.is_capturing or self.log_capture.is_capturing
+        ):
             self.is_capturing = False
             self.capture_btn.configure(text="开始捕获")
             self.on_listening_changed()  # 重置接口选择状态
             self.status_text.set("已停止")
 
+    def on_capture_finished(self, credentials):
+        """抓包因达到停止条件（获取到足够的推流信息或超时）而结束的回调函数"""
+        if len(credentials) > 1:
+            self.gui.log_to_console(f"\n共获取 {len(credentials)} 组推流信息:")
+            for item in credentials:
+                self.gui.log_to_console(
+                    f"推流主机 {item['host']}: {item['server_address']} {item['stream_code']}"
+                )
+        if self.is_capturing:
+            self.is_capturing = False
+            self.capture_btn.configure(text="开始捕获")
+            self.on_listening_changed()
+            self.status_text.set("已停止")
+
     def check_douyin_live_running(self):
         """检查抖音直播伴侣是否正在运行"""
         for proc in psutil.process_iter(["name", "cmdline"]):
@@ -314,6 +355,11 @@ class ControlPanel:
         from utils.config import set_config
         set_config("file_mode", self.file_mode.get())
 
+    def watch_mode_changed(self):
+        """持续监听模式改变时的回调，下次开始捕获时生效"""
+        from utils.config import set_config
+        set_config("capture_watch", self.watch_mode.get())
+
     def on_listening_changed(self):
         """监听设置改变时的回调"""
         self.save_listening_config()
@@ -350,10 +396,17 @@ class ControlPanel:
         self.capture_btn.configure(state="disabled")
         self.gui.log_to_console("\n开始检测接口...")
 
-        def on_test_complete(has_data):
+        def on_test_complete(results):
             self.status_text.set("待开始")
             self.test_btn.configure(state="normal")
             self.capture_btn.configure(state="normal")
+            # 输出每个接口的检测结果
+            for interface, result in results.items():
+                status = PROBE_STATUS_TEXT.get(result["status"], result["status"])
+                packets = result["packets"]
+                traffic = f"，{COUNTER_WINDOW:g} 秒内收发 {packets} 个包" if packets is not None else ""
+                self.gui.log_to_console(f"接口 {interface}: {status}{traffic}")
+            has_data = any(result["status"] == PROBE_CAPTURED for result in results.values())
             if has_data:
                 messagebox.showinfo("检测结果", "接口可用，已检测到数据流。工具可正常使用，如果不能捕获到推流码，请检查本地是否开了过多软件（如浏览器看直播、视频等），或请尝试勾选日志模式后抓取推流信息。")
             else:
@@ -2,7 +2,6 @@ import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
 import webbrowser
 import sys
-from scapy.arch.windows import get_windows_if_list
 from core.npcap import NpcapManager
 from utils.logger import Logger
 from utils.network import NetworkInterface
@@ -0,0 +1,37 @@
+import pytest
+
+from benchmarks.bench_capture import NullLogger
+from benchmarks.traffic import generate, write_pcap
+from core.capture import PacketCapture
+
+
+@pytest.fixture(autouse=True)
+def isolated_home(tmp_path, monkeypatch):
+    """配置文件和缓存写入临时目录，不读取也不修改用户的 ~/.douyin-rtmp"""
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("USERPROFILE", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def capture():
+    """不输出日志的 PacketCapture"""
+    return PacketCapture(NullLogger())
+
+
+@pytest.fixture
+def push_frames():
+    """一段含一个推流连接和 HTTPS 背景流量的合成流量，返回 (帧列表, 推流信息)"""
+    return generate(
+        duration=1.0, video_mbps=0.5, https_mbps=0.5, udp_mbps=0, background_stream=False,
+        credential_at=0.2,
+    )
+
+
+@pytest.fixture
+def push_pcap(tmp_path, push_frames):
+    """写入 pcap 文件的合成流量，返回 (文件路径, 推流信息)"""
+    frames, credentials = push_frames
+    path = str(tmp_path / "push.pcap")
+    write_pcap(path, frames)
+    return path, credentials
@@ -0,0 +1,27 @@
+import socket
+
+import pytest
+
+from core.backends import CaptureBackend, TpacketHandle
+from core.packet import DLT_EN10MB
+
+
+def test_backend_must_implement_open():
+    class ListOnly(CaptureBackend):
+        def list_interfaces(self):
+            return []
+
+    with pytest.raises(TypeError):
+        ListOnly()
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_PACKET"), reason="需要 Linux AF_PACKET")
+def test_loopback_is_ethernet():
+    try:
+        handle = TpacketHandle("lo")
+    except PermissionError:
+        pytest.skip("需要 root 或 CAP_NET_RAW")
+    try:
+        assert handle.linktype == DLT_EN10MB
+    finally:
+        handle.close()
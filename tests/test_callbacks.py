@@ -0,0 +1,21 @@
+import threading
+
+
+def test_callbacks_can_read_credentials(capture, push_pcap):
+    path, credentials = push_pcap
+    capture.stop_after = 1
+    seen = {}
+    capture.add_callback(lambda server_address, stream_code: seen.update(found=capture.get_credentials()))
+    capture.add_finish_callback(lambda items: seen.update(finished=capture.get_credentials()))
+
+    # 回调在持有锁时执行会使 get_credentials 死锁，在单独的线程中回放以便超时失败
+    thread = threading.Thread(target=capture.replay, args=(path,), daemon=True)
+    thread.start()
+    thread.join(10)
+    assert not thread.is_alive()
+
+    _, server_address, stream_code = credentials[0]
+    for key in ("found", "finished"):
+        assert [(item["server_address"], item["stream_code"]) for item in seen[key]] == [
+            (server_address, stream_code)
+        ]
@@ -0,0 +1,119 @@
+import threading
+import time
+
+import pytest
+
+from benchmarks.bench_multi_interface import SimulatedAdapter, SimulatedBackend
+from benchmarks.traffic import PROTO_UDP, build_dns_response, build_frame, build_udp
+from core.capture import CAPTURE_MODE_THREADS
+from core.dns import IngestLearner
+from core.packet import DLT_EN10MB
+from utils.config import set_config
+
+
+def test_reset_session_waits_for_previous_workers(capture):
+    capture._start_pipeline()
+    workers = list(capture.workers)
+    assert all(thread.is_alive() for thread in workers)
+
+    # 快速重新开始捕获时，清空流表之前上次会话的处理线程已经退出
+    capture._reset_session()
+    assert not any(thread.is_alive() for thread in workers)
+    assert capture.workers == []
+
+
+def test_ingest_cache_is_written_outside_capture_lock(capture):
+    set_config("capture_dns", True)
+    capture._reset_session()
+    ingest = capture.ingest
+    save = ingest.save
+    held = []
+
+    def record_save():
+        held.append(capture.lock.locked())
+        save()
+
+    ingest.save = record_save
+    frame = build_frame("192.168.1.1", "192.168.1.100", PROTO_UDP, build_udp(
+        53, 50000, build_dns_response("push-rtmp-l1.douyincdn.com", ["198.51.100.30"]),
+    ))
+    capture._learn_ingest(frame, DLT_EN10MB)
+
+    assert held == [False]
+    assert capture.capture_filter.build() == "(tcp and (host 198.51.100.30)) or (udp src port 53)"
+    assert IngestLearner(cache_path=ingest.cache_path).addresses() == ["198.51.100.30"]
+
+
+def test_candidates_stop_at_media(capture, push_pcap):
+    path, credentials = push_pcap
+    set_config("capture_keep_candidates", True)
+    capture.stop_after = 0
+    capture.replay(path)
+
+    # 推流连接的客户端方向在 publish 之后就是音视频数据，只保留握手和命令
+    client = [segment for segment in capture.candidates.segments if segment[2][3] == 1935]
+    assert sum(len(segment[5]) for segment in client) < capture.reassembler.max_bytes // 2
+    assert credentials[0][2].encode() in b"".join(segment[5] for segment in client)
+
+
+class RecordingAdapter(SimulatedAdapter):
+    """记录替换过滤器的线程的模拟网卡"""
+
+    def __init__(self):
+        super().__init__()
+        self.filters = []
+
+    def set_filter(self, bpf):
+        self.filters.append((bpf, threading.current_thread()))
+
+
+@pytest.mark.parametrize("mode", [None, CAPTURE_MODE_THREADS])
+def test_filter_is_replaced_by_capture_thread(capture, push_frames, mode):
+    adapters = {name: RecordingAdapter() for name in ("eth0", "eth1")}
+    capture.backend = SimulatedBackend(adapters)
+    capture.capture_mode = mode
+    capture.start_multi(list(adapters))
+    try:
+        # 处理线程排除连接时只增加过滤器版本
+        with capture.lock:
+            capture._exclude_flow("192.168.1.100", 50000, "203.0.113.5", 1935)
+        assert not any(adapter.filters for adapter in adapters.values())
+        frame = push_frames[0][0][1]
+        deadline = time.monotonic() + 5
+        while not all(adapter.filters for adapter in adapters.values()) and time.monotonic() < deadline:
+            for adapter in adapters.values():
+                adapter.writer.send(frame)
+            time.sleep(0.01)
+        owners = {capture.capture_thread, *capture.capture_threads.values()} - {None}
+    finally:
+        capture.stop()
+
+    for adapter in adapters.values():
+        assert [thread in owners for _, thread in adapter.filters] == [True]
+        assert "not (host 192.168.1.100 and port 50000)" in adapter.filters[0][0]
+
+
+class UnavailableBackend(SimulatedBackend):
+    """列出接口但无法打开抓包句柄的后端"""
+
+    def open(self, interface, capture_filter=None):
+        raise OSError(f"无法打开 {interface}")
+
+
+def test_start_multi_without_interfaces(capture):
+    capture.backend = SimulatedBackend({"eth0": None})
+    assert not capture.start_multi(["nosuch0", "nosuch1"])
+    assert not capture.is_capturing
+
+
+def test_session_ends_when_no_handle_opens(capture):
+    capture.backend = UnavailableBackend({"eth0": None, "eth1": None})
+    finished = threading.Event()
+    capture.add_finish_callback(lambda credentials: finished.set())
+    try:
+        assert capture.start_multi(["eth0", "eth1"])
+        # 等待推流信息的调用方随会话结束返回，不会一直等待
+        assert finished.wait(5)
+        assert not capture.is_capturing
+    finally:
+        capture.stop()
@@ -0,0 +1,62 @@
+import importlib.util
+import re
+import threading
+
+from benchmarks.traffic import build_dns_response
+from core.capture_filter import CaptureFilter, PacketRateMeter
+from core.dns import IngestLearner
+
+PUSH_DOMAIN = "push-rtmp-l1.douyincdn.com"
+
+
+def test_ingest_hosts_narrow_the_filter():
+    capture_filter = CaptureFilter()
+    capture_filter.set_ingest_hosts(["203.0.113.5", "203.0.113.6"])
+    assert capture_filter.build() == "tcp and (host 203.0.113.5 or host 203.0.113.6)"
+    # 学习到的地址上的任意端口符合，其他地址上的推流端口不再符合
+    assert capture_filter.matches("192.168.1.100", 50000, "203.0.113.5", 8080)
+    assert not capture_filter.matches("192.168.1.100", 50000, "198.51.100.7", 1935)
+
+
+def test_cached_ingest_hosts_keep_port_filter(tmp_path):
+    cache_path = str(tmp_path / "ingest_cache.json")
+    previous = IngestLearner(cache_path=cache_path)
+    previous.feed(build_dns_response(PUSH_DOMAIN, ["203.0.113.5"]))
+    previous.save()
+
+    # 缓存中的地址可能已过时，本次会话的 DNS 响应确认之前不收窄过滤器
+    learner = IngestLearner(cache_path=cache_path)
+    assert learner.addresses() == ["203.0.113.5"]
+    assert learner.confirmed_addresses() == []
+    capture_filter = CaptureFilter()
+    capture_filter.set_ingest_hosts(learner.confirmed_addresses())
+    assert capture_filter.build() == "tcp and (port 1935)"
+
+    learned = learner.feed(build_dns_response(PUSH_DOMAIN, ["203.0.113.5", "203.0.113.9"]))
+    assert learned == [("203.0.113.5", PUSH_DOMAIN), ("203.0.113.9", PUSH_DOMAIN)]
+    capture_filter.set_ingest_hosts(learner.confirmed_addresses())
+    assert capture_filter.build() == "tcp and (host 203.0.113.5 or host 203.0.113.9)"
+
+
+def test_pcap_listen_socket_reads_snaplen_from_module_mtu():
+    # _open_pcap_socket 临时替换 scapy.arch.libpcap.MTU 设置 snaplen，升级 scapy 时需要重新确认
+    spec = importlib.util.find_spec("scapy.arch.libpcap")
+    with open(spec.origin, encoding="utf-8") as f:
+        source = f.read()
+    listen_socket = source[source.index("class L2pcapListenSocket"):source.index("class L2pcapSocket")]
+    assert re.search(r"snaplen=MTU\b", listen_socket)
+    assert "BIOCIMMEDIATE" in listen_socket and "except_filter" in listen_socket
+
+
+def test_rate_meter_sums_per_thread_counters():
+    meter = PacketRateMeter(None)
+    threads = [
+        threading.Thread(target=lambda: [meter.count() for _ in range(1000)]) for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    meter.count()
+    assert meter.delivered == 4001
+    assert len(meter.counters) == 5
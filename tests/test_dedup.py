@@ -0,0 +1,19 @@
+from core.dedup import SegmentDeduplicator
+
+KEY = ("10.0.0.2", 50000, "10.0.0.1", 1935)
+
+
+def test_cross_interface_copy_is_duplicate():
+    deduplicator = SegmentDeduplicator()
+    assert not deduplicator.is_duplicate("eth0", KEY, 1, b"connect", now=0.0)
+    assert deduplicator.is_duplicate("tun0", KEY, 1, b"connect", now=0.1)
+    assert deduplicator.get_stats() == {"suppressed": 1, "pairs": {("eth0", "tun0"): 1}}
+
+
+def test_same_interface_retransmission_is_not_duplicate():
+    deduplicator = SegmentDeduplicator()
+    assert not deduplicator.is_duplicate("eth0", KEY, 1, b"connect", now=0.0)
+    assert not deduplicator.is_duplicate("eth0", KEY, 1, b"connect", now=0.1)
+    assert deduplicator.get_stats() == {"suppressed": 0, "pairs": {}}
+    # 重传之后在另一个接口上出现的副本仍然过滤
+    assert deduplicator.is_duplicate("tun0", KEY, 1, b"connect", now=0.2)
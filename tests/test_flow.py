@@ -0,0 +1,53 @@
+from benchmarks.traffic import write_pcap
+from core.flow import FLOW_DROP, FLOW_HANDSHAKE, FLOW_UNKNOWN, FlowTable
+from core.packet import decode_tcp
+from core.reassembly import TCP_SYN
+
+ISN = 1000
+KEY = ("192.168.1.100", 50000, "203.0.113.5", 8080)
+SERVER_KEY = ("192.168.1.100", 50001, "203.0.113.5", 1935)
+ACK = 0x10
+
+
+def start_flow(table, key):
+    table.classify(key, ISN, TCP_SYN, b"")
+
+
+def test_lone_c0_starts_handshake():
+    table = FlowTable()
+    start_flow(table, KEY)
+    assert table.classify(KEY, ISN + 1, ACK, b"\x03").state == FLOW_HANDSHAKE
+
+
+def test_handshake_rule_applies_only_to_first_stream_byte():
+    table = FlowTable()
+    start_flow(table, KEY)
+    # C1 的后半段先于 C0+C1 的第一个段到达
+    assert table.classify(KEY, ISN + 1 + 1460, ACK, bytes(77)).state == FLOW_UNKNOWN
+    assert table.classify(KEY, ISN + 1, ACK, b"\x03" + bytes(1459)).state == FLOW_HANDSHAKE
+
+
+def test_server_port_flows_are_not_dropped():
+    table = FlowTable(is_server_port=lambda port: port == 1935)
+    for key in (KEY, SERVER_KEY):
+        start_flow(table, key)
+        for index in range(20):
+            table.classify(key, ISN + 1 + index * 100, ACK, b"\x01" * 100)
+    assert table.flows[KEY].state == FLOW_DROP
+    assert table.flows[SERVER_KEY].state == FLOW_UNKNOWN
+
+
+def test_push_with_reordered_handshake_is_captured(capture, push_frames, tmp_path):
+    frames, credentials = push_frames
+    # 交换客户端 C0+C1 的两个段
+    first = [
+        index for index, (_, frame) in enumerate(frames)
+        if (segment := decode_tcp(frame)) and segment[3] == 1935 and len(segment[6])
+    ][:2]
+    frames = list(frames)
+    frames[first[0]], frames[first[1]] = frames[first[1]], frames[first[0]]
+    path = str(tmp_path / "reordered.pcap")
+    write_pcap(path, frames)
+
+    capture.replay(path)
+    assert [item["stream_code"] for item in capture.get_credentials()] == [credentials[0][2]]
@@ -0,0 +1,31 @@
+from benchmarks.traffic import build_dns_response, build_frame, build_tcp, build_udp
+from core.packet import DLT_LINUX_SLL, DLT_NULL, DLT_RAW, SKIP, decode_tcp, decode_udp
+
+TCP_FRAME = build_frame(
+    "192.168.1.100", "203.0.113.5", 6, build_tcp("192.168.1.100", "203.0.113.5", 50000, 1935, 1, 0, 0x18, b"hello")
+)
+UDP_FRAME = build_frame(
+    "8.8.8.8", "192.168.1.100", 17, build_udp(53, 40000, build_dns_response("push-rtmp-l1.douyincdn.com", ["203.0.113.5"]))
+)
+
+
+def test_link_layers_decode_alike():
+    ip = TCP_FRAME[14:]
+    frames = [
+        (TCP_FRAME, 1),
+        (TCP_FRAME[:12] + b"\x81\x00\x00\x01" + TCP_FRAME[12:], 1),
+        (ip, DLT_RAW),
+        (b"\x02\x00\x00\x00" + ip, DLT_NULL),
+        (b"\x00" * 14 + b"\x08\x00" + ip, DLT_LINUX_SLL),
+    ]
+    for frame, linktype in frames:
+        segment = decode_tcp(frame, linktype)
+        assert segment[2:4] == (50000, 1935) and bytes(segment[6]) == b"hello"
+
+
+def test_udp_and_tcp_decoders_skip_each_other():
+    assert decode_udp(UDP_FRAME)[2:4] == (53, 40000)
+    assert decode_tcp(UDP_FRAME) is SKIP
+    assert decode_udp(TCP_FRAME) is None
+    # 不支持的链路层类型交给 scapy 处理
+    assert decode_tcp(TCP_FRAME, 999) is None
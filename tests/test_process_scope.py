@@ -0,0 +1,47 @@
+import time
+
+import core.process_scope
+from core.process_scope import ProcessScope
+
+
+class FakeScope(ProcessScope):
+    """不读取真实进程、按给定连接返回结果的 ProcessScope"""
+
+    def __init__(self, endpoints, **kwargs):
+        self.changes = []
+        super().__init__("MediaSDK_Server.exe", self.changes.append, **kwargs)
+        self.current = set(endpoints)
+        self.scans = 0
+        self.polls = 0
+
+    def _find_processes(self):
+        self.scans += 1
+        return [object()]
+
+    def _connections(self):
+        self.polls += 1
+        return set(self.current)
+
+
+def run(scope, duration):
+    scope.start()
+    time.sleep(duration)
+    scope.stop()
+    scope.join(1)
+
+
+def test_polling_backs_off_once_endpoints_settle(monkeypatch):
+    monkeypatch.setattr(core.process_scope, "PROCESS_SETTLE_TIME", 0.1)
+    monkeypatch.setattr(core.process_scope, "PROCESS_IDLE_POLL_INTERVAL", 0.25)
+    scope = FakeScope([("203.0.113.5", 50000)], interval=0.01)
+    run(scope, 0.8)
+    # 变化后的 0.1 秒内每 0.01 秒检查一次，之后每 0.25 秒检查一次
+    assert scope.changes == [[("203.0.113.5", 50000)]]
+    assert scope.polls < 25
+
+
+def test_polling_stays_fast_without_endpoints(monkeypatch):
+    monkeypatch.setattr(core.process_scope, "PROCESS_SETTLE_TIME", 0.1)
+    scope = FakeScope([], interval=0.01)
+    run(scope, 0.5)
+    assert scope.polls > 25
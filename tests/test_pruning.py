@@ -0,0 +1,79 @@
+import threading
+import time
+
+from benchmarks.bench_multi_interface import SimulatedAdapter, SimulatedBackend
+from core.flow import FLOW_HANDSHAKE
+from core.pipeline import InterfaceCounters
+from core.pruning import INTERFACE_ACTIVE, INTERFACE_CLOSED, INTERFACE_DEMOTED, InterfacePruner
+
+
+def start_loop(capture, names, **pruner_options):
+    """在模拟网卡上启动单线程事件循环，网卡计数中没有出站流量，返回 (模拟网卡, 获取到推流信息的事件)"""
+    adapters = {name: SimulatedAdapter() for name in names}
+    found = threading.Event()
+    capture.add_callback(lambda server_address, stream_code: found.set())
+    capture.is_capturing = True
+    capture.backend = SimulatedBackend(adapters)
+    capture._start_pipeline()
+    for name in names:
+        capture.interface_status[name] = True
+        capture.interface_counters[name] = InterfaceCounters()
+    capture.pruner = InterfacePruner(
+        names, capture.logger, egress=lambda: {name: 0 for name in names}, warmup=0,
+        ignored=(), **pruner_options,
+    )
+    threading.Thread(
+        target=capture._capture_loop, args=(names, capture.stop_event, capture.wakeup), daemon=True
+    ).start()
+    return adapters, found
+
+
+def send_push(adapter, found, frames):
+    for _, frame in frames:
+        try:
+            adapter.writer.send(frame)
+        except OSError:
+            # 获取到推流信息后捕获停止，模拟网卡已关闭
+            break
+    found.wait(5)
+
+
+def assert_found(capture, credentials):
+    _, server_address, stream_code = credentials[0]
+    assert [(item["server_address"], item["stream_code"]) for item in capture.get_credentials()] == [
+        (server_address, stream_code)
+    ]
+
+
+def test_push_starting_on_demoted_interface_is_captured(capture, push_frames):
+    adapters, found = start_loop(capture, ["eth0", "eth1"], loopback=lambda name: False)
+    capture.pruner._set_state("eth0", INTERFACE_DEMOTED, "没有出站流量")
+    frames, credentials = push_frames
+    try:
+        send_push(adapters["eth0"], found, frames)
+    finally:
+        capture.stop()
+
+    assert_found(capture, credentials)
+    assert capture.pruner.states["eth0"].state == INTERFACE_ACTIVE
+
+
+def test_push_starting_after_long_idle_is_captured(capture, push_frames, monkeypatch):
+    monkeypatch.setattr("core.capture.WAIT_INTERVAL", 0.01)
+    adapters, found = start_loop(capture, ["eth0", "eth1", "lo"], interval=0.01)
+    pruner = capture.pruner
+    frames, credentials = push_frames
+    try:
+        # 空闲检查次数远超降级所需，空闲接口的句柄仍保持打开
+        deadline = time.monotonic() + 5
+        while pruner.checked - pruner.started < 0.5 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert pruner.states["eth0"].state == INTERFACE_DEMOTED
+        assert pruner.states["lo"].state == INTERFACE_CLOSED
+        send_push(adapters["eth0"], found, frames)
+    finally:
+        capture.stop()
+
+    assert_found(capture, credentials)
+    # 从连接开始的握手解析，而不是在流的中途分类
+    assert any(flow.state == FLOW_HANDSHAKE for flow in capture.flow_table.flows.values())
@@ -0,0 +1,65 @@
+from core.reassembly import DEFAULT_MAX_BYTES, TCP_SYN, StreamReassembler
+
+KEY = ("192.168.1.100", 50000, "203.0.113.5", 1935)
+ISN = 1000
+ACK = 0x10
+
+
+def start_stream(reassembler, isn=ISN):
+    reassembler.add(KEY, isn, TCP_SYN, b"")
+    return (isn + 1) & 0xFFFFFFFF
+
+
+def test_out_of_order_segments_are_merged():
+    reassembler = StreamReassembler()
+    seq = start_stream(reassembler)
+    assert reassembler.add(KEY, seq + 6, ACK, b"world") is None
+    assert reassembler.add(KEY, seq + 11, ACK, b"!") is None
+    stream, start = reassembler.add(KEY, seq, ACK, b"hello ")
+    assert start == 0
+    assert bytes(stream.data) == b"hello world!"
+    assert not stream.pending
+
+
+def test_overlapping_retransmission_appends_only_new_bytes():
+    reassembler = StreamReassembler()
+    seq = start_stream(reassembler)
+    reassembler.add(KEY, seq, ACK, b"abcdef")
+    # 完全重复的重传没有新数据，部分重叠的重传只追加超出的部分
+    assert reassembler.add(KEY, seq + 2, ACK, b"cd") is None
+    stream, start = reassembler.add(KEY, seq + 4, ACK, b"efghij")
+    assert start == 6
+    assert bytes(stream.data) == b"abcdefghij"
+    # 暂存的乱序段与已合并的数据重叠
+    reassembler.add(KEY, seq + 12, ACK, b"mnop")
+    stream, _ = reassembler.add(KEY, seq + 8, ACK, b"ijklmn")
+    assert bytes(stream.data) == b"abcdefghijklmnop"
+
+
+def test_sequence_wraparound():
+    reassembler = StreamReassembler()
+    seq = start_stream(reassembler, 0xFFFFFFFD)
+    reassembler.add(KEY, seq, ACK, b"ab")
+    stream, _ = reassembler.add(KEY, (seq + 2) & 0xFFFFFFFF, ACK, b"cd")
+    assert bytes(stream.data) == b"abcd"
+
+
+def test_stream_is_cut_at_window():
+    reassembler = StreamReassembler()
+    seq = start_stream(reassembler)
+    chunk = bytes(1000)
+    result = None
+    offset = 0
+    while KEY in reassembler.streams:
+        result = reassembler.add(KEY, seq + offset, ACK, chunk)
+        offset += len(chunk)
+    stream, _ = result
+    # 收满窗口后只保留前 max_bytes 字节，之后的段不再重组
+    assert len(stream.data) == DEFAULT_MAX_BYTES
+    assert KEY in reassembler.finished
+    assert reassembler.add(KEY, seq + offset, ACK, chunk) is None
+    # 超出窗口的乱序段不会暂存
+    other = ("192.168.1.100", 50001, "203.0.113.5", 1935)
+    reassembler.add(other, ISN, TCP_SYN, b"")
+    assert reassembler.add(other, ISN + 1 + DEFAULT_MAX_BYTES, ACK, chunk) is None
+    assert not reassembler.streams[other].pending
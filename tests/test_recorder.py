@@ -0,0 +1,23 @@
+from collections import Counter
+
+from benchmarks.bench_capture import NullLogger
+from core.reassembly import DEFAULT_MAX_BYTES
+from core.recorder import ControlRecorder
+
+
+def test_recording_stops_at_media(capture, push_pcap, tmp_path):
+    path, credentials = push_pcap
+    # 不启动写入线程，直接检查放入队列的段
+    recorder = capture.recorder = ControlRecorder(NullLogger(), directory=str(tmp_path))
+    capture.stop_after = 0
+    capture.replay(path)
+
+    segments = [item for item in list(recorder.queue.queue) if item is not None]
+    recorded = Counter()
+    for _, _, key, _, _, payload, _ in segments:
+        recorded[key] += len(payload)
+    # 推流连接的客户端方向在 publish 之后就是音视频数据，不应记满重组窗口
+    client = next(key for key in recorded if key[3] == 1935)
+    assert recorded[client] < DEFAULT_MAX_BYTES // 2
+    data = b"".join(payload for _, _, key, _, _, payload, _ in segments if key == client)
+    assert credentials[0][2].encode() in data
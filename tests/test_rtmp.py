@@ -0,0 +1,89 @@
+import struct
+
+from benchmarks.traffic import amf0_value, rtmp_command, rtmp_message
+from core.rtmp import (
+    HANDSHAKE_SIZE, MSG_SET_CHUNK_SIZE, MSG_VIDEO, RtmpParser, decode_amf0, decode_command,
+)
+
+# C0 + C1 + C2
+HANDSHAKE = b"\x03" + bytes(HANDSHAKE_SIZE - 1)
+TC_URL = "rtmp://push-rtmp-l1.douyincdn.com/third"
+CONNECT = {
+    "app": "third",
+    "type": "nonprivate",
+    "flashVer": "FMLE/3.0 (compatible; FMSc/1.0)",
+    "tcUrl": TC_URL,
+}
+
+
+def feed_incrementally(parser, data, step=7):
+    """按字节流的增长逐步输入，模拟 TCP 段逐个到达"""
+    commands = []
+    for end in range(step, len(data) + step, step):
+        commands += parser.feed(data[:end])
+    return commands
+
+
+def test_connect_split_across_chunks():
+    connect = rtmp_command("connect", 1, CONNECT)
+    # 默认块大小 128，connect 命令由一个 fmt 0 块和若干 fmt 3 续块组成
+    assert len(connect) > 12 + 128 and connect[12 + 128] == 0xC3
+    parser = RtmpParser()
+    commands = feed_incrementally(parser, HANDSHAKE + connect)
+    assert [command.name for command in commands] == ["connect"]
+    assert parser.tc_url == TC_URL
+    assert parser.app == "third"
+    assert not parser.failed
+
+
+def test_chunk_size_change():
+    set_chunk_size = rtmp_message(2, MSG_SET_CHUNK_SIZE, struct.pack("!I", 4096), 128)
+    connect = rtmp_command("connect", 1, CONNECT, chunk_size=4096)
+    publish = rtmp_command("publish", 5, None, "stream-key", "live", chunk_size=4096, stream_id=1)
+    parser = RtmpParser()
+    commands = feed_incrementally(parser, HANDSHAKE + set_chunk_size + connect + publish)
+    assert parser.chunk_size == 4096
+    assert [command.name for command in commands] == ["connect", "publish"]
+    assert parser.tc_url == TC_URL
+    assert parser.publish_name == "stream-key"
+
+
+def test_type3_header_starts_new_message():
+    release = rtmp_command("releaseStream", 2, None, "stream-key")
+    # 与上一条消息长度和类型相同的新消息只发送 fmt 3 头
+    body = b"".join(amf0_value(value) for value in ("FCPublish", 3.0, None, "stream-key1234"))
+    assert len(body) == len(release) - 12
+    parser = RtmpParser()
+    commands = feed_incrementally(parser, HANDSHAKE + release + b"\xc3" + body)
+    assert [command.name for command in commands] == ["releaseStream", "FCPublish"]
+    assert commands[1].arguments == [None, "stream-key1234"]
+    assert parser.publish_name == "stream-key"
+
+
+def test_media_message_is_skipped():
+    video = rtmp_message(6, MSG_VIDEO, bytes(300), 128, stream_id=1)
+    publish = rtmp_command("publish", 5, None, "stream-key", "live", stream_id=1)
+    parser = RtmpParser()
+    commands = feed_incrementally(parser, HANDSHAKE + video + publish)
+    assert parser.media_started
+    assert [command.name for command in commands] == ["publish"]
+
+
+def test_not_rtmp_handshake_fails():
+    parser = RtmpParser()
+    assert parser.feed(b"\x16\x03\x01" + bytes(100)) == []
+    assert parser.failed
+
+
+def test_decode_amf0_containers():
+    # ECMA 数组、严格数组和嵌套对象
+    ecma = b"\x08" + struct.pack("!IH", 1, 1) + b"a" + amf0_value(1.0) + b"\x00\x00\x09"
+    strict = b"\x0a" + struct.pack("!I", 2) + amf0_value("x") + amf0_value(True)
+    nested = amf0_value({"outer": {"inner": "value"}})
+    assert decode_amf0(ecma, 0) == ({"a": 1.0}, len(ecma))
+    assert decode_amf0(strict, 0) == (["x", True], len(strict))
+    assert decode_amf0(nested, 0)[0] == {"outer": {"inner": "value"}}
+    command = decode_command(amf0_value("connect") + amf0_value(1.0) + nested)
+    assert (command.name, command.transaction, command.arguments) == (
+        "connect", 1.0, [{"outer": {"inner": "value"}}],
+    )
@@ -0,0 +1,13 @@
+from core.flow import FLOW_DROP
+
+
+def test_watch_excludes_only_completed_push_flows(capture, push_pcap):
+    path, credentials = push_pcap
+    capture.watching = True
+    capture.replay(path)
+
+    # 非 RTMP 的连接只由流分类丢弃，不占用过滤器的排除名额
+    assert any(flow.state == FLOW_DROP for flow in capture.flow_table.flows.values())
+    assert [item["stream_code"] for item in capture.get_credentials()] == [credentials[0][2]]
+    completed = [key[:2] for key, entry in capture.flow_credentials.items() if entry.done]
+    assert list(capture.capture_filter.excluded) == completed
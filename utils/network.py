@@ -1,4 +1,3 @@
-from scapy.arch.windows import get_windows_if_list
 import subprocess
 import traceback
 
@@ -48,7 +47,9 @@ class NetworkInterface:
     def load_interfaces(self):
         """加载网络接口列表"""
         try:
-            # 获取 scapy 的接口列表
+            # 获取 scapy 的接口列表，首次枚举接口时才导入 scapy
+            from scapy.arch.windows import get_windows_if_list
+
             scapy_interfaces = get_windows_if_list()
             
             active_interfaces = []